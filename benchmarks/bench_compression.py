@@ -0,0 +1,107 @@
+"""
+Response compression cost: CPU time against bytes saved for the large payloads
+(conversation, match list, photos), per encoding and level.
+
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --mongo-uri mongodb://localhost:27017/blinder
+
+"streamed" rows compress the conversation the way common.compression does for
+streamed responses: one flush per iter_json_array chunk. In production the same
+numbers per endpoint come from the http_response_compression_* metrics.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.bench_serialization import mongo_payloads, synthetic_payloads
+from common import compression
+from common.json_provider import dumps_bytes, iter_json_array
+
+
+def codecs():
+    yield "gzip-1", lambda: compression.GzipCodec(1)
+    yield "gzip-6", lambda: compression.GzipCodec(6)
+    yield "gzip-9", lambda: compression.GzipCodec(9)
+    if compression.brotli is not None:
+        yield "br-1", lambda: compression.BrotliCodec(1)
+        yield "br-5", lambda: compression.BrotliCodec(5)
+        yield "br-11", lambda: compression.BrotliCodec(11)
+
+
+def compress_whole(codec, body):
+    return codec.compress(body) + codec.finish()
+
+
+def compress_chunks(codec, chunks):
+    out = [codec.compress(chunk) + codec.flush() for chunk in chunks]
+    out.append(codec.finish())
+    return b"".join(out)
+
+
+def measure(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.thread_time()
+        result = fn()
+        elapsed = time.thread_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def report(label, size, rows):
+    print(f"{label} ({size / 1024:.1f} KiB)")
+    for name, seconds, compressed in rows:
+        saved_kib = (size - len(compressed)) / 1024
+        print(f"  {name:16} {len(compressed) / 1024:10.1f} KiB {len(compressed) / size:7.1%} "
+              f"{seconds * 1e3:9.2f} ms {saved_kib / max(seconds * 1e3, 1e-6):10.1f} KiB saved/ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Response compression benchmark.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.mongo_uri:
+        match_id, messages, users = mongo_payloads(args.mongo_uri, args.users)
+    else:
+        match_id, messages, users = synthetic_payloads(args.messages, args.users, random.Random(1))
+
+    conversation = [dict(m, message_id=m["_id"]) for m in messages]
+    matches = [{
+        "match_id": match_id,
+        "user_id": str(user["_id"]),
+        "name": user["name"],
+        "picture": user.get("picture"),
+        "university": user.get("university"),
+        "university_location": user.get("university_location"),
+        "birthdate": user.get("birthdate"),
+        "matched_at": user.get("created_at")
+    } for user in users]
+    photos = [photo for user in users for photo in user["photos"]][:6]
+
+    payloads = {
+        "conversation": dumps_bytes({"messages": conversation}),
+        "my-matches": dumps_bytes({"matches": matches}),
+        "photos": dumps_bytes({"photos": photos}),
+    }
+    print(f"brotli: {'installed' if compression.brotli else 'not installed'}")
+    for label, body in payloads.items():
+        rows = []
+        for name, factory in codecs():
+            seconds, compressed = measure(lambda: compress_whole(factory(), body), args.repeat)
+            rows.append((name, seconds, compressed))
+        report(label, len(body), rows)
+
+    chunks = list(iter_json_array(conversation))
+    rows = []
+    for name, factory in codecs():
+        seconds, compressed = measure(lambda: compress_chunks(factory(), chunks), args.repeat)
+        rows.append((f"{name} streamed", seconds, compressed))
+    report(f"conversation, {len(chunks)} chunks", sum(map(len, chunks)), rows)
+
+
+if __name__ == "__main__":
+    main()
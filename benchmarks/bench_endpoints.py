@@ -0,0 +1,272 @@
+"""
+Endpoint benchmark: drives the Flask app in-process through realistic user journeys
+against a seeded local mongod (see benchmarks.seed_dataset) and the fake upstreams.
+
+    python -m benchmarks.bench_endpoints --journeys 2000 --concurrency 16
+    python -m benchmarks.bench_endpoints --compare benchmarks/results/<previous>.json
+
+Reports throughput, p50/p95/p99 latency and Mongo round trips per endpoint and
+writes the results to benchmarks/results/<timestamp>-<commit>.json. Journeys swipe
+and send messages, so re-seed the database before runs that are to be compared.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from pymongo import MongoClient, monitoring
+
+from benchmarks.fake_upstreams import FakeUpstreams
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Counts Mongo commands issued by the thread that is currently timing a request."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def begin(self):
+        self.local.count = 0
+
+    def end(self):
+        count, self.local.count = self.local.count, None
+        return count
+
+    def started(self, event):
+        if getattr(self.local, "count", None) is not None:
+            self.local.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, elapsed, status, round_trips):
+        with self._lock:
+            self.samples.setdefault(name, []).append((elapsed, status, round_trips))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class Journey:
+    """One virtual user: sign in, browse the deck, swipe, chat, look up restaurants."""
+
+    def __init__(self, client, counter, recorder, upstreams, rng, password):
+        self.client = client
+        self.counter = counter
+        self.recorder = recorder
+        self.upstreams = upstreams
+        self.rng = rng
+        self.password = password
+        self.headers = {}
+
+    def call(self, name, method, path, **kwargs):
+        self.counter.begin()
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, headers=self.headers, **kwargs)
+        elapsed = time.perf_counter() - started
+        self.recorder.add(name, elapsed, response.status_code, self.counter.end())
+        return response
+
+    def login(self, user):
+        roll = self.rng.random()
+        if roll < 0.1:
+            token = self.upstreams.google_id_token(user["email"], user.get("name", ""))
+            response = self.call("POST /auth/google-login", "POST", "/auth/google-login", json={"idToken": token})
+        elif roll < 0.2:
+            response = self.call("POST /auth/microsoft-login", "POST", "/auth/microsoft-login",
+                                 json={"idToken": user["email"], "codeVerifier": "bench"})
+        else:
+            response = self.call("POST /auth/signin", "POST", "/auth/signin",
+                                 json={"email": user["email"], "password": self.password})
+        token = (response.get_json(silent=True) or {}).get("access_token")
+        if token:
+            self.headers = {"Authorization": f"Bearer {token}"}
+        return bool(token)
+
+    def run(self, user, spotify_user_ids):
+        if not self.login(user):
+            return
+        self.call("GET /auth/profile", "GET", "/auth/profile")
+        self.call("GET /auth/universities", "GET", "/auth/universities")
+        self.call("GET /auth/photos", "GET", "/auth/photos")
+
+        deck = self.call("GET /match/potential", "GET", "/match/potential").get_json(silent=True) or {}
+        candidates = deck.get("potential_matches", [])
+        for candidate in candidates[:self.rng.randint(1, 3)]:
+            self.call("GET /auth/user-photos/<id>", "GET", f"/auth/user-photos/{candidate['user_id']}")
+            self.call("POST /match/swipe", "POST", "/match/swipe", json={
+                "target_user_id": candidate["user_id"],
+                "action": "like" if self.rng.random() < 0.4 else "dislike"
+            })
+
+        matches = (self.call("GET /match/my-matches", "GET", "/match/my-matches").get_json(silent=True) or {}).get("matches", [])
+        if matches:
+            match_id = self.rng.choice(matches)["match_id"]
+            self.call("GET /message/conversation", "GET", f"/message/conversation?match_id={match_id}")
+            self.call("POST /message/send", "POST", "/message/send",
+                      json={"match_id": match_id, "message_text": "Benchmark mesajı"})
+
+        self.call("GET /restaurant/restaurants", "GET", "/restaurant/restaurants?limit=20")
+
+        if user["_id"] in spotify_user_ids:
+            self.call("GET /spotify/top-tracks", "GET", "/spotify/top-tracks")
+            self.call("GET /spotify/top-artists", "GET", "/spotify/top-artists")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def summarize(recorder, wall_time):
+    endpoints = {}
+    total = 0
+    for name, samples in sorted(recorder.samples.items()):
+        latencies = sorted(s[0] * 1000 for s in samples)
+        round_trips = [s[2] for s in samples]
+        errors = sum(1 for s in samples if s[1] >= 500)
+        total += len(samples)
+        endpoints[name] = {
+            "count": len(samples),
+            "errors_5xx": errors,
+            "status_counts": {str(code): sum(1 for s in samples if s[1] == code) for code in sorted({s[1] for s in samples})},
+            "throughput_rps": round(len(samples) / wall_time, 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "mongo_round_trips_mean": round(sum(round_trips) / len(round_trips), 2),
+            "mongo_round_trips_max": max(round_trips),
+        }
+    return {"requests": total, "wall_time_s": round(wall_time, 3), "throughput_rps": round(total / wall_time, 2)}, endpoints
+
+
+def print_report(result, baseline=None):
+    base_endpoints = (baseline or {}).get("endpoints", {})
+    header = f"{'endpoint':34} {'count':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'mongo':>6}"
+    if baseline:
+        header += f" {'Δp95':>8} {'Δrps':>8}"
+    print(header)
+    for name, stats in result["endpoints"].items():
+        line = (f"{name:34} {stats['count']:>7} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.2f} "
+                f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['mongo_round_trips_mean']:>6.1f}")
+        base = base_endpoints.get(name)
+        if base:
+            line += (f" {(stats['p95_ms'] / base['p95_ms'] - 1) * 100:>+7.1f}%"
+                     f" {(stats['throughput_rps'] / base['throughput_rps'] - 1) * 100:>+7.1f}%")
+        print(line)
+    totals = result["totals"]
+    print(f"\n{totals['requests']} requests in {totals['wall_time_s']}s ({totals['throughput_rps']} req/s)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every blueprint through user journeys.")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/blinder")
+    parser.add_argument("--journeys", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="journeys run before measuring")
+    parser.add_argument("--user-sample", type=int, default=5000, help="seeded users to draw journeys from")
+    parser.add_argument("--password", default="benchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--spotify-latency", type=float, default=0.02)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="previous result file to diff against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    upstreams = FakeUpstreams(spotify_latency=args.spotify_latency, seed=args.seed).start()
+
+    # Must happen before the app (and its MongoClients) is imported
+    os.environ.update(upstreams.env())
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    # Journeys reuse a small pool of users far faster than any real client would
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    counter = RoundTripCounter()
+    monitoring.register(counter)
+
+    from main import create_app
+    app = create_app()
+
+    db = MongoClient(args.mongo_uri)["blinder"]
+    users = list(db.users.aggregate([
+        {"$sample": {"size": args.user_sample}},
+        {"$project": {"email": 1, "name": 1}}
+    ]))
+    if not users:
+        raise SystemExit("No users found; seed the database with `python -m benchmarks.seed_dataset` first.")
+    users.sort(key=lambda u: u["_id"])
+    spotify_user_ids = {doc["user_id"] for doc in db.spotify.find(
+        {"user_id": {"$in": [u["_id"] for u in users]}}, {"user_id": 1})}
+
+    def worker(recorder, journeys, worker_index):
+        rng = random.Random(f"{args.seed}:{worker_index}")
+        client = app.test_client()
+        for _ in range(journeys):
+            Journey(client, counter, recorder, upstreams, rng, args.password).run(rng.choice(users), spotify_user_ids)
+
+    def run(recorder, journeys):
+        per_worker = [journeys // args.concurrency + (1 if i < journeys % args.concurrency else 0)
+                      for i in range(args.concurrency)]
+        threads = [threading.Thread(target=worker, args=(recorder, n, i)) for i, n in enumerate(per_worker)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    run(Recorder(), args.warmup)
+    recorder = Recorder()
+    wall_time = run(recorder, args.journeys)
+    totals, endpoints = summarize(recorder, wall_time)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "totals": totals,
+        "endpoints": endpoints,
+        "upstream_calls": dict(sorted(upstreams.counts.items())),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {output}")
+    upstreams.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Query time of the music-taste LSH index (matches.music_similarity) against pool size,
+compared with scoring every signature in the pool.
+
+    python -m benchmarks.bench_music_similarity --sizes 1000,10000,50000 --queries 200
+
+Users are synthetic: each listens mostly to one or two "genres" of artists, so
+taste-similar neighbours exist. Reports mean query time, candidates scored per query
+and recall@k of the LSH result against the exact top-k.
+"""
+import argparse
+import random
+import time
+
+from matches import music_similarity
+
+
+def synthetic_top_lists(rng, genres, artists_per_genre):
+    picked = rng.sample(range(genres), rng.choice((1, 2)))
+    artists = set()
+    while len(artists) < 10:
+        genre = rng.choice(picked) if rng.random() < 0.85 else rng.randrange(genres)
+        # Popular artists of a genre are picked far more often than the long tail
+        artists.add(f"artist {genre}-{int(rng.paretovariate(1.2)) % artists_per_genre}")
+    artists = sorted(artists)
+    tracks = [{"name": f"track {rng.randrange(20)} of {name}", "artists": [name]}
+              for name in rng.sample(artists, 6) + [rng.choice(artists) for _ in range(4)]]
+    return {"artists": [{"name": name} for name in artists], "tracks": tracks}
+
+
+def brute_force(signatures, query, limit, exclude):
+    scored = [(music_similarity.similarity(query, sig), user_id)
+              for user_id, sig in signatures.items() if user_id != exclude]
+    scored.sort(reverse=True)
+    return [(user_id, score) for score, user_id in scored[:limit]]
+
+
+def bench_size(size, queries, limit, rng, genres, artists_per_genre):
+    signatures = {}
+    for user_id in range(size):
+        signature = music_similarity.minhash(music_similarity.taste_tokens(
+            synthetic_top_lists(rng, genres, artists_per_genre)))
+        signatures[user_id] = signature
+
+    started = time.perf_counter()
+    index = music_similarity.LSHIndex()
+    for user_id, signature in signatures.items():
+        index.add(user_id, signature, gender=None)
+    build_s = time.perf_counter() - started
+
+    query_ids = rng.sample(range(size), min(queries, size))
+    lsh_s = exact_s = 0.0
+    candidates = hits = relevant = 0
+    for user_id in query_ids:
+        signature = signatures[user_id]
+        started = time.perf_counter()
+        found = index.query(signature, limit, accept=lambda other, _: other != user_id)
+        lsh_s += time.perf_counter() - started
+        candidates += len(index.candidates(signature))
+
+        started = time.perf_counter()
+        exact = brute_force(signatures, signature, limit, user_id)
+        exact_s += time.perf_counter() - started
+
+        # Ties at the cut-off make any user with the k-th score a correct answer
+        threshold = exact[-1][1] if exact else 0
+        hits += sum(1 for _, score in found if score >= threshold and score > 0)
+        relevant += sum(1 for _, score in exact if score > 0)
+
+    n = len(query_ids)
+    print(f"{size:>9} {build_s:9.2f}s {lsh_s / n * 1e3:10.3f} {exact_s / n * 1e3:12.3f} "
+          f"{candidates / n:12.0f} {hits / relevant if relevant else 1:10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Music similarity LSH benchmark.")
+    parser.add_argument("--sizes", default="1000,5000,20000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--genres", type=int, default=60)
+    parser.add_argument("--artists-per-genre", type=int, default=80)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'pool':>9} {'build':>10} {'lsh ms/q':>10} {'exact ms/q':>12} {'candidates':>12} "
+          f"{f'recall@{args.limit}':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        bench_size(size, args.queries, args.limit, random.Random(args.seed), args.genres, args.artists_per_genre)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Serialization microbenchmark: Flask's default provider with hand-converted values
+(how handlers used to build responses) against FastJSONProvider on raw Mongo docs.
+
+    python -m benchmarks.bench_serialization                       # synthetic payloads
+    python -m benchmarks.bench_serialization --mongo-uri mongodb://localhost:27017/blinder
+
+With --mongo-uri the payloads are the longest conversation and a sample of user
+documents (with photos) from a seeded or imported database.
+"""
+import argparse
+import base64
+import os
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from common.json_provider import FastJSONProvider, iter_json_array, orjson
+
+
+def synthetic_payloads(message_count, user_count, rng):
+    match_id = ObjectId()
+    start = datetime(2025, 1, 1)
+    messages = [{
+        "_id": ObjectId(),
+        "match_id": match_id,
+        "sender_id": rng.randint(1, 2),
+        "message_text": rng.choice(["Merhaba!", "Nasılsın?", "Yarın kahve içelim mi?", "Haha çok iyi"]),
+        "timestamp": start + timedelta(seconds=i * 37)
+    } for i in range(message_count)]
+    users = [{
+        "_id": i,
+        "name": f"Kullanıcı {i}",
+        "email": f"user{i}@uni.edu.tr",
+        "created_at": start + timedelta(days=i),
+        "university": "İstanbul Teknik Üniversitesi",
+        "university_location": "İstanbul",
+        "birthdate": "2001-05-04",
+        "zodiac_sign": "Boğa",
+        "gender": "Kadın",
+        "gender_preference": "Erkek",
+        "height": 168,
+        "likes": ["Müzik", "Sinema", "Kahve"],
+        "values": ["Dürüstlük", "Empati"],
+        "favorite_food": ["Mantı"],
+        "photos": [{
+            "photo_id": str(ObjectId()),
+            "file_name": "photo.jpg",
+            "data": base64.b64encode(os.urandom(24 * 1024)).decode(),
+            "uploaded_at": start
+        }]
+    } for i in range(user_count)]
+    return match_id, messages, users
+
+
+def mongo_payloads(uri, user_count):
+    from pymongo import MongoClient
+    db = MongoClient(uri)["blinder"]
+    top = next(db.messages.aggregate([
+        {"$group": {"_id": "$match_id", "n": {"$sum": 1}}}, {"$sort": {"n": -1}}, {"$limit": 1}
+    ]), None)
+    if top is None:
+        raise SystemExit("No messages found in the database.")
+    messages = list(db.messages.find({"match_id": top["_id"]}).sort("timestamp", 1))
+    users = list(db.users.find({}, {"password": 0}).limit(user_count))
+    photos = {doc["user_id"]: doc["photos"] for doc in db.photos.find({"user_id": {"$in": [u["_id"] for u in users]}})}
+    for user in users:
+        user["photos"] = photos.get(user["_id"], [])
+    return top["_id"], messages, users
+
+
+def legacy_messages(match_id, messages):
+    """The per-message dicts get_conversation used to build by hand."""
+    return {"messages": [{
+        "message_id": str(msg["_id"]),
+        "match_id": str(match_id),
+        "sender_id": msg["sender_id"],
+        "message_text": msg["message_text"],
+        "timestamp": msg["timestamp"].isoformat()
+    } for msg in messages]}
+
+
+def legacy_users(users):
+    converted = []
+    for user in users:
+        user = dict(user, photos=[dict(p, uploaded_at=p["uploaded_at"].isoformat()) for p in user["photos"]])
+        converted.append(user)
+    return {"users": converted}
+
+
+def run(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    size = len(fn())
+    print(f"  {label:44} {seconds * 1e3:9.3f} ms/op {size / 1024:10.1f} KiB")
+    return seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON serialization microbenchmark.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.mongo_uri:
+        match_id, messages, users = mongo_payloads(args.mongo_uri, args.users)
+    else:
+        match_id, messages, users = synthetic_payloads(args.messages, args.users, random.Random(1))
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    print(f"encoder: {'orjson' if orjson else 'json (orjson not installed)'}; "
+          f"{len(messages)} messages, {len(users)} users")
+
+    raw_messages = {"messages": [dict(m, message_id=m["_id"]) for m in messages]}
+    print("conversation payload")
+    base = run("default provider + hand conversion", lambda: stdlib.dumps(legacy_messages(match_id, messages)).encode(), args.number)
+    new = run("FastJSONProvider on raw docs", lambda: fast.dumps(raw_messages).encode(), args.number)
+    run("iter_json_array (streamed)", lambda: b"".join(iter_json_array(messages)), args.number)
+    print(f"  speedup: {base / new:.1f}x")
+
+    print("user + photo payload")
+    base = run("default provider + hand conversion", lambda: stdlib.dumps(legacy_users(users)).encode(), args.number)
+    new = run("FastJSONProvider on raw docs", lambda: fast.dumps({"users": users}).encode(), args.number)
+    print(f"  speedup: {base / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Runs the bulk Spotify sync (spotify.sync) against the fake Spotify server, with
+injected latency and 429s, over a seeded database (see benchmarks.seed_dataset).
+
+    python -m benchmarks.bench_spotify_sync --429-rate 0.05 --retry-after 1 --rate 20
+
+Prints throughput, how many 429s were injected versus seen by the sync, and checks
+that every connected user ended up with fresh top lists.
+"""
+import argparse
+import os
+import time
+
+from pymongo import MongoClient
+
+from benchmarks.fake_upstreams import FakeUpstreams
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk Spotify sync against the fake upstream.")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/blinder")
+    parser.add_argument("--spotify-latency", type=float, default=0.05)
+    parser.add_argument("--429-rate", dest="rate_429", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=20, help="sync token bucket rate (requests/s)")
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    upstreams = FakeUpstreams(spotify_latency=args.spotify_latency, spotify_429_rate=args.rate_429,
+                              retry_after=args.retry_after, seed=args.seed).start()
+
+    # Must happen before config (and the shared MongoClient) is imported
+    os.environ.update(upstreams.env())
+    os.environ["MONGO_URI"] = args.mongo_uri
+
+    from spotify.sync import SpotifySync
+
+    db = MongoClient(args.mongo_uri)["blinder"]
+    connected = db.spotify.count_documents({"spotify_connected": True})
+    if not connected:
+        raise SystemExit("No Spotify users found; seed the database with `python -m benchmarks.seed_dataset` first.")
+
+    started = time.perf_counter()
+    stats = SpotifySync(workers=args.workers, rate=args.rate, burst=args.burst, force=True).run()
+    elapsed = time.perf_counter() - started
+    upstreams.stop()
+
+    api_calls = sum(n for key, n in upstreams.counts.items() if key.startswith("GET /spotify-api/"))
+    print(f"\n{stats.processed} users in {elapsed:.1f}s ({stats.processed / elapsed:.1f} users/s), "
+          f"{api_calls} Spotify API calls ({api_calls / elapsed:.1f}/s, limit {args.rate}/s)")
+    print(f"429: injected {upstreams.counts.get('429 injected', 0)}, seen by sync {stats.counts['throttled']}")
+    print(f"outcomes: synced {stats.counts['synced']}, failed {stats.counts['failed']}, "
+          f"skipped {stats.counts['skipped']}")
+
+    missing = db.spotify.count_documents({"spotify_connected": True, "top_lists.artists": {"$exists": False}})
+    print(f"connected users without cached top lists: {missing}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Cold-start budget: time to import and build the app and serve its first request, each
+run in a fresh interpreter, with the import cost broken down by `python -X importtime`.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-ms 700     # exits 1 when over budget
+
+Fails as well when a module listed in DEFERRED is imported during startup: those are
+only needed by the first OAuth login, verification e-mail or Spotify call. No MongoDB
+is needed; the app does not connect until its first query.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+DEFERRED = ("google.auth", "requests", "smtplib", "email.mime")
+
+FIRST_REQUEST = """
+import time
+started = time.perf_counter()
+import main
+app = main.create_app()
+response = app.test_client().get("/healthz")
+print(f"first-request {(time.perf_counter() - started) * 1000:.1f} {response.status_code}")
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    env.setdefault("JWT_SECRET_KEY", "startup-benchmark")
+    return env
+
+
+def first_request_ms():
+    stdout = subprocess.run([sys.executable, "-c", FIRST_REQUEST], env=_env(), check=True,
+                            capture_output=True, text=True).stdout
+    # The app may print its own lines; only the marked one is ours
+    line = next(line for line in stdout.splitlines() if line.startswith("first-request "))
+    _, elapsed, status = line.split()
+    if status != "200":
+        raise SystemExit(f"/healthz returned {status}")
+    return float(elapsed)
+
+
+def import_profile():
+    """Returns ({top-level package: cumulative µs}, set of every imported module)."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main; main.create_app()"],
+                            env=_env(), check=True, capture_output=True, text=True).stderr
+    packages, modules = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        module = name.strip()
+        modules.add(module)
+        # Nesting is shown by indentation; only outermost imports are summed
+        if len(name) - len(name.lstrip()) <= 1:
+            top = module.split(".")[0]
+            packages[top] = packages.get(top, 0) + int(cumulative)
+    return packages, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup time budget.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--budget-ms", type=float)
+    args = parser.parse_args(argv)
+
+    best = min(first_request_ms() for _ in range(args.runs))
+    packages, modules = import_profile()
+
+    print(f"import + create_app + first request: {best:.1f} ms (best of {args.runs})")
+    print(f"imports: {sum(packages.values()) / 1000:.1f} ms, {len(modules)} modules")
+    for package, micros in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:28} {micros / 1000:8.1f} ms")
+
+    failed = False
+    eager = sorted(m for m in modules if any(m == d or m.startswith(d + ".") for d in DEFERRED))
+    if eager:
+        print(f"FAIL: imported at startup but should be deferred: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and best > args.budget_ms:
+        print(f"FAIL: {best:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
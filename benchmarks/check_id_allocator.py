@@ -0,0 +1,128 @@
+"""
+Checks that BlockIdAllocator (login.id_allocator) never hands out an id twice, across
+threads and forked processes.
+
+    python -m benchmarks.check_id_allocator --start
+    python -m benchmarks.check_id_allocator --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.check_id_allocator --mock      # threads only, against mongomock
+
+--start runs the local three-node replica set of benchmarks.check_read_routing.
+
+The parent takes one id, so it holds a block, then forks --processes workers that share
+its allocator object as gunicorn workers do. Each worker allocates --ids ids from
+--threads threads and exits with the rest of its block unused, as a crashed worker
+would. The parent takes one more id at the end. Every id must be unique; the number of
+gaps left by abandoned blocks is reported. The counter uses its own key in `counters`
+and is removed afterwards.
+
+mongomock cannot be shared between processes, so --mock only runs the threads of a
+single process.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+
+KEY = "check_id_allocator"
+
+
+def _allocate(allocator, count, threads):
+    ids = []
+    lock = threading.Lock()
+
+    def run(n):
+        local = [allocator.next_id() for _ in range(n)]
+        with lock:
+            ids.extend(local)
+
+    workers = [threading.Thread(target=run, args=(count // threads + (i < count % threads),))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return ids
+
+
+def _worker(allocator, count, threads, results):
+    results.put(_allocate(allocator, count, threads))
+    results.close()
+    results.join_thread()
+    # Leave the remainder of the block unused, like a worker that crashed
+    os._exit(0)
+
+
+def run_processes(allocator, processes, count, threads):
+    ids = [allocator.next_id()]
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    children = [context.Process(target=_worker, args=(allocator, count, threads, results))
+                for _ in range(processes)]
+    for child in children:
+        child.start()
+    for _ in children:
+        ids.extend(results.get(timeout=120))
+    for child in children:
+        child.join()
+    ids.append(allocator.next_id())
+    return ids
+
+
+def report(ids, block_size):
+    unique = set(ids)
+    duplicates = len(ids) - len(unique)
+    gaps = max(unique) - min(unique) + 1 - len(unique)
+    print(f"  ids: {len(ids)}, duplicates: {duplicates}, gaps: {gaps} (block size {block_size})")
+    return duplicates == 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Id allocator uniqueness check.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--start", action="store_true")
+    parser.add_argument("--mock", action="store_true")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ids", type=int, default=2000, help="ids per process")
+    parser.add_argument("--block-size", type=int, default=50)
+    args = parser.parse_args(argv)
+    if not (args.start or args.mongo_uri or args.mock):
+        parser.error("one of --start, --mongo-uri or --mock is required")
+
+    stop = None
+    if args.start:
+        from benchmarks.check_read_routing import start_replica_set
+
+        args.mongo_uri, stop = start_replica_set()
+    try:
+        if args.mongo_uri:
+            # Must happen before config (and common.db) is imported
+            os.environ["MONGO_URI"] = args.mongo_uri
+        from common import db as db_module
+        from login.id_allocator import BlockIdAllocator
+
+        if args.mock:
+            import mongomock
+
+            db_module._client, db_module._client_pid = mongomock.MongoClient(), os.getpid()
+        counters = db_module.db["counters"]
+        counters.delete_one({"_id": KEY})
+        allocator = BlockIdAllocator(counters, KEY, args.block_size)
+
+        if args.mock:
+            print(f"{args.threads} threads, {args.ids} ids (mongomock)")
+            ids = _allocate(allocator, args.ids, args.threads)
+        else:
+            print(f"{args.processes} forked processes x {args.threads} threads, {args.ids} ids each")
+            ids = run_processes(allocator, args.processes, args.ids, args.threads)
+        ok = report(ids, args.block_size)
+        counters.delete_one({"_id": KEY})
+    finally:
+        if stop is not None:
+            stop()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Checks the change-stream invalidation bus (common.invalidation) against a replica set.
+
+    python -m benchmarks.check_invalidation --start
+    python -m benchmarks.check_invalidation --mongo-uri "mongodb://localhost:27117,localhost:27118,localhost:27119/?replicaSet=rs0"
+
+--start runs a local three-node replica set as benchmarks.check_read_routing does.
+Worker processes are simulated by child interpreters with their own socket directory and
+lock file; they listen on a scratch collection. This host's checkpoint in
+`invalidation_state` is reset, so do not run it next to live workers.
+
+1. Latency: a document is written, and the time until a worker receives the change is
+   measured.
+2. Resume: the watching worker is killed (SIGKILL) after a checkpoint, more documents are
+   written, and a new worker is started. It must receive every one of them without
+   starting over with a flush.
+"""
+import argparse
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from pymongo import MongoClient
+
+from benchmarks.check_read_routing import start_replica_set
+
+COLLECTION = "check_invalidation"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = f"""
+import sys, time
+from common import invalidation
+
+def on_change(change):
+    print("change", time.time(), change.operation, change.document_id, flush=True)
+
+invalidation.register({COLLECTION!r}, on_change)
+invalidation.ensure_started()
+sys.stdin.read()
+"""
+
+
+class Worker:
+    def __init__(self, env):
+        self.process = subprocess.Popen([sys.executable, "-c", WORKER], cwd=ROOT, env=env, text=True,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            # Other output (e.g. the watcher's log lines) is passed through
+            if not line.startswith("change "):
+                print(f"  worker: {line.rstrip()}")
+                continue
+            _, received_at, operation, document_id = line.split()
+            self.lines.put((float(received_at), operation, document_id))
+
+    def next(self, timeout=30):
+        return self.lines.get(timeout=timeout)
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def check_latency(worker, collection, rounds):
+    latencies = []
+    for i in range(rounds):
+        written_at = time.time()
+        collection.insert_one({"_id": f"latency-{i}"})
+        while True:
+            received_at, _, document_id = worker.next()
+            if document_id == f"latency-{i}":
+                break
+        latencies.append((received_at - written_at) * 1000)
+    print(f"  write -> eviction: p50 {_percentile(latencies, 0.5):.1f} ms, "
+          f"p99 {_percentile(latencies, 0.99):.1f} ms, max {max(latencies):.1f} ms ({rounds} writes)")
+
+
+def check_resume(worker, collection, env, checkpoint_interval, writes):
+    # Let the watcher checkpoint past the latency writes (an idle stream reports its
+    # position after each 1 s await), then take it down hard
+    time.sleep(1 + checkpoint_interval * 3)
+    worker.kill()
+    expected = {f"resume-{i}" for i in range(writes)}
+    for document_id in sorted(expected):
+        collection.insert_one({"_id": document_id})
+
+    replacement = Worker(env)
+    received, flushed = set(), False
+    deadline = time.monotonic() + 60
+    try:
+        while not expected <= received and time.monotonic() < deadline:
+            _, operation, document_id = replacement.next()
+            flushed |= operation == "flush"
+            received.add(document_id)
+    finally:
+        replacement.kill()
+    missing = expected - received
+    print(f"  written while no watcher ran: {writes}, received after restart: {writes - len(missing)}, "
+          f"flush: {'yes' if flushed else 'no'}")
+    return not missing and not flushed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Change-stream invalidation check.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--start", action="store_true")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--resume-writes", type=int, default=50)
+    args = parser.parse_args(argv)
+    if not args.start and not args.mongo_uri:
+        parser.error("either --start or --mongo-uri is required")
+
+    stop = None
+    uri = args.mongo_uri
+    if args.start:
+        uri, stop = start_replica_set()
+    scratch = tempfile.mkdtemp(prefix="blinder-invalidation-")
+    checkpoint_interval = 0.2
+    env = dict(os.environ, MONGO_URI=uri, INVALIDATION_ENABLED="true",
+               INVALIDATION_SOCKET_DIR=os.path.join(scratch, "sockets"),
+               INVALIDATION_LOCK_PATH=os.path.join(scratch, "watcher.lock"),
+               INVALIDATION_ELECTION_INTERVAL="0.2",
+               INVALIDATION_CHECKPOINT_INTERVAL=str(checkpoint_interval))
+    client = MongoClient(uri)
+    try:
+        database = client["blinder"]
+        collection = database[COLLECTION]
+        collection.drop()
+        database["invalidation_state"].delete_one({"_id": f"watcher:{socket.gethostname()}"})
+
+        worker = Worker(env)
+        # The first watcher has no checkpoint and starts with a flush
+        if worker.next()[1] != "flush":
+            raise SystemExit("Expected a flush from a watcher without a checkpoint")
+        print("latency")
+        check_latency(worker, collection, args.rounds)
+        print("resume")
+        resumed = check_resume(worker, collection, env, checkpoint_interval, args.resume_writes)
+        collection.drop()
+    finally:
+        client.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+        if stop is not None:
+            stop()
+    return 0 if resumed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
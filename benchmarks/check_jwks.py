@@ -0,0 +1,120 @@
+"""
+Checks the signing-key cache (login.jwks_cache) against the local fake JWKS servers
+(benchmarks.fake_upstreams). No MongoDB or network access is needed.
+
+    python -m benchmarks.check_jwks
+
+1. Google and Microsoft id_tokens verify, and repeated verifications reuse the cached
+   key set: one fetch per provider. The expiry follows the server's Cache-Control.
+2. A token signed after a key rotation (new kid) triggers one forced refetch and then
+   verifies; an unknown kid within the refetch interval does not refetch.
+3. Tampered signatures, wrong audiences, foreign issuers and expired tokens are rejected;
+   the Microsoft issuer comes from the OpenID metadata document.
+4. Concurrent verifications on a cold cache share one fetch, and an expired key set is
+   still served while the background refresher renews it.
+"""
+import os
+import sys
+import threading
+import time
+
+from benchmarks.checks import Checks, wait_for
+from benchmarks.fake_upstreams import FakeUpstreams
+
+MAX_AGE = 120
+
+
+def _rejects(verify, token):
+    try:
+        verify(token)
+    except ValueError:
+        return True
+    return False
+
+
+def main(argv=None):
+    upstreams = FakeUpstreams(key_bits=1024, keys_max_age=MAX_AGE).start()
+    try:
+        # Must happen before config (and login.jwks_cache) is imported
+        os.environ.update(upstreams.env())
+        from login import jwks_cache
+
+        check = Checks(58)
+
+        google_path = "GET /google/certs"
+        microsoft_path = f"GET /microsoft/{upstreams.env()['MICROSOFT_TENANT_ID']}/discovery/v2.0/keys"
+
+        print("verification and caching")
+        for _ in range(20):
+            google = jwks_cache.verify_google_id_token(upstreams.google_id_token("a@uni.edu.tr"))
+            microsoft = jwks_cache.verify_microsoft_id_token(upstreams.microsoft_id_token("b@uni.edu.tr"))
+        check("claims read from verified tokens",
+              google["email"] == "a@uni.edu.tr" and microsoft["email"] == "b@uni.edu.tr")
+        check("one key fetch per provider for 20 verifications",
+              upstreams.counts.get(google_path) == 1 and upstreams.counts.get(microsoft_path) == 1)
+        remaining = jwks_cache.microsoft_keys._expires_at - time.time()
+        check(f"expiry follows Cache-Control max-age={MAX_AGE}", MAX_AGE - 5 < remaining <= MAX_AGE)
+
+        print("key rotation")
+        upstreams.rotate_key()
+        rotated = upstreams.microsoft_id_token("b@uni.edu.tr")
+        check("new kid within the refetch interval is not refetched",
+              _rejects(jwks_cache.verify_microsoft_id_token, rotated) and upstreams.counts[microsoft_path] == 1)
+        jwks_cache.microsoft_keys.min_forced_interval = jwks_cache.google_keys.min_forced_interval = 0
+        check("new kid is fetched once and verifies",
+              jwks_cache.verify_microsoft_id_token(rotated)["email"] == "b@uni.edu.tr"
+              and upstreams.counts[microsoft_path] == 2)
+
+        print("rejections")
+        token = upstreams.microsoft_id_token("b@uni.edu.tr")
+        header, payload, signature = token.split(".")
+        forged = f"{header}.{upstreams.microsoft_id_token('c@uni.edu.tr').split('.')[1]}.{signature}"
+        check("tampered payload", _rejects(jwks_cache.verify_microsoft_id_token, forged))
+        check("wrong audience",
+              _rejects(jwks_cache.verify_microsoft_id_token, upstreams.microsoft_id_token("b@uni.edu.tr", aud="other")))
+        check("issuer of another tenant", _rejects(
+            jwks_cache.verify_microsoft_id_token,
+            upstreams.microsoft_id_token("b@uni.edu.tr", iss="https://login.microsoftonline.com/other/v2.0")))
+        check("expired token", _rejects(
+            jwks_cache.verify_microsoft_id_token,
+            upstreams.microsoft_id_token("b@uni.edu.tr", iat=int(time.time()) - 7200, exp=int(time.time()) - 3600)))
+        check("Google token with a foreign issuer",
+              _rejects(jwks_cache.verify_google_id_token, upstreams.google_id_token("a@uni.edu.tr", iss="evil")))
+        metadata_path = f"GET /microsoft/{upstreams.env()['MICROSOFT_TENANT_ID']}/v2.0/.well-known/openid-configuration"
+        check("issuer read from the OpenID metadata, fetched once", upstreams.counts.get(metadata_path) == 1)
+
+        print("concurrency")
+
+        def verify_concurrently(cache, threads=20):
+            token = upstreams.microsoft_id_token("b@uni.edu.tr")
+            before = upstreams.counts[microsoft_path]
+            verified = []
+            barrier = threading.Barrier(threads)
+
+            def verify():
+                barrier.wait()
+                verified.append(cache.decode(token, upstreams.env()["MICROSOFT_CLIENT_ID"])["email"])
+
+            workers = [threading.Thread(target=verify) for _ in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            return len(verified) == threads, upstreams.counts[microsoft_path] - before
+
+        cold = jwks_cache.KeySetCache(jwks_cache.microsoft_keys.url)
+        ok, fetches = verify_concurrently(cold)
+        check(f"cold cache, 20 concurrent verifications: {fetches} fetch", ok and fetches == 1)
+        cold._max_age, cold._expires_at = MAX_AGE, time.time() - 1
+        ok, fetches = verify_concurrently(cold)
+        check("expired keys are served without a fetch in the request", ok and fetches == 0)
+        # As the refresher's timer would once the keys near expiry
+        cold._wakeup.set()
+        check("  ... and the refresher renews them", wait_for(lambda: cold._expires_at > time.time(), timeout=10))
+    finally:
+        upstreams.stop()
+    return check.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
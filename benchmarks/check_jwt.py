@@ -0,0 +1,102 @@
+"""
+Checks the access token lifecycle (common.jwt_tokens) through the metrics it records.
+
+    python -m benchmarks.check_jwt                     # in-memory mongomock
+    python -m benchmarks.check_jwt --mongo-uri mongodb://localhost:27017
+
+A real server must be a scratch one: a user is registered in `blinder.users`.
+
+1. A token with more than JWT_REFRESH_THRESHOLD seconds left gets no X-Refresh-Token
+   and nothing is signed; its signature is verified once per request, however many of
+   jwt_required, admission control and the refresh hook look at it.
+2. A token closer to expiry gets a new full-lifetime token in X-Refresh-Token, signed
+   once, and that token works.
+3. Anonymous requests verify and sign nothing; an invalid token is rejected and counted.
+4. The installed flask_jwt_extended still has the internals TokenManager overrides.
+"""
+import argparse
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks import local_app
+from benchmarks.checks import Checks
+
+EMAIL = "ayse@check.edu.tr"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JWT refresh and verification check.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    app, _, _ = local_app.build(args.mongo_uri)
+    import config
+    from common import metrics
+    from common import jwt_tokens
+    from common.jwt_tokens import REFRESH_HEADER
+    from flask_jwt_extended import decode_token
+
+    client = app.test_client()
+    check = Checks(62)
+
+    def counts():
+        return (metrics.jwt_tokens_signed_total.labels("access").value,
+                metrics.jwt_verifications_total.labels("valid").value,
+                metrics.jwt_verifications_total.labels("invalid").value)
+
+    def get(path, token=None, times=1):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        before = counts()
+        responses = [client.get(path, headers=headers) for _ in range(times)]
+        signed, valid, invalid = (after - start for after, start in zip(counts(), before))
+        return responses, signed, valid, invalid
+
+    client.post("/auth/manual-register", json={"email": EMAIL, "password": "check-password"})
+    fresh = local_app.access_token(app, EMAIL)
+    expiring = local_app.access_token(
+        app, EMAIL, expires_delta=timedelta(seconds=config.JWT_REFRESH_THRESHOLD - 60))
+
+    print(f"fresh token ({args.requests} requests)")
+    responses, signed, valid, invalid = get("/auth/profile", fresh, args.requests)
+    check("every request answered 200", all(response.status_code == 200 for response in responses))
+    check(f"no {REFRESH_HEADER}, nothing signed",
+          signed == 0 and not any(REFRESH_HEADER in response.headers for response in responses))
+    check(f"one verification per request ({valid:.0f})", valid == args.requests and invalid == 0)
+
+    print(f"token with less than JWT_REFRESH_THRESHOLD ({config.JWT_REFRESH_THRESHOLD}s) left")
+    (response,), signed, valid, _ = get("/auth/profile", expiring)
+    refreshed = response.headers.get(REFRESH_HEADER)
+    check(f"{REFRESH_HEADER} sent, one token signed, one verification",
+          response.status_code == 200 and refreshed is not None and signed == 1 and valid == 1)
+    if refreshed is not None:
+        with app.app_context():
+            claims = decode_token(refreshed)
+        check("refreshed token: same identity, full lifetime",
+              claims["sub"] == EMAIL and claims["exp"] - time.time() > config.JWT_ACCESS_TOKEN_EXPIRES - 60)
+        (response,), signed, _, _ = get("/auth/profile", refreshed)
+        check("refreshed token works and is not refreshed again",
+              response.status_code == 200 and REFRESH_HEADER not in response.headers and signed == 0)
+
+    print("anonymous and invalid tokens")
+    (response,), signed, valid, invalid = get("/auth/universities")
+    check("anonymous request: nothing verified or signed", signed == valid == invalid == 0)
+    tampered = fresh[:-4] + ("AAAA" if fresh[-4:] != "AAAA" else "BBBB")
+    (response,), signed, valid, invalid = get("/auth/profile", tampered)
+    check(f"tampered token rejected ({response.status_code}) and counted as invalid",
+          response.status_code in (401, 422) and invalid >= 1 and valid == 0 and signed == 0)
+
+    print("flask_jwt_extended internals")
+    try:
+        jwt_tokens.check_internals()
+        matches = True
+    except RuntimeError as e:
+        print(f"  {e}")
+        matches = False
+    check(f"overridden JWTManager methods match ({jwt_tokens.flask_jwt_extended.__version__})", matches)
+    return check.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Checks the worker lifecycle (common.lifecycle, gunicorn.conf.py): readiness, warmup,
+per-process MongoDB clients and graceful reload.
+
+    python -m benchmarks.check_lifecycle                                  # in-process, mongomock
+    python -m benchmarks.check_lifecycle --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.check_lifecycle --gunicorn --start               # also under gunicorn
+    python -m benchmarks.check_lifecycle --gunicorn --mongo-uri mongodb://localhost:27017
+
+--start runs the local three-node replica set of benchmarks.check_read_routing. A real
+server must be a scratch one: the warmup creates indexes.
+
+In process:
+1. /healthz answers 200 at once; /readyz answers 503 until `warmup(app)` has run, 200 after.
+2. The warmup has created every hot-path index.
+3. A forked process gets its own MongoClient instead of the parent's.
+
+Under gunicorn (--gunicorn, Linux, needs a real server):
+4. Every worker reports ready.
+5. On SIGHUP, all workers are replaced. A request that is still uploading its body when
+   the signal arrives gets its response, and /healthz polled throughout never fails.
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks import local_app
+from benchmarks.checks import Checks, wait_for
+
+
+def children(pid):
+    """Pids of the processes whose parent is `pid` (Linux /proc)."""
+    found = set()
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            found.add(int(name))
+    return found
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def check_in_process(mongo_uri, check):
+    app, database, _ = local_app.build(mongo_uri)
+    from common import db as db_module
+    from common import lifecycle
+
+    client = app.test_client()
+    print("readiness")
+    check("/healthz answers 200 before warmup", client.get("/healthz").status_code == 200)
+    check("/readyz answers 503 before warmup", client.get("/readyz").status_code == 503)
+    started = time.perf_counter()
+    lifecycle.warmup(app)
+    check(f"/readyz answers 200 after warmup ({time.perf_counter() - started:.2f}s)",
+          client.get("/readyz").status_code == 200)
+
+    print("warmup")
+    for collection, indexes in lifecycle.HOT_PATH_INDEXES.items():
+        existing = [[tuple(key) for key in info["key"]] for info in database[collection].index_information().values()]
+        check(f"{collection}: hot-path indexes exist", all(list(keys) in existing for keys in indexes))
+
+    print("MongoDB clients")
+    parent = db_module.get_client()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        os.write(write, b"1" if db_module.get_client() is not parent else b"0")
+        os._exit(0)
+    os.close(write)
+    own_client = os.read(read, 1) == b"1"
+    os.close(read)
+    os.waitpid(pid, 0)
+    check("a forked process creates its own MongoClient", own_client)
+
+
+def slow_request(port, path):
+    """Sends the headers and half of a JSON body; the rest is sent by the returned function."""
+    body = b'{"email": "lifecycle@check.edu.tr", "password": "check-password"}'
+    sock = socket.create_connection(("127.0.0.1", port), timeout=30)
+    sock.sendall(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body[:len(body) // 2])
+
+    def finish():
+        sock.sendall(body[len(body) // 2:])
+        response = b""
+        while chunk := sock.recv(65536):
+            response += chunk
+        sock.close()
+        return response
+
+    return finish
+
+
+def check_gunicorn(mongo_uri, workers, check):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, MONGO_URI=mongo_uri, WEB_BIND=f"127.0.0.1:{port}", WEB_WORKERS=str(workers),
+               WEB_GRACEFUL_TIMEOUT="30")
+    env.setdefault("JWT_SECRET_KEY", "local-check-secret-key-0123456789abcdef")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"], cwd=root, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        print(f"gunicorn ({workers} workers)")
+        started = time.perf_counter()
+        ready = wait_for(lambda: len(children(master.pid)) == workers and all(
+            status(f"{base}/readyz") == 200 for _ in range(2 * workers)), timeout=120)
+        check(f"every worker is ready ({time.perf_counter() - started:.1f}s)", ready)
+        if not ready:
+            return
+
+        failures, polls = [], [0]
+        stop = threading.Event()
+
+        def poll():
+            while not stop.is_set():
+                code = status(f"{base}/healthz")
+                polls[0] += 1
+                if code != 200:
+                    failures.append(code)
+
+        poller = threading.Thread(target=poll, daemon=True)
+        poller.start()
+        old_workers = children(master.pid)
+        finish = slow_request(port, "/auth/signin")
+        time.sleep(0.5)
+        master.send_signal(signal.SIGHUP)
+        time.sleep(2)
+        response = finish()
+        check("request in flight during SIGHUP gets its response", response.startswith(b"HTTP/1.1 "))
+        replaced = wait_for(lambda: not children(master.pid) & old_workers
+                            and len(children(master.pid)) == workers, timeout=60)
+        check("SIGHUP replaces every worker", replaced)
+        check("new workers are ready", wait_for(lambda: status(f"{base}/readyz") == 200, timeout=60))
+        time.sleep(1)
+        stop.set()
+        poller.join()
+        check(f"/healthz never failed during the reload ({polls[0]} requests)", not failures)
+    finally:
+        master.terminate()
+        master.wait(timeout=60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker lifecycle check.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--start", action="store_true")
+    parser.add_argument("--gunicorn", action="store_true")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args(argv)
+    if args.gunicorn and not (args.start or args.mongo_uri):
+        parser.error("--gunicorn needs a real server: --start or --mongo-uri")
+
+    check = Checks(58)
+
+    stop = None
+    if args.start:
+        from benchmarks.check_read_routing import start_replica_set
+
+        args.mongo_uri, stop = start_replica_set()
+    try:
+        check_in_process(args.mongo_uri, check)
+        if args.gunicorn:
+            check_gunicorn(args.mongo_uri, args.workers, check)
+    finally:
+        if stop is not None:
+            stop()
+    return check.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Checks read-preference routing and causal consistency (common.db, common.causal)
+against a three-node replica set.
+
+    python -m benchmarks.check_read_routing --start
+    python -m benchmarks.check_read_routing --mongo-uri "mongodb://localhost:27117,localhost:27118,localhost:27119/?replicaSet=rs0"
+
+--start runs three local mongod processes (ports 27117-27119, temporary data
+directories) and tears them down afterwards; `mongod` must be on PATH.
+
+1. Reads through `db[...].for_reads(route)` for every route in READ_PREFERENCE_ROUTES
+   that is not primary are answered by a secondary; other reads by the primary.
+2. A message is written on the primary, then read on a secondary in a fresh session
+   advanced with the writer's X-Causal-Token. Every such read must see the write. The
+   same read without a token is repeated for comparison (stale reads are expected there
+   under replication lag, not required).
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bson import ObjectId
+from pymongo import MongoClient, monitoring
+
+PORTS = (27117, 27118, 27119)
+REPLICA_SET = "rs0"
+
+
+def start_replica_set():
+    root = tempfile.mkdtemp(prefix="blinder-rs-")
+    processes = []
+    for port in PORTS:
+        path = os.path.join(root, str(port))
+        os.makedirs(path)
+        processes.append(subprocess.Popen(
+            ["mongod", "--replSet", REPLICA_SET, "--port", str(port), "--dbpath", path,
+             "--bind_ip", "localhost", "--quiet", "--logpath", os.path.join(path, "mongod.log")]))
+
+    seed = MongoClient(f"mongodb://localhost:{PORTS[0]}", directConnection=True, serverSelectionTimeoutMS=20000)
+    seed.admin.command("replSetInitiate", {
+        "_id": REPLICA_SET,
+        "members": [{"_id": i, "host": f"localhost:{port}", "priority": 2 if i == 0 else 1}
+                    for i, port in enumerate(PORTS)]
+    })
+    uri = f"mongodb://{','.join(f'localhost:{p}' for p in PORTS)}/?replicaSet={REPLICA_SET}"
+    client = MongoClient(uri)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        status = client.admin.command("replSetGetStatus")
+        states = sorted(member["stateStr"] for member in status["members"])
+        if states == ["PRIMARY", "SECONDARY", "SECONDARY"]:
+            break
+        time.sleep(0.5)
+    else:
+        raise SystemExit("Replica set did not come up")
+    client.close()
+    seed.close()
+
+    def stop():
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(root, ignore_errors=True)
+
+    return uri, stop
+
+
+class ServerRecorder(monitoring.CommandListener):
+    """Remembers which server answered the last command of each thread."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.local.address = event.connection_id
+
+    def failed(self, event):
+        self.local.address = event.connection_id
+
+
+def check_routes(db_module, recorder):
+    client = db_module.get_client()
+    client.admin.command("ping")
+    primary = client.primary
+    ok = True
+    for route in sorted(set(db_module.READ_ROUTES) | {"unrouted"}):
+        collection = db_module.db["messages"].for_reads(route)
+        collection.find_one({})
+        on_primary = recorder.local.address == primary
+        expected_primary = db_module.read_preference(route) is None
+        status = "ok" if on_primary == expected_primary else "FAIL"
+        ok &= status == "ok"
+        print(f"  {route:14} {db_module.READ_ROUTES.get(route, 'primary'):20} "
+              f"-> {'primary' if on_primary else 'secondary'} {recorder.local.address} {status}")
+    return ok
+
+
+def check_causal(db_module, causal, rounds):
+    messages = db_module.db["messages"]
+    reads = messages.for_reads("conversation")
+    match_id = ObjectId()
+    stale_with_token = stale_without_token = 0
+    for i in range(rounds):
+        with causal.start_session() as writer:
+            inserted = messages.insert_one(
+                {"match_id": match_id, "sender_id": 1, "message_text": f"check {i}"}, session=writer).inserted_id
+            token = causal.decode_token(causal.encode_token(writer))
+        with causal.start_session(token) as reader:
+            if reads.find_one({"_id": inserted}, session=reader) is None:
+                stale_with_token += 1
+        if reads.find_one({"_id": inserted}) is None:
+            stale_without_token += 1
+    messages.delete_many({"match_id": match_id})
+    print(f"  stale reads with X-Causal-Token:    {stale_with_token}/{rounds}")
+    print(f"  stale reads without a token:        {stale_without_token}/{rounds}")
+    return stale_with_token == 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read routing and causal consistency check.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--start", action="store_true")
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args(argv)
+    if not args.start and not args.mongo_uri:
+        parser.error("either --start or --mongo-uri is required")
+
+    stop = None
+    uri = args.mongo_uri
+    if args.start:
+        uri, stop = start_replica_set()
+    try:
+        # Must happen before config (and common.db) is imported
+        os.environ["MONGO_URI"] = uri
+        recorder = ServerRecorder()
+        monitoring.register(recorder)
+        from common import causal, db as db_module
+
+        print("read routes")
+        routes_ok = check_routes(db_module, recorder)
+        print("causal consistency")
+        causal_ok = check_causal(db_module, causal, args.rounds)
+    finally:
+        if stop is not None:
+            stop()
+    return 0 if routes_ok and causal_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
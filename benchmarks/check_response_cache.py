@@ -0,0 +1,113 @@
+"""
+Checks conditional GET and the response cache (common.response_cache) through the
+cached endpoints.
+
+    python -m benchmarks.check_response_cache                     # in-memory mongomock
+    python -m benchmarks.check_response_cache --mongo-uri mongodb://localhost:27017
+
+A real server must be a scratch one: users are registered in `blinder.users`.
+
+1. Every cached view is sent with an ETag. Asked again, its body comes from the cache,
+   and with If-None-Match it is answered with 304; both read nothing but the version
+   counter in `cache_versions`.
+2. update-profile, photo upload and unmatch change the ETag of every view of the users
+   whose version they bump, and the old ETag is answered with 200; the views of other
+   users still get 304.
+"""
+import argparse
+import sys
+
+from benchmarks import local_app
+from benchmarks.checks import Checks
+
+PASSWORD = "check-password"
+PROFILE = {
+    "name": "ayse", "birthdate": "2000-05-05", "university": "Check Üniversitesi",
+    "university_location": "İstanbul", "gender": "Kadın", "gender_preference": "Erkek", "height": 170,
+    "relationship_goal": "Uzun süreli", "likes": ["müzik"], "values": ["dürüstlük"], "alcohol": "Hayır",
+    "smoking": "Hayır", "religion": "Belirtmek istemiyorum", "political_view": "Belirtmek istemiyorum",
+    "favorite_food": "mantı", "about": "Merhaba",
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conditional GET and response cache check.")
+    parser.add_argument("--mongo-uri")
+    args = parser.parse_args(argv)
+
+    app, database, reads = local_app.build(args.mongo_uri)
+    client = app.test_client()
+    check = Checks(64)
+
+    emails = ["ayse@check.edu.tr", "mehmet@check.edu.tr"]
+    for email in emails:
+        client.post("/auth/manual-register", json={"email": email, "password": PASSWORD})
+    database.users.update_one({"email": emails[1]}, {"$set": {
+        "name": "mehmet", "gender": "Erkek", "gender_preference": "Kadın", "university_location": "İstanbul",
+    }})
+    ayse, mehmet = [database.users.find_one({"email": email}, {"_id": 1})["_id"] for email in emails]
+    match_id = database.matches.insert_one({"user1_id": ayse, "user2_id": mehmet}).inserted_id
+    headers = {ayse: local_app.auth_headers(app, emails[0]), mehmet: local_app.auth_headers(app, emails[1])}
+    # name: (path, headers, user whose version the view is cached under)
+    views = {
+        "GET /auth/profile": ("/auth/profile", headers[ayse], ayse),
+        "GET /auth/photos": ("/auth/photos", headers[ayse], ayse),
+        f"GET /auth/user-photos/{mehmet}": (f"/auth/user-photos/{mehmet}", {}, mehmet),
+        "GET /match/my-matches (ayse)": ("/match/my-matches", headers[ayse], ayse),
+        "GET /match/my-matches (mehmet)": ("/match/my-matches", headers[mehmet], mehmet),
+    }
+
+    def get(name, etag=None):
+        path, view_headers, _ = views[name]
+        if etag is not None:
+            view_headers = {**view_headers, "If-None-Match": etag}
+        with reads.recording() as log:
+            response = client.get(path, headers=view_headers)
+            body = response.get_data()
+        return response, body, {collection for collection, _ in log}
+
+    print("cached views")
+    etags, bodies = {}, {}
+    for name in views:
+        response, bodies[name], _ = get(name)
+        etags[name] = response.headers.get("ETag")
+        check(f"{name}: 200 with an ETag", response.status_code == 200 and etags[name] is not None)
+        response, body, collections = get(name)
+        check("  ... again: same body, reads only cache_versions",
+              response.status_code == 200 and body == bodies[name] and collections <= {"cache_versions"})
+        response, body, collections = get(name, etags[name])
+        check("  ... If-None-Match: 304, reads only cache_versions",
+              response.status_code == 304 and not body and collections <= {"cache_versions"})
+
+    def changed_by(write, *user_ids):
+        response = write()
+        for name, (_, _, owner) in views.items():
+            new, body, _ = get(name, etags[name])
+            expected = 200 if owner in user_ids else 304
+            if new.status_code != expected:
+                return False
+            if expected == 200:
+                if new.headers.get("ETag") == etags[name]:
+                    return False
+                etags[name] = new.headers.get("ETag")
+        return response.status_code == 200
+
+    print("writes")
+    check("update-profile: views of ayse and of her match change", changed_by(
+        lambda: client.post("/auth/update-profile", json=PROFILE, headers=headers[ayse]), ayse, mehmet))
+    check("photo upload: only mehmet's views change", changed_by(
+        lambda: client.post("/auth/photos/upload", headers=headers[mehmet],
+                            json={"photos": [{"file_name": "check.jpg", "data": "aGVsbG8="}]}), mehmet))
+    check("unmatch: views of both users change", changed_by(
+        lambda: client.post("/match/unmatch", json={"match_id": str(match_id)}, headers=headers[ayse]),
+        ayse, mehmet))
+    profile = get("GET /auth/profile")[0].get_json()["user"]
+    photos = get(f"GET /auth/user-photos/{mehmet}")[0].get_json()["photos"]
+    matches = get("GET /match/my-matches (ayse)")[0].get_json()["matches"]
+    check("rebuilt views show the writes",
+          profile["favorite_food"] == PROFILE["favorite_food"] and len(photos) == 1 and matches == [])
+    return check.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Checks the streamed list endpoints (common.json_provider.stream_json): chunk sizes,
+time to the first batch and memory per request as the result grows.
+
+    python -m benchmarks.check_streaming                     # in-memory mongomock
+    python -m benchmarks.check_streaming --mongo-uri mongodb://localhost:27017
+
+A real server must be a scratch one: users, matches and messages are inserted.
+
+1. /message/conversation is streamed for every --sizes thread length, as valid JSON,
+   in chunks of STREAM_BATCH_SIZE messages whose size does not grow with the thread.
+2. With a real server, the traced memory peak of a request (tracemalloc) stays flat as
+   the thread grows, unlike building the whole list and serializing it at once, which
+   is shown for comparison. mongomock materialises every cursor, so there the peaks are
+   only reported.
+3. /match/my-matches is streamed in batches as well.
+"""
+import argparse
+import math
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks import local_app
+from benchmarks.checks import Checks
+
+TEXT = "Merhaba, bu mesaj akışın bellek kullanımını ölçmek için yazıldı. " * 2
+
+
+def measure(function):
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function()
+    return result, tracemalloc.get_traced_memory()[1] - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streamed JSON response check.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--sizes", default="1000,5000,20000", help="thread lengths")
+    parser.add_argument("--matches", type=int, default=250)
+    args = parser.parse_args(argv)
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    app, database, _ = local_app.build(args.mongo_uri)
+    from common.json_provider import STREAM_BATCH_SIZE
+    from flask import jsonify
+
+    client = app.test_client()
+    check = Checks(62)
+
+    email = "ayse@check.edu.tr"
+    user_id = database.users.insert_one({"_id": 910000, "email": email, "name": "ayse"}).inserted_id
+    headers = local_app.auth_headers(app, email)
+    started_at = datetime.utcnow()
+
+    def stream(path):
+        response = client.get(path, headers=headers, buffered=False)
+        started = time.perf_counter()
+        first_batch, chunks, largest = None, 0, 0
+        for chunk in response.response:
+            chunks += 1
+            # The object head and "[" come first
+            if chunks == 3:
+                first_batch = time.perf_counter() - started
+            largest = max(largest, len(chunk))
+        response.close()
+        return response.is_streamed, chunks, largest, first_batch, time.perf_counter() - started
+
+    print(f"/message/conversation ({STREAM_BATCH_SIZE} messages per batch)")
+    rows = []
+    tracemalloc.start()
+    try:
+        for size in sizes:
+            match_id = database.matches.insert_one({"user1_id": user_id, "user2_id": 910000 + size}).inserted_id
+            database.messages.insert_many([
+                {"match_id": match_id, "sender_id": user_id, "message_text": TEXT,
+                 "timestamp": started_at + timedelta(milliseconds=i)}
+                for i in range(size)
+            ])
+            path = f"/message/conversation?match_id={match_id}"
+            body = client.get(path, headers=headers).get_json()
+            check(f"{size} messages: valid JSON in timestamp order",
+                  len(body["messages"]) == size
+                  and body["messages"] == sorted(body["messages"], key=lambda message: message["timestamp"]))
+            (streamed, chunks, largest, first_batch, total), peak = measure(lambda: stream(path))
+
+            def whole_list():
+                with app.test_request_context():
+                    cursor = database.messages.find({"match_id": match_id}).sort("timestamp", 1)
+                    return len(jsonify({"messages": list(cursor)}).get_data())
+
+            _, list_peak = measure(whole_list)
+            check(f"  ... streamed in {chunks} chunks", streamed and chunks >= math.ceil(size / STREAM_BATCH_SIZE))
+            rows.append((size, chunks, largest, first_batch, total, peak, list_peak))
+    finally:
+        tracemalloc.stop()
+
+    print(f"\n  {'messages':>8} {'chunks':>7} {'max chunk':>10} {'first batch':>12} {'total':>8}"
+          f" {'peak':>9} {'list peak':>10}")
+    for size, chunks, largest, first_batch, total, peak, list_peak in rows:
+        print(f"  {size:>8} {chunks:>7} {largest:>9}B {first_batch * 1000:>10.1f}ms {total * 1000:>6.0f}ms"
+              f" {peak / 1024:>7.0f}KB {list_peak / 1024:>8.0f}KB")
+    print()
+    largest_chunks = [row[2] for row in rows]
+    check("largest chunk does not grow with the thread", max(largest_chunks) <= 1.1 * min(largest_chunks))
+    if args.mongo_uri:
+        peaks = [row[5] for row in rows]
+        check("memory peak stays flat as the thread grows", peaks[-1] <= 2 * peaks[0] + 256 * 1024)
+    else:
+        print("  (mongomock materialises cursors: memory peaks are for reference only)")
+
+    print("/match/my-matches")
+    database.users.insert_many([{"_id": 920000 + i, "email": f"{i}@check.edu.tr", "name": f"user{i}"}
+                                for i in range(args.matches)])
+    database.matches.insert_many([{"user1_id": user_id, "user2_id": 920000 + i, "matched_at": started_at}
+                                  for i in range(args.matches)])
+    streamed, chunks, _, _, _ = stream("/match/my-matches")
+    body = client.get("/match/my-matches", headers=headers).get_json()
+    check(f"{args.matches} matches streamed in {chunks} chunks",
+          streamed and chunks >= math.ceil(args.matches / STREAM_BATCH_SIZE)
+          and sum(match["name"].startswith("user") for match in body["matches"]) == args.matches)
+    return check.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Checks the Spotify top-list cache (spotify.top_cache) against the fake Spotify API
+(benchmarks.fake_upstreams), with short TTLs so that expiry happens within the run.
+
+    python -m benchmarks.check_top_cache                     # in-memory mongomock
+    python -m benchmarks.check_top_cache --mongo-uri mongodb://localhost:27017
+
+A real server must be a scratch one. The fake API answers after --latency seconds.
+
+1. The first view fetches both lists from Spotify; later views within SPOTIFY_TOP_TTL
+   and other users' views (/spotify/top/<id>) make no Spotify call and do not wait.
+2. A view after the TTL is answered at once from the stale lists and refreshed in the
+   background.
+3. Without any view, the background refresher renews lists before they expire.
+4. The refresher runs in one process only: the one holding SPOTIFY_TOP_REFRESH_LOCK_PATH.
+"""
+import argparse
+import fcntl
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import local_app
+from benchmarks.checks import Checks, wait_for
+from benchmarks.fake_upstreams import FakeUpstreams
+
+TTL = 3
+SCAN_INTERVAL = 0.5
+
+
+def spotify_calls(upstreams):
+    return sum(count for key, count in upstreams.counts.items() if key.startswith("GET /spotify-api/v1/me/top/"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spotify top-list cache check.")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--views", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    upstreams = FakeUpstreams(spotify_latency=args.latency, key_bits=1024).start()
+    lock_path = os.path.join(tempfile.mkdtemp(prefix="blinder-check-"), "spotify-top.lock")
+    try:
+        app, database, _ = local_app.build(
+            args.mongo_uri, **upstreams.env(), SPOTIFY_TOP_TTL=TTL, SPOTIFY_TOP_STALE_TTL=3600,
+            SPOTIFY_TOP_REFRESH_AHEAD=0.5, SPOTIFY_TOP_SCAN_INTERVAL=SCAN_INTERVAL,
+            SPOTIFY_TOP_REFRESH_LOCK_PATH=lock_path, SPOTIFY_TOP_REFRESH_ELECTION_INTERVAL=0.1)
+        from spotify.top_cache import top_cache
+
+        # As gunicorn's post_worker_init does in every worker
+        top_cache.ensure_refresher()
+        client = app.test_client()
+        check = Checks(62)
+
+        owner, viewer = 900001, 900002
+        for user_id in (owner, viewer):
+            database.users.insert_one({"_id": user_id, "email": f"{user_id}@check.edu.tr"})
+        database.spotify.insert_one({
+            "user_id": owner, "spotify_access_token": "fake-token", "spotify_refresh_token": "fake-refresh",
+            "spotify_token_expires_at": datetime.utcnow() + timedelta(hours=1),
+        })
+        owner_headers = local_app.auth_headers(app, f"{owner}@check.edu.tr")
+        viewer_headers = local_app.auth_headers(app, f"{viewer}@check.edu.tr")
+
+        def timed(path, headers):
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            return response, time.perf_counter() - started
+
+        print("fresh lists")
+        response, elapsed = timed("/spotify/top", owner_headers)
+        check("first view fetches tracks and artists from Spotify",
+              response.status_code == 200 and spotify_calls(upstreams) == 2)
+        slowest = max(timed("/spotify/top", owner_headers)[1] for _ in range(args.views))
+        check(f"{args.views} more views within the TTL: no Spotify call", spotify_calls(upstreams) == 2)
+        check(f"  ... and none waits on Spotify (slowest {slowest * 1000:.0f} ms)", slowest < args.latency)
+        response, _ = timed(f"/spotify/top/{owner}", viewer_headers)
+        check("another user's view is served from the cache",
+              response.status_code == 200 and response.get_json()["tracks"] and spotify_calls(upstreams) == 2)
+
+        def fetched_at():
+            return database.spotify.find_one({"user_id": owner})["top_lists"]["tracks"]["fetched_at"]
+
+        print("stale lists")
+        # Keep the background refresher out of the way until the lists are stale
+        database.spotify.update_one({"user_id": owner}, {"$set": {
+            "top_lists_lease_until": datetime.utcnow() + timedelta(seconds=TTL + 1)}})
+        time.sleep(TTL + 1.2)
+        database.spotify.update_one({"user_id": owner}, {"$unset": {"top_lists_lease_until": ""}})
+        stale = fetched_at()
+        response, elapsed = timed("/spotify/top", owner_headers)
+        check(f"stale view answers without waiting ({elapsed * 1000:.0f} ms)",
+              response.status_code == 200 and elapsed < args.latency and response.get_json()["tracks"])
+        check("stale lists are refreshed in the background", wait_for(lambda: fetched_at() > stale, timeout=10))
+
+        print("refresh ahead of expiry")
+        # A scan may have picked the stale user up as well; let it finish
+        time.sleep(2 * args.latency + SCAN_INTERVAL)
+        before, previous = spotify_calls(upstreams), fetched_at()
+        renewed = wait_for(lambda: fetched_at() > previous, timeout=TTL + 2 * SCAN_INTERVAL + 2)
+        check(f"lists are renewed with no view {TTL - (fetched_at() - previous).total_seconds():.1f} s "
+              f"before they expire", renewed and spotify_calls(upstreams) > before
+              and fetched_at() - previous < timedelta(seconds=TTL))
+
+        print("single refresher")
+        pid = os.fork()
+        if pid == 0:
+            with open(lock_path, "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os._exit(1)
+                except BlockingIOError:
+                    os._exit(0)
+        _, code = os.waitpid(pid, 0)
+        check("another worker cannot take the refresher lock", os.waitstatus_to_exitcode(code) == 0)
+    finally:
+        upstreams.stop()
+    return check.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
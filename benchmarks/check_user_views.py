@@ -0,0 +1,92 @@
+"""
+Checks the projection-driven user views (common.users) through the endpoints.
+
+    python -m benchmarks.check_user_views                     # in-memory mongomock
+    python -m benchmarks.check_user_views --mongo-uri mongodb://localhost:27017
+
+A real server must be a scratch one: users are registered in `blinder.users`.
+
+1. manual-register and signin never return the password hash.
+2. Every read of `users` names a projection; only sign-in reads the password.
+3. Per endpoint: `users` reads, projected fields and response size, for comparison
+   with a full-document read.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks import local_app
+from benchmarks.checks import Checks
+
+PASSWORD = "check-password"
+
+
+def _contains_key(value, key):
+    if isinstance(value, dict):
+        return key in value or any(_contains_key(item, key) for item in value.values())
+    if isinstance(value, list):
+        return any(_contains_key(item, key) for item in value)
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="User view projection check.")
+    parser.add_argument("--mongo-uri")
+    args = parser.parse_args(argv)
+
+    app, database, reads = local_app.build(args.mongo_uri)
+    client = app.test_client()
+    check = Checks(60)
+
+    emails = ["ayse@check.edu.tr", "mehmet@check.edu.tr"]
+    print("password hash")
+    registered = [client.post("/auth/manual-register", json={"email": email, "password": PASSWORD})
+                  for email in emails]
+    check("manual-register responds without a password field",
+          all(r.status_code == 200 and not _contains_key(r.get_json(), "password") for r in registered))
+    for email, gender, preference in ((emails[0], "Kadın", "Erkek"), (emails[1], "Erkek", "Kadın")):
+        database.users.update_one({"email": email}, {"$set": {
+            "name": email.split("@")[0], "gender": gender, "gender_preference": preference,
+            "university_location": "İstanbul", "university": "Check Üniversitesi",
+        }})
+    ids = [database.users.find_one({"email": email}, {"_id": 1})["_id"] for email in emails]
+    database.matches.insert_one({"user1_id": ids[0], "user2_id": ids[1]})
+
+    headers = local_app.auth_headers(app, emails[0])
+    calls = [
+        ("POST /auth/signin", lambda: client.post("/auth/signin", json={"email": emails[0], "password": PASSWORD})),
+        ("GET /auth/profile", lambda: client.get("/auth/profile", headers=headers)),
+        ("GET /match/potential", lambda: client.get("/match/potential", headers=headers)),
+        ("GET /match/my-matches", lambda: client.get("/match/my-matches", headers=headers)),
+    ]
+    full_document = len(json.dumps(database.users.find_one({"email": emails[0]}), default=str))
+    report = []
+    unprojected, password_reads = [], []
+    for name, call in calls:
+        with reads.recording() as log:
+            response = call()
+            body = response.get_data()
+        users_reads = [projection for collection, projection in log if collection == "users"]
+        for projection in users_reads:
+            if not projection:
+                unprojected.append(name)
+            elif "password" in projection and name != "POST /auth/signin":
+                password_reads.append(name)
+        fields = max((len(projection or {}) for projection in users_reads), default=0)
+        report.append((name, response.status_code, len(users_reads), fields, len(body)))
+        if name == "POST /auth/signin":
+            check("signin responds without a password field",
+                  response.status_code == 200 and not _contains_key(response.get_json(), "password"))
+
+    print("projections")
+    check("every users read names a projection", not unprojected)
+    check("only signin reads the password hash", not password_reads)
+    print(f"\n  {'endpoint':24} {'status':>6} {'users reads':>12} {'max fields':>11} {'bytes':>7}"
+          f"   (full users document: {full_document} bytes)")
+    for name, status, count, fields, size in report:
+        print(f"  {name:24} {status:>6} {count:>12} {fields:>11} {size:>7}")
+    return check.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
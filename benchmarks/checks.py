@@ -0,0 +1,38 @@
+"""
+Pass/fail reporting shared by the check_* scripts.
+
+    check = Checks(width=62)
+    check("every request answered 200", ok)
+    ...
+    return check.exit_code()
+"""
+import time
+
+
+class Checks:
+    def __init__(self, width=60):
+        self.width = width
+        self.results = []
+
+    def __call__(self, name, ok):
+        ok = bool(ok)
+        self.results.append(ok)
+        print(f"  {name:{self.width}} {'ok' if ok else 'FAIL'}")
+        return ok
+
+    @property
+    def passed(self):
+        return all(self.results)
+
+    def exit_code(self):
+        return 0 if self.passed else 1
+
+
+def wait_for(predicate, timeout, interval=0.05):
+    """True as soon as `predicate()` is, False if it is still false after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return False
@@ -0,0 +1,204 @@
+"""
+Local stand-ins for Google, Microsoft and Spotify, used by the benchmarks.
+
+One threaded HTTP server answers every upstream under a path prefix:
+
+    /google/certs                                   Google v1 certs (kid -> RSA public key PEM)
+    /microsoft/<tenant>/discovery/v2.0/keys         Microsoft JWKS (n/e only)
+    /microsoft/<tenant>/v2.0/.well-known/openid-configuration   Microsoft OpenID metadata
+    /microsoft/<tenant>/oauth2/v2.0/token           code exchange; the code is the user's e-mail
+    /spotify-accounts/api/token                     Spotify token + refresh
+    /spotify-api/v1/me, /v1/me/top/{tracks,artists} Spotify Web API
+
+`env()` returns the config overrides that point the app at it. Latency and
+429 responses (with Retry-After) can be injected for the Spotify API.
+"""
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import rsa
+from google.auth import crypt, jwt as google_jwt
+
+GOOGLE_CLIENT_ID = "bench-google-client"
+MICROSOFT_CLIENT_ID = "bench-microsoft-client"
+MICROSOFT_TENANT_ID = "common"
+MICROSOFT_TID = "9188040d-6c67-4c5b-b112-36a304b66dad"
+
+
+def _b64url_uint(value):
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+class FakeUpstreams:
+    def __init__(self, spotify_latency=0.0, spotify_429_rate=0.0, retry_after=1, key_bits=2048, seed=0,
+                 keys_max_age=3600):
+        self.spotify_latency = spotify_latency
+        self.spotify_429_rate = spotify_429_rate
+        self.retry_after = retry_after
+        self.keys_max_age = keys_max_age
+        self.key_bits = key_bits
+        self.rng = random.Random(seed)
+        self.key_serial = 0
+        self.rotate_key()
+        self.counts = {}
+        self._lock = threading.Lock()
+        self.server = None
+
+    # --- tokens ---------------------------------------------------------------
+
+    def rotate_key(self):
+        """Signs from now on with a new key under a new kid; only the new key is published."""
+        self.key_serial += 1
+        self.kid = f"bench-key-{self.key_serial}"
+        public_key, private_key = rsa.newkeys(self.key_bits)
+        self.public_key = public_key
+        self.signer = crypt.RSASigner.from_string(private_key.save_pkcs1().decode(), key_id=self.kid)
+
+    def google_id_token(self, email, name="", **claims):
+        now = int(time.time())
+        return google_jwt.encode(self.signer, {
+            "iss": "https://accounts.google.com", "aud": GOOGLE_CLIENT_ID, "sub": email,
+            "email": email, "name": name, "iat": now, "exp": now + 3600, **claims
+        }).decode()
+
+    def microsoft_id_token(self, email, name="", **claims):
+        now = int(time.time())
+        return google_jwt.encode(self.signer, {
+            "iss": f"https://login.microsoftonline.com/{MICROSOFT_TID}/v2.0", "aud": MICROSOFT_CLIENT_ID,
+            "tid": MICROSOFT_TID, "sub": email, "email": email, "name": name, "iat": now, "exp": now + 3600,
+            **claims
+        }).decode()
+
+    # --- server ---------------------------------------------------------------
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        return {
+            "GOOGLE_CLIENT_ID": GOOGLE_CLIENT_ID,
+            "GOOGLE_CERTS_URL": f"{self.base_url}/google/certs",
+            "MICROSOFT_CLIENT_ID": MICROSOFT_CLIENT_ID,
+            "MICROSOFT_TENANT_ID": MICROSOFT_TENANT_ID,
+            "MICROSOFT_LOGIN_URL": f"{self.base_url}/microsoft",
+            "MICROSOFT_JWKS_URL": f"{self.base_url}/microsoft/{MICROSOFT_TENANT_ID}/discovery/v2.0/keys",
+            "SPOTIFY_ACCOUNTS_URL": f"{self.base_url}/spotify-accounts",
+            "SPOTIFY_API_URL": f"{self.base_url}/spotify-api",
+        }
+
+    def start(self):
+        upstreams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                upstreams._handle(self, "GET")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.form = parse_qs(self.rfile.read(length).decode()) if length else {}
+                upstreams._handle(self, "POST")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-upstreams", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _handle(self, handler, method):
+        path = urlsplit(handler.path).path
+        self._count(f"{method} {path}")
+
+        if path == "/google/certs":
+            pem = self.public_key.save_pkcs1().decode()
+            return handler._send(200, {self.kid: pem}, {"Cache-Control": f"public, max-age={self.keys_max_age}"})
+
+        if path.startswith("/microsoft/") and path.endswith("/discovery/v2.0/keys"):
+            jwk = {"kty": "RSA", "use": "sig", "kid": self.kid,
+                   "n": _b64url_uint(self.public_key.n), "e": _b64url_uint(self.public_key.e)}
+            return handler._send(200, {"keys": [jwk]}, {"Cache-Control": f"public, max-age={self.keys_max_age}"})
+
+        if path.startswith("/microsoft/") and path.endswith("/v2.0/.well-known/openid-configuration"):
+            tenant = path.split("/")[2]
+            return handler._send(200, {
+                "issuer": "https://login.microsoftonline.com/{tenantid}/v2.0",
+                "jwks_uri": f"{self.base_url}/microsoft/{tenant}/discovery/v2.0/keys",
+            }, {"Cache-Control": f"public, max-age={self.keys_max_age}"})
+
+        if path.startswith("/microsoft/") and path.endswith("/oauth2/v2.0/token"):
+            email = handler.form.get("code", [""])[0]
+            return handler._send(200, {"id_token": self.microsoft_id_token(email), "access_token": uuid.uuid4().hex})
+
+        if path == "/spotify-accounts/api/token":
+            return handler._send(200, {
+                "access_token": f"fake-{uuid.uuid4().hex}", "token_type": "Bearer",
+                "expires_in": 3600, "refresh_token": f"fake-refresh-{uuid.uuid4().hex}"
+            })
+
+        if path.startswith("/spotify-api/"):
+            if self.spotify_latency:
+                time.sleep(self.spotify_latency)
+            with self._lock:
+                throttled = self.rng.random() < self.spotify_429_rate
+            if throttled:
+                self._count("429 injected")
+                return handler._send(429, {"error": {"status": 429, "message": "rate limited"}},
+                                     {"Retry-After": str(self.retry_after)})
+            if not handler.headers.get("Authorization", "").startswith("Bearer "):
+                return handler._send(401, {"error": {"status": 401, "message": "No token provided"}})
+            if path == "/spotify-api/v1/me":
+                return handler._send(200, {"id": uuid.uuid4().hex[:22]})
+            if path == "/spotify-api/v1/me/top/tracks":
+                return handler._send(200, {"items": [self._track(i) for i in range(10)]})
+            if path == "/spotify-api/v1/me/top/artists":
+                return handler._send(200, {"items": [self._artist(i) for i in range(10)]})
+
+        handler._send(404, {"error": "not found"})
+
+    def _artist(self, i):
+        artist_id = self.rng.randrange(500)
+        return {
+            "name": f"Artist {artist_id}",
+            "images": [{"url": f"https://i.scdn.co/image/artist{artist_id}"}],
+            "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"}
+        }
+
+    def _track(self, i):
+        track_id = self.rng.randrange(5000)
+        return {
+            "name": f"Track {track_id}",
+            "artists": [{"name": f"Artist {track_id % 500}"}],
+            "album": {"images": [{"url": f"https://i.scdn.co/image/album{track_id}"}]},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"}
+        }
@@ -0,0 +1,141 @@
+"""
+The app wired to an in-memory mongomock (default) or a real MongoDB, for the check_*
+scripts that drive it through the Flask test client.
+
+    app, database, reads = local_app.build()                      # mongomock
+    app, database, reads = local_app.build("mongodb://localhost")  # real server
+
+`reads` records every find/aggregate as (collection, projection); use
+`with reads.recording() as log:` around the requests to inspect. mongomock has no
+sessions, so the causal session (common.causal) is replaced by a no-op there.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+
+class _NoSession:
+    operation_time = None
+    cluster_time = None
+
+    def advance_cluster_time(self, cluster_time):
+        pass
+
+    def advance_operation_time(self, operation_time):
+        pass
+
+    def end_session(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.end_session()
+
+
+class ReadRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self._log = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def recording(self):
+        log = self._log = []
+        try:
+            yield log
+        finally:
+            self._log = None
+
+    def record(self, collection, projection):
+        log = self._log
+        if log is not None:
+            with self._lock:
+                log.append((collection, projection))
+
+    # Real server: command monitoring
+    def started(self, event):
+        if event.command_name in ("find", "aggregate"):
+            self.record(event.command[event.command_name], event.command.get("projection"))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    # mongomock: find_one and every cursor go through Collection.find
+    def patch_mongomock(self):
+        from mongomock.collection import Collection
+
+        recorder = self
+        find, aggregate = Collection.find, Collection.aggregate
+
+        def recorded_find(collection, filter=None, projection=None, *args, **kwargs):
+            recorder.record(collection.name, projection)
+            return find(collection, filter, projection, *args, **kwargs)
+
+        def recorded_aggregate(collection, pipeline, *args, **kwargs):
+            recorder.record(collection.name, None)
+            return aggregate(collection, pipeline, *args, **kwargs)
+
+        Collection.find, Collection.aggregate = recorded_find, recorded_aggregate
+
+    @staticmethod
+    def patch_mongomock_bulk_write():
+        """mongomock 4.x cannot add the UpdateOne of newer pymongo versions to a bulk."""
+        from mongomock.collection import Collection
+        from pymongo.operations import UpdateOne
+
+        bulk_write = Collection.bulk_write
+
+        def unbatched_bulk_write(collection, requests, *args, **kwargs):
+            requests = list(requests)
+            if not all(isinstance(request, UpdateOne) for request in requests):
+                return bulk_write(collection, requests, *args, **kwargs)
+            for request in requests:
+                collection.update_one(request._filter, request._doc, upsert=request._upsert)
+
+        Collection.bulk_write = unbatched_bulk_write
+
+
+def build(mongo_uri=None, **env):
+    """Creates the app; environment overrides must come before config is imported."""
+    os.environ.setdefault("JWT_SECRET_KEY", "local-check-secret-key-0123456789abcdef")
+    os.environ["INVALIDATION_ENABLED"] = "false"
+    os.environ.update({key: str(value) for key, value in env.items()})
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+    reads = ReadRecorder()
+    monitoring.register(reads)
+
+    from common import db as db_module
+
+    if not mongo_uri:
+        import mongomock
+
+        client = mongomock.MongoClient()
+        client.start_session = lambda **kwargs: _NoSession()
+        db_module._client, db_module._client_pid = client, os.getpid()
+        reads.patch_mongomock()
+        reads.patch_mongomock_bulk_write()
+
+    import main
+
+    app = main.create_app()
+    return app, db_module.get_database(), reads
+
+
+def access_token(app, email, expires_delta=None):
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        if expires_delta is None:
+            return create_access_token(identity=email)
+        return create_access_token(identity=email, expires_delta=expires_delta)
+
+
+def auth_headers(app, email, **kwargs):
+    return {"Authorization": f"Bearer {access_token(app, email, **kwargs)}"}
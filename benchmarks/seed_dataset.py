@@ -0,0 +1,417 @@
+"""
+Deterministic synthetic dataset for load testing.
+
+    python -m benchmarks.seed_dataset --users 1000000 --swipes 100000000 --seed 42 --drop
+
+Every document (including ObjectIds and timestamps) is derived from --seed, so two
+runs with the same arguments produce identical databases. All users share the
+password given by --password so benchmarks can sign in as any of them.
+"""
+import argparse
+import base64
+import hashlib
+import math
+import random
+import struct
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+from bson import ObjectId
+from pymongo import ASCENDING, GEOSPHERE, MongoClient
+
+from login.zodiac import get_zodiac_sign
+
+BASE_TIME = datetime(2025, 1, 1)
+BASE_TS = int((BASE_TIME - datetime(1970, 1, 1)).total_seconds())
+
+FIRST_NAMES = [
+    "Ahmet", "Mehmet", "Mustafa", "Emre", "Can", "Burak", "Mert", "Kerem", "Yusuf", "Deniz",
+    "Ayşe", "Fatma", "Zeynep", "Elif", "Ece", "Selin", "Merve", "Defne", "İrem", "Ceren"
+]
+LAST_NAMES = [
+    "Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Yıldırım", "Öztürk", "Aydın", "Özdemir",
+    "Arslan", "Doğan", "Kılıç", "Aslan", "Çetin", "Kara", "Koç", "Kurt", "Özkan", "Şimşek"
+]
+GENDERS = ["Erkek", "Kadın"]
+RELATIONSHIP_GOALS = ["Uzun süreli ilişki", "Kısa süreli ilişki", "Arkadaşlık", "Henüz emin değilim"]
+LIKES = [
+    "Müzik", "Spor", "Seyahat", "Kitap", "Sinema", "Fotoğrafçılık", "Dans", "Yemek yapmak",
+    "Oyun", "Doğa yürüyüşü", "Yoga", "Sanat", "Kahve", "Tiyatro", "Konser"
+]
+VALUES = ["Dürüstlük", "Sadakat", "Empati", "Mizah", "Özgürlük", "Aile", "Kariyer", "Saygı", "Macera", "Sorumluluk"]
+ALCOHOL = ["Hiç", "Sosyal olarak", "Sık sık"]
+SMOKING = ["İçmiyorum", "Sosyal olarak", "İçiyorum"]
+RELIGION = ["İslam", "Hristiyanlık", "Yahudilik", "Ateist", "Agnostik", "Belirtmek istemiyorum"]
+POLITICAL_VIEWS = ["Sol", "Merkez", "Sağ", "Apolitik", "Belirtmek istemiyorum"]
+FOODS = ["Pizza", "Sushi", "Kebap", "Mantı", "Lahmacun", "Burger", "Makarna", "Salata", "Köfte", "Döner"]
+MESSAGES = [
+    "Merhaba!", "Nasılsın?", "Bu hafta sonu ne yapıyorsun?", "Kampüste hiç görmedim seni :)",
+    "Hangi bölümdesin?", "Kahve içmeye ne dersin?", "En sevdiğin şarkı ne?", "Çok güzel bir gün!",
+    "Bence de", "Haha", "Yarın müsait misin?", "Görüşürüz!"
+]
+CUISINES = ["Türk", "İtalyan", "Uzak Doğu", "Fast Food", "Kahve", "Tatlı", "Ev yemekleri", "Deniz ürünleri"]
+CITIES = [
+    ("İstanbul", 41.0082, 28.9784), ("Ankara", 39.9334, 32.8597), ("İzmir", 38.4237, 27.1428),
+    ("Bursa", 40.1885, 29.0610), ("Antalya", 36.8969, 30.7133), ("Eskişehir", 39.7767, 30.5206),
+    ("Konya", 37.8746, 32.4932), ("Trabzon", 41.0027, 39.7168), ("Kayseri", 38.7205, 35.4826),
+    ("Samsun", 41.2867, 36.3300), ("Adana", 37.0000, 35.3213), ("Gaziantep", 37.0662, 37.3833)
+]
+UNIVERSITY_SUFFIXES = ["Üniversitesi", "Teknik Üniversitesi", "Bilim Üniversitesi", "Sanat Üniversitesi"]
+
+# Filled in by the pool initializer in every worker process
+_args = None
+_db = None
+_cities = None
+
+
+def rng_for(*parts):
+    """Independent, reproducible random stream for the given key."""
+    return random.Random(":".join(str(p) for p in (_args.seed,) + parts))
+
+
+def oid(ts_offset, namespace, a, b=0):
+    """Deterministic ObjectId: creation time, then a namespace-unique 8-byte suffix."""
+    return ObjectId(struct.pack(">I", BASE_TS + int(ts_offset)) + struct.pack(">BIHB", namespace, a, b >> 8, b & 0xFF))
+
+
+def password_hash(password, iterations):
+    """werkzeug-compatible pbkdf2 hash with a fixed salt, so the output is reproducible."""
+    salt = "blinderseed"
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations).hex()
+    return f"pbkdf2:sha256:{iterations}${salt}${digest}"
+
+
+def build_cities(count):
+    cities = []
+    for index in range(count):
+        if index < len(CITIES):
+            cities.append(CITIES[index])
+        else:
+            name, lat, lng = CITIES[index % len(CITIES)]
+            cities.append((f"{name} {index // len(CITIES) + 1}", lat + 0.05 * (index // len(CITIES)), lng))
+    return cities
+
+
+def location_oid(index):
+    return oid(0, 1, index)
+
+
+def university_names(city, count):
+    return [f"{city} {UNIVERSITY_SUFFIXES[i % len(UNIVERSITY_SUFFIXES)]}" + (f" {i // len(UNIVERSITY_SUFFIXES) + 1}" if i >= len(UNIVERSITY_SUFFIXES) else "")
+            for i in range(count)]
+
+
+# --- user id layout -------------------------------------------------------------
+# user_id = k * L + loc + 1, where L is the number of locations. That puts every
+# user's location and gender (parity of k) in the id itself, so swipe targets in
+# the same location can be sampled without any lookup tables.
+
+def user_location(user_id):
+    return (user_id - 1) % _args.locations
+
+
+def user_k(user_id):
+    return (user_id - 1) // _args.locations
+
+
+def user_gender(user_id):
+    return GENDERS[user_k(user_id) % 2]
+
+
+def pool_size(loc, parity):
+    """How many users in location `loc` have k with the given parity."""
+    in_location = (_args.users - loc + _args.locations - 1) // _args.locations
+    return (in_location + (1 - parity)) // 2
+
+
+def user_from(loc, parity, j):
+    return (2 * j + parity) * _args.locations + loc + 1
+
+
+def gender_preference(rng, gender):
+    roll = rng.random()
+    opposite = GENDERS[1 - GENDERS.index(gender)]
+    if roll < 0.85:
+        return opposite
+    if roll < 0.95:
+        return gender
+    return "İkisi de"
+
+
+def make_user(user_id):
+    rng = rng_for("user", user_id)
+    loc = user_location(user_id)
+    city = _cities[loc][0]
+    gender = user_gender(user_id)
+    first = rng.choice(FIRST_NAMES[:10] if gender == "Erkek" else FIRST_NAMES[10:])
+    birthdate = datetime(1998, 1, 1) + timedelta(days=rng.randrange(365 * 8))
+    universities = university_names(city, _args.universities_per_location)
+    return {
+        "_id": user_id,
+        "name": f"{first} {rng.choice(LAST_NAMES)}",
+        "email": f"user{user_id}@seed{loc}.edu.tr",
+        "password": _args.password_hash,
+        "picture": "",
+        "locale": "tr",
+        "created_at": BASE_TIME + timedelta(seconds=rng.randrange(86400 * 180)),
+        "university": rng.choice(universities),
+        "university_location": city,
+        "birthdate": birthdate.strftime("%Y-%m-%d"),
+        "zodiac_sign": get_zodiac_sign(birthdate),
+        "gender": gender,
+        "gender_preference": gender_preference(rng, gender),
+        "height": rng.randint(155, 195) if gender == "Erkek" else rng.randint(150, 182),
+        "relationship_goal": rng.choice(RELATIONSHIP_GOALS),
+        "likes": rng.sample(LIKES, rng.randint(1, 5)),
+        "values": rng.sample(VALUES, rng.randint(1, 4)),
+        "alcohol": rng.choice(ALCOHOL),
+        "smoking": rng.choice(SMOKING),
+        "religion": rng.choice(RELIGION),
+        "political_view": rng.choice(POLITICAL_VIEWS),
+        "favorite_food": rng.sample(FOODS, rng.randint(1, 3)),
+        "about": " ".join(rng.sample(MESSAGES, 2))
+    }
+
+
+def swipe_count(rng):
+    """Power-law (Pareto) activity with mean --swipes / --users, capped per user."""
+    mean = _args.swipes / max(_args.users, 1)
+    alpha = _args.activity_alpha
+    x_m = mean * (alpha - 1) / alpha
+    return min(int(x_m * rng.paretovariate(alpha)), _args.max_swipes_per_user)
+
+
+def swipe_targets(user_id, rng, preference):
+    loc = user_location(user_id)
+    parities = [0, 1] if preference == "İkisi de" else [GENDERS.index(preference)]
+    pools = [(parity, pool_size(loc, parity)) for parity in parities]
+    total = sum(size for _, size in pools)
+    count = min(swipe_count(rng), max(total - 1, 0))
+    picks = rng.sample(range(total), count + 1) if count else []
+    targets = []
+    for pick in picks:
+        for parity, size in pools:
+            if pick < size:
+                target = user_from(loc, parity, pick)
+                break
+            pick -= size
+        if target != user_id and len(targets) < count:
+            targets.append(target)
+    return targets
+
+
+def make_activity(user):
+    """Swipes by `user`, plus the reciprocal likes, matches and messages they start."""
+    user_id = user["_id"]
+    rng = rng_for("swipes", user_id)
+    swipes, matches, messages = [], [], []
+    start = (user["created_at"] - BASE_TIME).total_seconds()
+    for n, target in enumerate(swipe_targets(user_id, rng, user["gender_preference"])):
+        ts = start + rng.randrange(86400 * 30)
+        action = "like" if rng.random() < _args.like_rate else "dislike"
+        # Swipe n of a user and its reciprocal like: suffix (n << 1) | reciprocal, n < 2**23
+        swipes.append({"_id": oid(ts, 9, user_id, n << 1), "swiper_id": user_id, "swipee_id": target,
+                       "action": action, "timestamp": BASE_TIME + timedelta(seconds=ts)})
+        if action != "like" or rng.random() >= _args.match_rate or n >= 65536:
+            continue
+
+        # The reciprocal like is written here rather than derived from the target's own
+        # sample, so a pair can occasionally be swiped twice, as the live /swipe allows.
+        matched_ts = ts + rng.randrange(1, 86400 * 3)
+        swipes.append({"_id": oid(matched_ts, 9, user_id, (n << 1) | 1), "swiper_id": target,
+                       "swipee_id": user_id, "action": "like",
+                       "timestamp": BASE_TIME + timedelta(seconds=matched_ts)})
+        match_id = oid(matched_ts, 2, user_id, n)
+        matches.append({"_id": match_id, "user1_id": target, "user2_id": user_id,
+                        "matched_at": BASE_TIME + timedelta(seconds=matched_ts)})
+
+        message_count = min(int(rng.expovariate(1 / _args.messages_per_match)), 255)
+        msg_ts = matched_ts
+        for m in range(message_count):
+            msg_ts += rng.randrange(5, 7200)
+            messages.append({
+                "_id": oid(msg_ts, 3, user_id, (n << 8) | m),
+                "match_id": match_id,
+                "sender_id": (user_id, target)[m % 2],
+                "message_text": rng.choice(MESSAGES),
+                "timestamp": BASE_TIME + timedelta(seconds=msg_ts)
+            })
+    return swipes, matches, messages
+
+
+def make_photos(user_id, rng):
+    photos = []
+    for n in range(rng.randint(1, 3)):
+        payload = rng.getrandbits(8 * _args.photo_bytes).to_bytes(_args.photo_bytes, "big")
+        photos.append({
+            "photo_id": str(oid(n, 4, user_id, n)),
+            "file_name": f"photo_{n}.jpg",
+            "data": base64.b64encode(payload).decode(),
+            "uploaded_at": BASE_TIME + timedelta(days=n)
+        })
+    return {"_id": oid(0, 4, user_id), "user_id": user_id, "photos": photos}
+
+
+def make_spotify(user_id, rng):
+    return {
+        "_id": oid(0, 5, user_id),
+        "user_id": user_id,
+        "spotify_id": f"seed{user_id:09d}",
+        "spotify_access_token": f"seed-access-{rng.getrandbits(64):016x}",
+        "spotify_refresh_token": f"seed-refresh-{rng.getrandbits(64):016x}",
+        "spotify_connected": True,
+        "created_at": BASE_TIME
+    }
+
+
+def _init_worker(args):
+    global _args, _db, _cities
+    _args = args
+    _db = MongoClient(args.mongo_uri)[args.db]
+    _cities = build_cities(args.locations)
+
+
+def _flush(collection, docs):
+    for i in range(0, len(docs), _args.batch_size):
+        _db[collection].insert_many(docs[i:i + _args.batch_size], ordered=False, bypass_document_validation=True)
+    written = len(docs)
+    docs.clear()
+    return written
+
+
+def seed_user_chunk(chunk_index):
+    """Writes users [first, last] and everything those users generated."""
+    first = chunk_index * _args.chunk_size + 1
+    last = min(first + _args.chunk_size - 1, _args.users)
+    counts = dict.fromkeys(["users", "swipes", "matches", "messages", "photos", "spotify"], 0)
+    buffers = {name: [] for name in counts}
+
+    for user_id in range(first, last + 1):
+        user = make_user(user_id)
+        buffers["users"].append(user)
+        extras = rng_for("extras", user_id)
+        if extras.random() < _args.photo_ratio:
+            buffers["photos"].append(make_photos(user_id, extras))
+        if extras.random() < _args.spotify_ratio:
+            buffers["spotify"].append(make_spotify(user_id, extras))
+        swipes, matches, messages = make_activity(user)
+        buffers["swipes"].extend(swipes)
+        buffers["matches"].extend(matches)
+        buffers["messages"].extend(messages)
+
+        for name, docs in buffers.items():
+            if len(docs) >= _args.batch_size:
+                counts[name] += _flush(name, docs)
+
+    for name, docs in buffers.items():
+        if docs:
+            counts[name] += _flush(name, docs)
+    return counts
+
+
+def seed_reference_data(db, args):
+    cities = build_cities(args.locations)
+    db.locations.insert_many([{"_id": location_oid(i), "name": name} for i, (name, _, _) in enumerate(cities)])
+    db.universities.insert_many([
+        {"_id": oid(0, 6, i), "location_id": location_oid(i), "universities": university_names(name, args.universities_per_location)}
+        for i, (name, _, _) in enumerate(cities)
+    ])
+
+    blobs, places = [], []
+    for i, (name, lat, lng) in enumerate(cities):
+        rng = rng_for("restaurants", i)
+        items = []
+        for n in range(args.restaurants_per_location):
+            # ~5 km around the city centre
+            r_lat = lat + rng.uniform(-0.045, 0.045)
+            r_lng = lng + rng.uniform(-0.045, 0.045) / max(math.cos(math.radians(lat)), 0.1)
+            item = {"name": f"{rng.choice(LAST_NAMES)} {rng.choice(CUISINES)} {n + 1}",
+                    "cuisine": rng.choice(CUISINES), "rating": round(rng.uniform(3.0, 5.0), 1)}
+            items.append(dict(item, lat=round(r_lat, 6), lng=round(r_lng, 6)))
+            places.append(dict(item, _id=oid(0, 7, i, n), location_id=location_oid(i),
+                               geo={"type": "Point", "coordinates": [round(r_lng, 6), round(r_lat, 6)]}))
+        blobs.append({"_id": oid(0, 8, i), "location_id": location_oid(i), "restaurants": items})
+    db.restaurants.insert_many(blobs)
+    if places:
+        db.restaurant_places.insert_many(places)
+
+
+def ensure_indexes(db):
+    db.users.create_index("email", unique=True)
+    db.users.create_index([("university_location", ASCENDING), ("gender", ASCENDING)])
+    db.swipes.create_index([("swiper_id", ASCENDING), ("swipee_id", ASCENDING)])
+    db.swipes.create_index([("swipee_id", ASCENDING), ("swiper_id", ASCENDING), ("action", ASCENDING)])
+    db.matches.create_index("user1_id")
+    db.matches.create_index("user2_id")
+    db.messages.create_index([("match_id", ASCENDING), ("timestamp", ASCENDING)])
+    db.photos.create_index("user_id", unique=True)
+    db.spotify.create_index("user_id", unique=True)
+    db.restaurant_places.create_index([("location_id", ASCENDING), ("geo", GEOSPHERE)], name="location_geo")
+    db.restaurant_places.create_index([("location_id", ASCENDING), ("_id", ASCENDING)], name="location_id_order")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a local mongod with a deterministic synthetic Blinder dataset.")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="blinder")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--swipes", type=int, default=1000000, help="approximate total swipes (before reciprocal likes)")
+    parser.add_argument("--locations", type=int, default=len(CITIES))
+    parser.add_argument("--universities-per-location", type=int, default=4)
+    parser.add_argument("--restaurants-per-location", type=int, default=200)
+    parser.add_argument("--activity-alpha", type=float, default=1.5, help="Pareto shape of per-user swipe activity")
+    parser.add_argument("--max-swipes-per-user", type=int, default=20000)
+    parser.add_argument("--like-rate", type=float, default=0.4)
+    parser.add_argument("--match-rate", type=float, default=0.15, help="share of likes that are reciprocated")
+    parser.add_argument("--messages-per-match", type=float, default=8)
+    parser.add_argument("--photo-ratio", type=float, default=0.6)
+    parser.add_argument("--photo-bytes", type=int, default=2048)
+    parser.add_argument("--spotify-ratio", type=float, default=0.3)
+    parser.add_argument("--password", default="benchmark")
+    parser.add_argument("--password-iterations", type=int, default=600000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop", action="store_true", help="drop the seeded collections first")
+    parser.add_argument("--no-indexes", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.password_hash = password_hash(args.password, args.password_iterations)
+    db = MongoClient(args.mongo_uri)[args.db]
+
+    if args.drop:
+        for name in ["users", "swipes", "matches", "messages", "photos", "spotify",
+                     "locations", "universities", "restaurants", "restaurant_places", "counters"]:
+            db.drop_collection(name)
+
+    global _args, _cities
+    _args, _cities = args, build_cities(args.locations)
+    started = time.perf_counter()
+    seed_reference_data(db, args)
+
+    totals = {}
+    chunks = range((args.users + args.chunk_size - 1) // args.chunk_size)
+    with Pool(args.workers, initializer=_init_worker, initargs=(args,)) as pool:
+        for done, counts in enumerate(pool.imap_unordered(seed_user_chunk, chunks), 1):
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+            elapsed = time.perf_counter() - started
+            print(f"[{done}/{len(chunks)}] {totals} ({elapsed:.0f}s)", flush=True)
+
+    # Registrations after seeding continue from the highest seeded id
+    db.counters.update_one({"_id": "user_id"}, {"$max": {"seq": args.users}}, upsert=True)
+
+    if not args.no_indexes:
+        print("Creating indexes...", flush=True)
+        ensure_indexes(db)
+
+    print(f"Done in {time.perf_counter() - started:.0f}s: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Secondary'lere yönlendirilen okumalar için istekler arası nedensel tutarlılık.
+
+Her istek en fazla bir causally consistent session alır; session ilk `session()`
+çağrısında açılır. İstek `X-Causal-Token` başlığı taşıyorsa session önce o noktaya
+ilerletilir. Bu session'daki bir okuma, secondary'de bile, düğüm token'ı üretenin
+gördüğü her şeyi uygulayana kadar bekler.
+
+Session kullanan isteğin yanıtı session'ın konumunu `X-Causal-Token` başlığında taşır.
+İstemciler aldıkları son token'ı geri gönderir (ör. send_message sonrası
+get_conversation). Token yoksa yönlendirilen okumaların gecikmesi yalnızca
+READ_MAX_STALENESS ile sınırlıdır.
+
+Session yanıt kapandığında biter; akışla gönderilen cursor'lar gövde gönderilirken onu
+kullanmaya devam edebilir.
+"""
+import base64
+
+import bson
+from flask import g, has_request_context, request
+
+from common.db import get_client
+
+HEADER = "X-Causal-Token"
+
+
+def encode_token(session):
+    """ Session'ın operation time ve (imzalı) cluster time değerlerini kodlar; işlem yoksa None """
+    if session.operation_time is None:
+        return None
+    payload = {"o": session.operation_time}
+    if session.cluster_time is not None:
+        payload["c"] = session.cluster_time
+    return base64.urlsafe_b64encode(bson.encode(payload)).decode("ascii").rstrip("=")
+
+
+def decode_token(value):
+    if not value:
+        return None
+    try:
+        payload = bson.decode(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+    except Exception:
+        # Bozuk token yalnızca istemcinin tutarlılık garantisini kaybettirir
+        return None
+    return payload if isinstance(payload.get("o"), bson.Timestamp) else None
+
+
+def start_session(token=None):
+    session = get_client().start_session(causal_consistency=True)
+    if token is not None:
+        if token.get("c"):
+            session.advance_cluster_time(token["c"])
+        session.advance_operation_time(token["o"])
+    return session
+
+
+def session():
+    """ İsteğin causally consistent session'ı; istek dışında None """
+    if not has_request_context():
+        return None
+    current = g.get("_causal_session")
+    if current is None:
+        current = g._causal_session = start_session(decode_token(request.headers.get(HEADER)))
+    return current
+
+
+def _after_request(response):
+    current = g.pop("_causal_session", None)
+    if current is None:
+        return response
+    token = encode_token(current)
+    if token:
+        response.headers[HEADER] = token
+    response.call_on_close(current.end_session)
+    return response
+
+
+def _teardown_request(exc):
+    current = g.pop("_causal_session", None)
+    if current is not None:
+        current.end_session()
+
+
+def init_app(app):
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,155 @@
+"""
+İstemciyle anlaşılan yanıt sıkıştırması.
+
+En az COMPRESSION_MIN_SIZE bayt olan JSON ve metin yanıtları, istemcinin
+Accept-Encoding'de tercih ettiğine göre brotli (`brotli` paketi yüklüyse) veya gzip ile
+sıkıştırılır. Akışla gönderilen yanıtlar parça parça sıkıştırılır; her parça flush
+edilir, böylece istemci erken ayrıştırmaya başlar ve yanıt hiç biriktirilmez. Zaten
+Content-Encoding taşıyan, kısmi içerik, `no-transform` ve dosya aktarımı yanıtlarına
+dokunulmaz.
+
+Sıkıştırmaya harcanan CPU süresi ve önceki/sonraki bayt sayıları endpoint ve kodlama
+bazında metriklere (`http_response_compression_*`) yazılır; her endpoint'in sıkıştırma
+maliyeti kazandırdığı baytlarla karşılaştırılabilir.
+"""
+import time
+import zlib
+
+from flask import request
+
+import config
+from common import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = {"application/json", "application/javascript", "image/svg+xml"}
+SKIPPED_STATUS = {204, 206, 304}
+
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level):
+        # wbits=31: ham zlib akışı yerine gzip biçimi
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCodec:
+    name = "br"
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def available_encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def new_codec(encoding):
+    if encoding == "br":
+        return BrotliCodec(config.COMPRESSION_BROTLI_QUALITY)
+    return GzipCodec(config.COMPRESSION_GZIP_LEVEL)
+
+
+def _compressible(response):
+    if response.status_code < 200 or response.status_code in SKIPPED_STATUS:
+        return False
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return False
+    if response.cache_control.no_transform:
+        return False
+    mimetype = response.mimetype or ""
+    if not (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES):
+        return False
+    if response.is_streamed:
+        return True
+    return (response.content_length or 0) >= config.COMPRESSION_MIN_SIZE
+
+
+def _record(endpoint, encoding, cpu_seconds, bytes_in, bytes_out):
+    metrics.http_response_compression_seconds_total.labels(endpoint, encoding).inc(cpu_seconds)
+    metrics.http_response_uncompressed_bytes_total.labels(endpoint, encoding).inc(bytes_in)
+    metrics.http_response_compressed_bytes_total.labels(endpoint, encoding).inc(bytes_out)
+
+
+def _compress_stream(chunks, codec, endpoint):
+    cpu_seconds = 0.0
+    bytes_in = bytes_out = 0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            started = time.thread_time()
+            data = codec.compress(chunk) + codec.flush()
+            cpu_seconds += time.thread_time() - started
+            bytes_in += len(chunk)
+            bytes_out += len(data)
+            yield data
+        started = time.thread_time()
+        data = codec.finish()
+        cpu_seconds += time.thread_time() - started
+        bytes_out += len(data)
+        yield data
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        _record(endpoint, codec.name, cpu_seconds, bytes_in, bytes_out)
+
+
+def compress_response(response):
+    if not _compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+
+    codec = new_codec(encoding)
+    endpoint = request.endpoint or "unmatched"
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, codec, endpoint)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        started = time.thread_time()
+        data = codec.compress(body) + codec.finish()
+        _record(endpoint, encoding, time.thread_time() - started, len(body), len(data))
+        response.set_data(data)
+
+    response.headers["Content-Encoding"] = encoding
+    # Sıkıştırılmış baytlar orijinalden farklıdır; zayıf ETag If-None-Match'te yine eşleşir
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    if not config.COMPRESSION_ENABLED:
+        return
+    app.after_request(compress_response)
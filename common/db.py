@@ -0,0 +1,147 @@
+"""
+Paylaşılan MongoDB erişimi.
+
+MongoClient import sırasında değil, süreçteki ilk veritabanı işleminde oluşturulur: modül
+yüklemek bağlantı ya da DNS sorgusu açmaz, fork edilen her süreç (gunicorn preload) kendi
+istemcisini kurar. `db["users"]`, `db.users` modül seviyesinde eskisi gibi kullanılabilir;
+gerçek koleksiyona ilk erişimde bağlanırlar.
+
+Okumalar varsayılan olarak primary'ye gider. `db["x"].for_reads("route")` aynı koleksiyonu
+READ_PREFERENCE_ROUTES'ta o route için verilen okuma tercihiyle (ör. secondaryPreferred,
+en fazla READ_MAX_STALENESS saniye geride) döndürür. Yazma sonrası okuma tutarlılığı için
+bkz. common/causal.py.
+"""
+import os
+import threading
+
+from pymongo import MongoClient
+from pymongo.database import Database
+from pymongo.read_preferences import Nearest, PrimaryPreferred, Secondary, SecondaryPreferred
+
+import config
+from common import metrics, profiling
+
+DATABASE_NAME = "blinder"
+
+READ_MODES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def parse_read_routes(value):
+    """ "reference=secondaryPreferred,catalog=nearest" -> {route: mod} """
+    routes = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, mode = item.partition("=")
+        mode = mode.strip()
+        if mode != "primary" and mode not in READ_MODES:
+            raise ValueError(f"Geçersiz okuma tercihi: {item}")
+        routes[route.strip()] = mode
+    return routes
+
+
+READ_ROUTES = parse_read_routes(config.READ_PREFERENCE_ROUTES)
+
+
+def read_preference(route):
+    """ Route'un okuma tercihi; primary için None """
+    mode = READ_ROUTES.get(route, "primary")
+    if mode == "primary":
+        return None
+    return READ_MODES[mode](max_staleness=config.READ_MAX_STALENESS)
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """ Bu sürecin MongoClient'ı; ilk çağrıda (ve fork sonrası ilk çağrıda) oluşturulur """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                # Profil kapalıyken dinleyici hiç eklenmez, böylece her komutta ek maliyet oluşmaz
+                listeners = [metrics.mongo_listener]
+                if profiling.enabled():
+                    listeners.append(profiling.mongo_listener)
+                # Tüm blueprint'lerin paylaştığı tek MongoDB bağlantı havuzu
+                _client = MongoClient(config.MONGO_URI, event_listeners=listeners)
+                _client_pid = pid
+    return _client
+
+
+def get_database():
+    return get_client()[DATABASE_NAME]
+
+
+class LazyCollection:
+    """ İlk kullanımda bu sürecin istemcisine bağlanan koleksiyon vekili """
+
+    __slots__ = ("name", "read_route", "_client", "_collection", "_routed")
+
+    def __init__(self, name, read_route=None):
+        self.name = name
+        self.read_route = read_route
+        self._client = None
+        self._collection = None
+        self._routed = {}
+
+    def resolve(self):
+        client = get_client()
+        collection = self._collection
+        if collection is None or self._client is not client:
+            collection = client[DATABASE_NAME][self.name]
+            preference = read_preference(self.read_route)
+            if preference is not None:
+                collection = collection.with_options(read_preference=preference)
+            self._collection = collection
+            self._client = client
+        return collection
+
+    def for_reads(self, route):
+        """ Aynı koleksiyon, `route` için yapılandırılmış okuma tercihiyle """
+        routed = self._routed.get(route)
+        if routed is None:
+            routed = self._routed.setdefault(route, LazyCollection(self.name, route))
+        return routed
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+    def __getitem__(self, name):
+        return self.resolve()[name]
+
+    def __repr__(self):
+        route = f", {self.read_route}" if self.read_route else ""
+        return f"LazyCollection({DATABASE_NAME}.{self.name}{route})"
+
+
+class LazyDatabase:
+    """ `db["x"]` / `db.x` koleksiyon vekili döndürür; Database metotları gerçek nesneye gider """
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.setdefault(name, LazyCollection(name))
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if hasattr(Database, name):
+            return getattr(get_database(), name)
+        return self[name]
+
+
+db = LazyDatabase()
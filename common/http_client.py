@@ -0,0 +1,217 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from common import metrics
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUSES = {502, 503, 504}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """ Host'un devre kesicisi açıkken ağa hiç çıkmadan fırlatılır """
+
+
+class CircuitBreaker:
+    """ Host başına devre kesici: ardışık hatalarda açılır, bir süre hemen hata verir, sonra tek deneme geçirir """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def parse_retry_after(value):
+    """ Retry-After başlığını (saniye veya HTTP tarihi) saniye olarak döndürür; yoksa None """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    """
+    Dış HTTP çağrıları için paylaşılan katman.
+    - Host başına bir keep-alive `requests.Session` (ve bağlantı havuzu).
+    - Her çağrıda bağlantı/okuma zaman aşımı.
+    - Tam jitter'lı üstel bekleme ile yeniden deneme; 429'da Retry-After'a uyulur.
+      Idempotent olmayan metotlar yalnızca istek hiç gönderilmediyse (bağlantı hatası)
+      veya açıkça 429 ile reddedildiyse yeniden denenir.
+    - Host başına devre kesici.
+    """
+
+    def __init__(self, connect_timeout=None, read_timeout=None, max_retries=None, backoff_base=0.2,
+                 backoff_cap=5.0, max_retry_after=None, pool_maxsize=None, breaker_failures=None,
+                 breaker_reset=None):
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else config.HTTP_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else config.HTTP_READ_TIMEOUT,
+        )
+        self.max_retries = max_retries if max_retries is not None else config.HTTP_MAX_RETRIES
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_retry_after = max_retry_after if max_retry_after is not None else config.HTTP_MAX_RETRY_AFTER
+        self.pool_maxsize = pool_maxsize or config.HTTP_POOL_MAXSIZE
+        self.breaker_failures = breaker_failures or config.HTTP_BREAKER_FAILURES
+        self.breaker_reset = breaker_reset or config.HTTP_BREAKER_RESET_SECONDS
+        self._sessions = {}
+        self._breakers = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _check_fork(self):
+        # Havuzdaki soketler ana süreç ile fork edilen worker'lar arasında paylaşılmamalı
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._sessions = {}
+                    self._breakers = {}
+                    self._pid = os.getpid()
+
+    def session_for(self, host):
+        self._check_fork()
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._sessions[host] = session
+        return session
+
+    def breaker_for(self, host):
+        self._check_fork()
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(self.breaker_failures, self.breaker_reset))
+        return breaker
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, timeout=None, retries=None, **kwargs):
+        method = method.upper()
+        host = urlsplit(url).netloc
+        session = self.session_for(host)
+        breaker = self.breaker_for(host)
+        retries = self.max_retries if retries is None else retries
+        idempotent = method in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                metrics.observe_http_client(host, "circuit_open", 0.0)
+                raise CircuitOpenError(f"Circuit open for {host}")
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.ConnectionError as e:
+                metrics.observe_http_client(host, "timeout" if isinstance(e, requests.Timeout) else "error",
+                                            time.perf_counter() - started)
+                breaker.record_failure()
+                # ConnectTimeout: istek sunucuya hiç ulaşmadı, her metot yeniden denenebilir
+                never_sent = isinstance(e, requests.ConnectTimeout)
+                if attempt >= retries or not (idempotent or never_sent):
+                    raise
+            except requests.Timeout:
+                metrics.observe_http_client(host, "timeout", time.perf_counter() - started)
+                breaker.record_failure()
+                if attempt >= retries or not idempotent:
+                    raise
+            except requests.RequestException:
+                # ör. ChunkedEncodingError, TooManyRedirects, InvalidURL: yeniden denenmez, ama devre
+                # kesici haberdar olmalı; yoksa yarı açık deneme hiç bitmez
+                metrics.observe_http_client(host, "error", time.perf_counter() - started)
+                breaker.record_failure()
+                raise
+            else:
+                metrics.observe_http_client(host, response.status_code, time.perf_counter() - started)
+                if response.status_code == 429:
+                    breaker.record_success()
+                    wait = parse_retry_after(response.headers.get("Retry-After"))
+                    if wait is None:
+                        wait = self._backoff(attempt)
+                    if attempt >= retries or wait > self.max_retry_after:
+                        return response
+                    response.close()
+                    time.sleep(wait + random.uniform(0, self.backoff_base))
+                    attempt += 1
+                    continue
+                if response.status_code in RETRYABLE_STATUSES:
+                    breaker.record_failure()
+                    if attempt >= retries or not idempotent:
+                        return response
+                    response.close()
+                else:
+                    breaker.record_success()
+                    return response
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+default_client = HttpClient()
+
+
+def get(url, **kwargs):
+    return default_client.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return default_client.post(url, **kwargs)
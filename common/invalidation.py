@@ -0,0 +1,278 @@
+"""
+MongoDB change stream'leriyle süreçler arası önbellek geçersiz kılma.
+
+Süreç içi önbellekler kaynak koleksiyon başına bir handler kaydeder:
+
+    invalidation.register("users", _on_user_change, fields=("university_location",))
+
+Her worker INVALIDATION_SOCKET_DIR içinde bir unix datagram soketi açar ve gelenleri
+handler'larına dağıtır. Düğüm başına tek worker, INVALIDATION_LOCK_PATH üzerindeki
+flock'u tutan (bkz. common/leader.py), kayıtlı koleksiyonlar üzerinde tek bir change
+stream izler ve her değişikliği dizindeki tüm soketlere, kendisininki dahil, gönderir.
+Bu worker çıktığında kilit bırakılır ve INVALIDATION_ELECTION_INTERVAL saniye içinde
+başka bir worker devralır.
+
+Worker'lar trafik almaya başlarken veriyolunu `ensure_started()` ile başlatır (gunicorn
+`post_worker_init` veya `python main.py`); yalnızca test client'ı ya da benchmark'lar
+için kurulan uygulamalar izleyici çalıştırmaz. Log satırları stderr'e gider.
+
+Stream'in resume token'ı host başına `invalidation_state` koleksiyonuna en sık
+INVALIDATION_CHECKPOINT_INTERVAL saniyede bir kaydedilir. Yeni izleyici oradan devam
+eder; izleyici yokken yapılan değişiklikler de, bazıları iki kez, teslim edilir. Token
+yoksa veya oplog artık ona ulaşmıyorsa önce bir "flush" yayınlanır.
+
+Handler'lar bir `Change` alır. Drop ve flush'larda `document_id` None'dır: koleksiyondan
+türetilen her şey düşürülür. `document` yalnızca koleksiyonun handler'larının istediği
+alanları içerir, yazmadan sonra okunur; silmelerde boştur.
+
+Hiçbir önbelleğin kullanmadığı alanları yazan güncellemeler (ör. aktiflik zamanı)
+`ignore_updates` ile sunucuda elenir; ne okuma ne de yayın maliyeti doğururlar.
+"""
+import atexit
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+import bson
+from pymongo.errors import OperationFailure, PyMongoError
+
+import config
+from common import leader, metrics
+from common.db import db, get_database
+
+STATE_COLLECTION = "invalidation_state"
+ALL = "*"
+MAX_DATAGRAM = 64 * 1024
+MAX_BACKOFF = 60
+# Oplog artık devam noktasını içermiyor / replica set gerekli
+HISTORY_LOST_CODES = {136, 280, 286}
+NOT_REPLICA_SET_CODE = 40573
+
+_handlers = {}
+_fields = {}
+_ignored = {}
+_started_pid = None
+_start_lock = threading.Lock()
+
+
+class Change:
+    __slots__ = ("collection", "operation", "document_id", "fields", "document")
+
+    def __init__(self, collection, operation, document_id=None, fields=None, document=None):
+        self.collection = collection
+        self.operation = operation
+        self.document_id = document_id
+        # Güncellemenin yazdığı üst seviye alanlar; belgenin tamamı değiştiyse None
+        self.fields = fields
+        self.document = document or {}
+
+    def touches(self, *fields):
+        return self.fields is None or not self.fields.isdisjoint(fields)
+
+    @classmethod
+    def from_event(cls, event):
+        operation = event["operationType"]
+        collection = event.get("ns", {}).get("coll", ALL)
+        if "documentKey" not in event:
+            return cls(collection, operation)
+        fields = None
+        if operation == "update":
+            paths = event.get("updatedFields", []) + (event.get("removedFields") or [])
+            fields = {path.split(".", 1)[0] for path in paths}
+        return cls(collection, operation, event["documentKey"]["_id"], fields, event.get("fullDocument"))
+
+    def encode(self):
+        return bson.encode({
+            "c": self.collection, "o": self.operation, "i": self.document_id,
+            "f": None if self.fields is None else sorted(self.fields), "d": self.document,
+        })
+
+    @classmethod
+    def decode(cls, data):
+        payload = bson.decode(data)
+        fields = payload.get("f")
+        fields = None if fields is None else set(fields)
+        return cls(payload["c"], payload["o"], payload.get("i"), fields, payload.get("d"))
+
+
+def register(collection, handler, fields=()):
+    """ `collection` içindeki bir belge değiştiğinde her worker'da `handler(change)` çağrılır """
+    _handlers.setdefault(collection, []).append(handler)
+    _fields.setdefault(collection, set()).update(fields)
+
+
+def ignore_updates(collection, *fields):
+    """ `collection` üzerinde yalnızca `fields` alanlarını değiştiren güncellemeler teslim edilmez """
+    _ignored.setdefault(collection, set()).update(fields)
+
+
+def dispatch(change):
+    if change.collection == ALL:
+        handlers = [handler for registered in _handlers.values() for handler in registered]
+    else:
+        handlers = _handlers.get(change.collection, ())
+    for handler in handlers:
+        try:
+            handler(change)
+        except Exception as e:
+            print(f"Önbellek geçersiz kılınamadı ({change.collection}): {str(e)}", file=sys.stderr)
+    metrics.invalidation_changes_applied_total.labels(change.collection).inc()
+
+
+# --- Teslim -----------------------------------------------------------------------------
+
+def _socket_path(pid):
+    return os.path.join(config.INVALIDATION_SOCKET_DIR, f"{pid}.sock")
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _receive(sock):
+    while True:
+        data = sock.recv(MAX_DATAGRAM)
+        try:
+            change = Change.decode(data)
+        except Exception:
+            continue
+        dispatch(change)
+
+
+def broadcast(sender, change):
+    data = change.encode()
+    for name in os.listdir(config.INVALIDATION_SOCKET_DIR):
+        if not name.endswith(".sock"):
+            continue
+        path = os.path.join(config.INVALIDATION_SOCKET_DIR, name)
+        try:
+            sender.sendto(data, path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Dinleyen yok: soketi açan worker çıkmış
+            _remove(path)
+        except OSError as e:
+            metrics.invalidation_delivery_failures_total.inc()
+            print(f"Geçersiz kılma mesajı gönderilemedi ({name}): {str(e)}", file=sys.stderr)
+
+
+# --- İzleyici -------------------------------------------------------------------------
+
+def _ignored_updates(collection):
+    return {
+        "ns.coll": collection, "operationType": "update",
+        "updateDescription.removedFields": {"$size": 0},
+        # Güncellenen her alan yok sayılanlardan
+        "$expr": {"$eq": [
+            {"$size": {"$objectToArray": "$updateDescription.updatedFields"}},
+            {"$size": {"$filter": {
+                "input": {"$objectToArray": "$updateDescription.updatedFields"}, "as": "field",
+                "cond": {"$in": ["$$field.k", sorted(_ignored[collection])]},
+            }}},
+        ]},
+    }
+
+
+def _pipeline(collections):
+    fields = sorted(set().union(*(_fields[collection] for collection in collections)))
+    match = {"ns.coll": {"$in": collections}}
+    ignored = [_ignored_updates(collection) for collection in collections if _ignored.get(collection)]
+    if ignored:
+        match["$nor"] = ignored
+    return [
+        {"$match": match},
+        {"$project": {
+            "operationType": 1, "ns.coll": 1, "documentKey": 1,
+            # Yalnızca güncellenen alanların adları; değerleri (ör. fotoğraf verisi) sunucuda kalır
+            "updatedFields": {"$map": {
+                "input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+                "in": "$$this.k",
+            }},
+            "removedFields": "$updateDescription.removedFields",
+            **{f"fullDocument.{field}": 1 for field in fields},
+        }},
+    ]
+
+
+def _watch(sender, state, key, token):
+    collections = sorted(_handlers)
+    full_document = "updateLookup" if any(_fields[collection] for collection in collections) else None
+    with get_database().watch(_pipeline(collections), full_document=full_document, resume_after=token,
+                              max_await_time_ms=1000) as stream:
+        saved, saved_at = token, time.monotonic()
+        while stream.alive:
+            event = stream.try_next()
+            if event is not None:
+                change = Change.from_event(event)
+                metrics.invalidation_changes_total.labels(change.collection, change.operation).inc()
+                broadcast(sender, change)
+            now = time.monotonic()
+            if stream.resume_token != saved and now - saved_at >= config.INVALIDATION_CHECKPOINT_INTERVAL:
+                state.update_one({"_id": key}, {"$set": {"resume_token": stream.resume_token,
+                                                         "updated_at": datetime.utcnow()}}, upsert=True)
+                saved, saved_at = stream.resume_token, now
+    # Stream geçersiz kılındı (ör. veritabanı silindi), devam ettirilemez
+    state.update_one({"_id": key}, {"$unset": {"resume_token": ""}})
+
+
+def _run_watcher():
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sender.settimeout(1.0)
+    state = db[STATE_COLLECTION]
+    key = f"watcher:{socket.gethostname()}"
+    backoff = 1
+    while True:
+        started = time.monotonic()
+        try:
+            doc = state.find_one({"_id": key})
+            token = doc.get("resume_token") if doc else None
+            if token is None:
+                # Bu noktadan önceki değişiklikleri kimse görmedi
+                broadcast(sender, Change(ALL, "flush"))
+            _watch(sender, state, key, token)
+        except OperationFailure as e:
+            if e.code == NOT_REPLICA_SET_CODE:
+                print("Change stream için replica set gerekli; önbellek geçersiz kılma kapalı", file=sys.stderr)
+                return
+            if e.code in HISTORY_LOST_CODES:
+                print("Resume token oplog'da bulunamadı; izleme baştan başlıyor", file=sys.stderr)
+                state.update_one({"_id": key}, {"$unset": {"resume_token": ""}})
+                continue
+            print(f"Change stream hatası: {str(e)}", file=sys.stderr)
+        except PyMongoError as e:
+            print(f"Change stream hatası: {str(e)}", file=sys.stderr)
+        if time.monotonic() - started > MAX_BACKOFF:
+            backoff = 1
+        time.sleep(backoff)
+        backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+def _watch_as_leader():
+    print(f"Önbellek geçersiz kılma izleyicisi bu süreçte çalışıyor (pid {os.getpid()})", file=sys.stderr)
+    _run_watcher()
+
+
+def ensure_started():
+    """ Worker'ın soketini açar, alıcı ve seçim thread'lerini süreç başına bir kez başlatır """
+    global _started_pid
+    pid = os.getpid()
+    if not config.INVALIDATION_ENABLED or _started_pid == pid or not _handlers:
+        return
+    with _start_lock:
+        if _started_pid == pid:
+            return
+        _started_pid = pid
+        os.makedirs(config.INVALIDATION_SOCKET_DIR, exist_ok=True)
+        path = _socket_path(pid)
+        _remove(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+        atexit.register(_remove, path)
+        threading.Thread(target=_receive, args=(sock,), name="invalidation-receiver", daemon=True).start()
+        leader.run_elected(config.INVALIDATION_LOCK_PATH, config.INVALIDATION_ELECTION_INTERVAL, _watch_as_leader,
+                           name="invalidation-watcher")
@@ -0,0 +1,164 @@
+"""
+Uygulama genelindeki JSON sağlayıcısı.
+
+orjson yüklüyse onu, değilse standart kütüphaneyi kullanır. Her iki durumda da ObjectId
+hex string, datetime/date ISO 8601, bytes base64 olarak yazılır; handler'lar Mongo
+değerlerini dönüştürmeden yanıta koyabilir.
+"""
+import base64
+import itertools
+import json
+import sys
+from datetime import date, datetime
+
+from bson import ObjectId
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - isteğe bağlı bağımlılık
+    orjson = None
+
+STREAM_BATCH_SIZE = 100
+
+
+def default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj, indent=False):
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps_bytes(obj, indent=False):
+        return json.dumps(obj, default=default, ensure_ascii=False, indent=2 if indent else None,
+                          separators=None if indent else (",", ":")).encode("utf-8")
+
+    def loads(data):
+        return json.loads(data)
+
+
+def iter_batches(items, batch_size=STREAM_BATCH_SIZE):
+    """ Iterable'ı en fazla `batch_size` elemanlı listelere böler """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_json_array(items, batch_size=STREAM_BATCH_SIZE):
+    """ Iterable'ı (ör. Mongo cursor) bellekte liste kurmadan, `batch_size`'lık parçalarla JSON dizisine çevirir """
+    yield b"["
+    first = True
+    for batch in iter_batches(items, batch_size):
+        yield (b"" if first else b",") + dumps_bytes(batch)[1:-1]
+        first = False
+    yield b"]"
+
+
+class JSONStream:
+    """
+    Akışla gönderilen `{**fields, array_key: [batches...]}` gövdesi.
+    - Başlıklar gönderildikten sonra okuma hatası durum kodunu değiştiremez: dizi kapatılır,
+      hata "error" altında bildirilir (gövde geçerli JSON kalır) ve `failed` işaretlenir;
+      yanıt önbelleği böyle bir gövdeyi saklamaz.
+    - `on_close` gövde nasıl biterse bitsin bir kez çalışır.
+    """
+
+    def __init__(self, fields, array_key, batches, on_close=None):
+        self.fields = fields
+        self.array_key = array_key
+        self.batches = batches
+        self.on_close = on_close
+        self.failed = False
+        self._chunks = None
+
+    def __iter__(self):
+        self._chunks = self._iter_chunks()
+        return self._chunks
+
+    def _iter_chunks(self):
+        try:
+            head = dumps_bytes(dict(self.fields))
+            yield head[:-1] + (b"," if len(head) > 2 else b"") + dumps_bytes(self.array_key) + b":"
+            yield b"["
+            first = True
+            try:
+                for batch in self.batches:
+                    yield (b"" if first else b",") + dumps_bytes(batch)[1:-1]
+                    first = False
+            except Exception as e:
+                self.failed = True
+                print(f"Akış yarıda kesildi ({self.array_key}): {str(e)}", file=sys.stderr)
+                yield b"]," + dumps_bytes("error") + b":" + dumps_bytes(str(e)) + b"}"
+                return
+            yield b"]"
+            yield b"}"
+        finally:
+            self._finish()
+
+    def _finish(self):
+        if self.on_close is not None:
+            on_close, self.on_close = self.on_close, None
+            on_close()
+
+    def close(self):
+        """ Yanıt bittiğinde sunucu tarafından çağrılır; gövde hiç okunmadıysa da """
+        if self._chunks is not None:
+            self._chunks.close()
+        self._finish()
+
+
+def stream_json(array_key, items, fields=None, status=200, batch_size=STREAM_BATCH_SIZE, on_close=None):
+    """
+    Liste ve dışa aktarma endpoint'leri için akışla gönderilen `{**fields, array_key: [items...]}`
+    yanıtı; `items` gövde gönderilirken tüketilir. İlk parti başlıklardan önce burada okunur,
+    böylece oradaki bir hata view'a ulaşır.
+    """
+    batches = iter_batches(items, batch_size)
+    try:
+        first = next(batches, None)
+    except Exception:
+        if on_close is not None:
+            on_close()
+        raise
+    if first is not None:
+        batches = itertools.chain([first], batches)
+    return current_app.response_class(JSONStream(fields or {}, array_key, batches, on_close),
+                                      status=status, mimetype="application/json")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            return dumps_bytes(obj).decode("utf-8")
+        kwargs.setdefault("default", default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if not kwargs:
+            return loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(dumps_bytes(obj, indent=indent), mimetype=self.mimetype)
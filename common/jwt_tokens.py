@@ -0,0 +1,94 @@
+"""
+Access token yaşam döngüsü.
+
+`TokenManager` uygulamanın JWTManager'ıdır. Çözülen claim'ler istek boyunca `g` üzerinde
+tutulur; böylece `jwt_required`, kabul kontrolü (common.rate_limit) ve yenileme hook'u
+imzayı aralarında bir kez doğrular. İmzalama ve doğrulama sayıları metriklere yazılır.
+
+Yenileme hook'u, istekteki token'ın JWT_REFRESH_THRESHOLD saniyeden az ömrü kaldığında
+`X-Refresh-Token` ile yeni bir access token gönderir; diğer yanıtlar hiçbir şey
+imzalanmadan çıkar.
+
+flask_jwt_extended'da decode'u atlatacak açık bir hook olmadığından `TokenManager`
+JWTManager'ın iki iç metodunu ezer. Desteklenen sürüm SUPPORTED_VERSION'da sabitlenir ve
+`check_internals()` `init_app` içinde çalışır: iç yapısı artık uymayan bir
+flask_jwt_extended ile uygulama başlamaz.
+"""
+import inspect
+import time
+
+import flask_jwt_extended
+from flask import g
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt, verify_jwt_in_request
+
+import config
+from common import metrics
+
+REFRESH_HEADER = "X-Refresh-Token"
+
+SUPPORTED_VERSION = "4."
+# Aşağıda ezilen JWTManager iç metotları ve ezen metotların dayandığı ilk parametreler
+OVERRIDDEN = {
+    "_decode_jwt_from_config": ("self", "encoded_token", "csrf_value", "allow_expired"),
+    "_encode_jwt_from_config": ("self", "identity", "token_type"),
+}
+
+
+def check_internals():
+    """ flask_jwt_extended'da TokenManager'ın ezdiği iç metotlar artık yoksa RuntimeError fırlatır """
+    version = getattr(flask_jwt_extended, "__version__", "")
+    if not version.startswith(SUPPORTED_VERSION):
+        raise RuntimeError(f"flask_jwt_extended {version} desteklenmiyor; {SUPPORTED_VERSION}x gerekli "
+                           f"(bkz. common/jwt_tokens.py)")
+    for name, expected in OVERRIDDEN.items():
+        method = getattr(JWTManager, name, None)
+        parameters = tuple(inspect.signature(method).parameters) if method is not None else ()
+        if parameters[:len(expected)] != expected:
+            raise RuntimeError(f"flask_jwt_extended {version}: JWTManager.{name}{parameters} beklenen "
+                               f"imzada değil (bkz. common/jwt_tokens.py)")
+
+
+class TokenManager(JWTManager):
+    def _decode_jwt_from_config(self, encoded_token, *args, **kwargs):
+        cache = g.setdefault("_jwt_claims_cache", {})
+        key = (encoded_token, args, tuple(sorted(kwargs.items())))
+        claims = cache.get(key)
+        if claims is not None:
+            metrics.jwt_claims_cache_hits_total.inc()
+            return claims
+        try:
+            claims = super()._decode_jwt_from_config(encoded_token, *args, **kwargs)
+        except Exception:
+            metrics.jwt_verifications_total.labels("invalid").inc()
+            raise
+        metrics.jwt_verifications_total.labels("valid").inc()
+        cache[key] = claims
+        return claims
+
+    def _encode_jwt_from_config(self, identity, token_type, *args, **kwargs):
+        metrics.jwt_tokens_signed_total.labels(token_type).inc()
+        return super()._encode_jwt_from_config(identity, token_type, *args, **kwargs)
+
+
+def refresh_expiring_jwt(response):
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+    except Exception:
+        return response
+    identity = claims.get("sub")
+    expires_at = claims.get("exp")
+    if not identity or expires_at is None:
+        return response
+    if expires_at - time.time() < config.JWT_REFRESH_THRESHOLD:
+        response.headers[REFRESH_HEADER] = create_access_token(identity=identity)
+    return response
+
+
+def init_app(app):
+    check_internals()
+    app.config["JWT_SECRET_KEY"] = config.JWT_SECRET_KEY
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = config.JWT_ACCESS_TOKEN_EXPIRES
+    manager = TokenManager(app)
+    app.after_request(refresh_expiring_jwt)
+    return manager
@@ -0,0 +1,36 @@
+"""
+Düğüm başına tek süreçte çalışması gereken arka plan işleri için flock ile lider seçimi.
+
+Kilidi tutan süreç çıktığında işletim sistemi kilidi bırakır, bekleyen süreçlerden biri
+en geç `interval` saniye içinde devralır.
+"""
+import threading
+import time
+
+_lock_files = {}
+
+
+def wait_for_lock(path, interval):
+    """ `path` üzerindeki flock alınana kadar bekler; dosya süreç boyunca açık tutulur """
+    import fcntl
+
+    lock_file = open(path, "a")
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            time.sleep(interval)
+    _lock_files[path] = lock_file
+    return lock_file
+
+
+def run_elected(path, interval, target, name):
+    """ `target`'ı kilidi alan süreçte çalıştıran daemon thread'i başlatır """
+    def run():
+        wait_for_lock(path, interval)
+        target()
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
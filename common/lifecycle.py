@@ -0,0 +1,111 @@
+"""
+Worker yaşam döngüsü: trafik almadan önce ısınma ve sağlık/hazırlık endpoint'leri.
+
+`warmup(app)` her worker'da bağlantı kabul etmeden önce çalışır (gunicorn
+`post_worker_init`, bkz. gunicorn.conf.py). Sık kullanılan index'leri oluşturur, referans
+verisini ve konum başına müzik index'lerini yükler, uygulamadan bir token ve bir istek
+geçirir; böylece routing, JSON kodlama ve JWT imzalama ilk gerçek istekten önce hazır olur.
+/readyz ısınma bitene kadar ya da MongoDB ping'e yanıt vermezken 503 döner; /healthz yalnızca
+sürecin ayakta olduğunu bildirir.
+"""
+import threading
+import time
+
+from flask import jsonify
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+import config
+from common.db import db, get_client
+
+# İstek başına yapılan sorguların index'leri (kimlik, deste, swipe, eşleşme, sohbet, fotoğraf)
+HOT_PATH_INDEXES = {
+    "users": [[("email", ASCENDING)], [("university_location", ASCENDING), ("gender", ASCENDING)]],
+    "swipes": [[("swiper_id", ASCENDING), ("swipee_id", ASCENDING)]],
+    "matches": [[("user1_id", ASCENDING)], [("user2_id", ASCENDING)]],
+    "messages": [[("match_id", ASCENDING), ("timestamp", ASCENDING)]],
+    "photos": [[("user_id", ASCENDING)]],
+    "spotify": [[("user_id", ASCENDING)]],
+    # Son senkron çalışması, her /metrics okumasında sorgulanır
+    "spotify_sync_runs": [[("started_at", DESCENDING)]],
+}
+
+_ready = threading.Event()
+
+
+def ensure_indexes():
+    from restaurants import catalog
+
+    catalog.ensure_indexes()
+    for collection, indexes in HOT_PATH_INDEXES.items():
+        for keys in indexes:
+            try:
+                db[collection].create_index(keys)
+            except PyMongoError as e:
+                # Aynı anahtarlarda farklı seçenekli (ör. unique) bir index zaten varsa sorun değil
+                print(f"İndeks oluşturulamadı ({collection} {keys}): {str(e)}")
+
+
+def load_reference_data():
+    from common.reference_data import reference_data
+
+    reference_data.snapshot()
+
+
+def load_music_indexes():
+    from common.reference_data import reference_data
+    from matches import music_similarity
+
+    for location in reference_data.snapshot().location_ids_by_name:
+        music_similarity.index_for(location)
+
+
+def prime_hot_paths(app):
+    from flask_jwt_extended import create_access_token, decode_token
+
+    with app.app_context():
+        decode_token(create_access_token(identity="warmup"))
+    app.test_client().get("/auth/universities")
+
+
+def warmup(app):
+    started = time.perf_counter()
+    steps = []
+    if config.WARMUP_ENSURE_INDEXES:
+        steps.append(("indexes", ensure_indexes))
+    steps.append(("reference data", load_reference_data))
+    if config.WARMUP_MUSIC_INDEXES:
+        steps.append(("music indexes", load_music_indexes))
+    steps.append(("hot paths", lambda: prime_hot_paths(app)))
+
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            # Her adım yalnızca sonraki isteklerin işini azaltır; başarısız olan adım worker'ı durdurmamalı
+            print(f"Warmup adımı başarısız ({name}): {str(e)}")
+    _ready.set()
+    print(f"Warmup tamamlandı ({time.perf_counter() - started:.2f}s)")
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def healthz_view():
+    return jsonify({"status": "ok"}), 200
+
+
+def readyz_view():
+    if not _ready.is_set():
+        return jsonify({"status": "warming up"}), 503
+    try:
+        get_client().admin.command("ping")
+    except PyMongoError as e:
+        return jsonify({"status": "database unavailable", "error": str(e)}), 503
+    return jsonify({"status": "ready"}), 200
+
+
+def init_app(app):
+    app.add_url_rule("/healthz", "healthz", healthz_view, methods=["GET"])
+    app.add_url_rule("/readyz", "readyz", readyz_view, methods=["GET"])
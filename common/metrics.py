@@ -0,0 +1,349 @@
+"""
+Süreç içi metrikler; /metrics altında Prometheus metin formatında sunulur.
+
+Kayıt bir dict araması ve kilitli bir artırmadan ibarettir, her istek ve her Mongo komutu
+için yeterince ucuzdur. Değerler süreç başınadır: birden çok worker varsa her biri ayrı
+okunmalı (ya da toplayıcıda birleştirilmeli).
+"""
+import threading
+import time
+from bisect import bisect_left
+from datetime import timezone
+from urllib.parse import urlsplit
+
+from flask import Response, g, request
+from pymongo import monitoring
+
+import config
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+# Değeri bu sürecin dışında tutulan gauge'ları ayarlamak için her okumadan önce çağrılır
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(child.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {cumulative}"
+
+
+def register_collector(collect):
+    _collectors.append(collect)
+    return collect
+
+
+def render():
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:
+            print(f"Metrik toplanamadı ({collect.__name__}): {str(e)}")
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# --- HTTP sunucusu ------------------------------------------------------------------
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP responses by route and status.",
+    ("blueprint", "endpoint", "method", "status"))
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.",
+    ("blueprint", "endpoint", "method"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+rate_limited_total = Counter(
+    "rate_limited_total", "Requests rejected by admission control (common.rate_limit).", ("endpoint",))
+http_response_compression_seconds_total = Counter(
+    "http_response_compression_seconds_total", "CPU time spent compressing responses (common.compression).",
+    ("endpoint", "encoding"))
+http_response_uncompressed_bytes_total = Counter(
+    "http_response_uncompressed_bytes_total", "Response bytes before compression.", ("endpoint", "encoding"))
+http_response_compressed_bytes_total = Counter(
+    "http_response_compressed_bytes_total", "Response bytes after compression.", ("endpoint", "encoding"))
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    http_requests_in_flight.inc()
+
+
+def _after_request(response):
+    started = g.get("_metrics_started")
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"
+        blueprint = request.blueprint or ""
+        http_request_duration_seconds.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+        http_requests_total.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+
+def _teardown_request(exc):
+    if g.pop("_metrics_started", None) is not None:
+        http_requests_in_flight.dec()
+
+
+def metrics_view():
+    return Response(render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
+
+
+# --- JWT ------------------------------------------------------------------------------
+
+jwt_tokens_signed_total = Counter(
+    "jwt_tokens_signed_total", "JWTs signed by type (common.jwt_tokens).", ("token_type",))
+jwt_verifications_total = Counter(
+    "jwt_verifications_total", "JWT signature verifications by outcome.", ("outcome",))
+jwt_claims_cache_hits_total = Counter(
+    "jwt_claims_cache_hits_total", "JWT decodes answered from the per-request claims cache.")
+
+
+# --- Önbellek geçersizleştirme ---------------------------------------------------------------
+
+invalidation_changes_total = Counter(
+    "invalidation_changes_total", "Changes read from the change stream by this node's watcher.",
+    ("collection", "operation"))
+invalidation_changes_applied_total = Counter(
+    "invalidation_changes_applied_total", "Changes dispatched to this process's caches.", ("collection",))
+invalidation_delivery_failures_total = Counter(
+    "invalidation_delivery_failures_total", "Changes that could not be sent to a worker's socket.")
+
+# --- MongoDB ------------------------------------------------------------------------
+
+mongo_command_duration_seconds = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection.",
+    ("collection", "command"))
+mongo_command_failures_total = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands by collection.",
+    ("collection", "command"))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """ Ortak istemcinin gönderdiği her komutu hedef koleksiyona göre süreler """
+
+    def __init__(self):
+        self._pending = {}
+
+    @staticmethod
+    def _collection(event):
+        command = event.command
+        if event.command_name == "getMore":
+            return command.get("collection", "")
+        target = command.get(event.command_name)
+        return target if isinstance(target, str) else ""
+
+    def started(self, event):
+        self._pending[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration_seconds.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration_seconds.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        mongo_command_failures_total.labels(collection, event.command_name).inc()
+
+
+mongo_listener = MongoCommandListener()
+
+
+# --- Dış HTTP ------------------------------------------------------------------
+
+http_client_requests_total = Counter(
+    "http_client_requests_total", "Outbound HTTP calls by upstream service and outcome.",
+    ("service", "status"))
+http_client_request_duration_seconds = Histogram(
+    "http_client_request_duration_seconds", "Outbound HTTP call latency by upstream service.",
+    ("service",))
+
+_services = {}
+
+
+def service_for(host):
+    """ Dış host'u spotify/google/microsoft'a (ya da host'un kendisine) eşler """
+    service = _services.get(host)
+    if service is None:
+        known = {
+            urlsplit(config.SPOTIFY_ACCOUNTS_URL).netloc: "spotify",
+            urlsplit(config.SPOTIFY_API_URL).netloc: "spotify",
+            urlsplit(config.GOOGLE_CERTS_URL).netloc: "google",
+            urlsplit(config.MICROSOFT_LOGIN_URL).netloc: "microsoft",
+            urlsplit(config.MICROSOFT_JWKS_URL).netloc: "microsoft",
+        }
+        service = _services[host] = known.get(host, host)
+    return service
+
+
+def observe_http_client(host, status, elapsed):
+    service = service_for(host)
+    http_client_requests_total.labels(service, str(status)).inc()
+    http_client_request_duration_seconds.labels(service).observe(elapsed)
+
+
+# --- Spotify toplu senkron --------------------------------------------------------------
+# Senkron ayrı bir süreçte çalışır (python -m spotify.sync) ve ilerlemesini `spotify_sync_runs`'a
+# yazar; her worker okunduğunda son çalışmayı oradan alır.
+
+spotify_sync_last_run_users = Gauge(
+    "spotify_sync_last_run_users", "Users processed by the latest Spotify sync run by outcome.", ("outcome",))
+spotify_sync_last_run_remaining_users = Gauge(
+    "spotify_sync_last_run_remaining_users", "Users left in the latest Spotify sync run.")
+spotify_sync_last_run_requests = Gauge(
+    "spotify_sync_last_run_requests", "Spotify API calls issued by the latest sync run.")
+spotify_sync_last_run_throttled = Gauge(
+    "spotify_sync_last_run_throttled", "429 responses received by the latest sync run.")
+spotify_sync_last_run_running = Gauge(
+    "spotify_sync_last_run_running", "1 while the latest sync run is in progress.")
+spotify_sync_last_run_updated_timestamp_seconds = Gauge(
+    "spotify_sync_last_run_updated_timestamp_seconds", "When the latest sync run last saved its progress.")
+
+
+@register_collector
+def _collect_spotify_sync():
+    from common.db import db
+
+    run = db["spotify_sync_runs"].find_one({}, sort=[("started_at", -1)])
+    if run is None:
+        return
+    for outcome in ("synced", "failed", "skipped"):
+        spotify_sync_last_run_users.labels(outcome).set(run.get(outcome, 0))
+    processed = sum(run.get(outcome, 0) for outcome in ("synced", "failed", "skipped"))
+    spotify_sync_last_run_remaining_users.set(max(run.get("total", processed) - processed, 0))
+    spotify_sync_last_run_requests.set(run.get("requests", 0))
+    spotify_sync_last_run_throttled.set(run.get("throttled", 0))
+    spotify_sync_last_run_running.set(1 if run.get("status") == "running" else 0)
+    updated_at = run.get("updated_at") or run["started_at"]
+    spotify_sync_last_run_updated_timestamp_seconds.set(updated_at.replace(tzinfo=timezone.utc).timestamp())
@@ -0,0 +1,211 @@
+"""
+Tek tek isteklerin istek üzerine profillenmesi.
+
+Geçerli bir `X-Profile` başlığı taşıyan ya da PROFILE_SAMPLE_RATE ile seçilen istek
+profillenir. İstek sürerken bir örnekleyici thread, istek thread'inin yığınını her
+PROFILE_INTERVAL_MS'de kaydeder; o thread'in gönderdiği Mongo komutları süreleriyle
+loglanır. Teardown'da PROFILE_DIR'e iki dosya yazılır: `<id>.collapsed` (flamegraph.pl /
+speedscope "collapsed stack" formatı) ve Mongo zaman çizelgesini de içeren
+`<id>.speedscope.json`.
+
+Başlık `<unix-ts>:<hex hmac-sha256(PROFILE_SECRET, "<unix-ts>:<path>")>` biçimindedir, bkz.
+`sign_profile_header`. Ne PROFILE_SECRET ne de örnekleme oranı ayarlıysa `init_app` hiçbir
+şey kaydetmez; kapalı profilleme istek başına maliyet getirmez.
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+from flask import g, request
+from pymongo import monitoring
+
+import config
+
+HEADER = "X-Profile"
+HEADER_MAX_AGE = 300
+
+_active = {}
+_short_paths = {}
+
+
+def sign_profile_header(path, secret=None, timestamp=None):
+    """ `path` için X-Profile değeri üretir (yönetim araçları için yardımcı) """
+    timestamp = str(int(timestamp if timestamp is not None else time.time()))
+    secret = (secret or config.PROFILE_SECRET).encode()
+    digest = hmac.new(secret, f"{timestamp}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}:{digest}"
+
+
+def _valid_header(value, path):
+    if not config.PROFILE_SECRET or not value or ":" not in value:
+        return False
+    timestamp, _ = value.split(":", 1)
+    try:
+        if abs(time.time() - int(timestamp)) > HEADER_MAX_AGE:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(value, sign_profile_header(path, timestamp=int(timestamp)))
+
+
+class RequestProfile:
+    def __init__(self, thread_id, label, interval):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.thread_id = thread_id
+        self.label = label
+        self.interval = interval
+        self.stacks = {}
+        self.samples = []
+        self.mongo_calls = []
+        self._pending = {}
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = _short_paths.get(code.co_filename)
+                if filename is None:
+                    filename = _short_paths[code.co_filename] = os.path.relpath(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples.append((time.perf_counter() - self._started, stack))
+
+    def mongo_started(self, event):
+        self._pending[event.request_id] = (time.perf_counter() - self._started, event.command_name,
+                                           event.command.get(event.command_name))
+
+    def mongo_finished(self, event, failed):
+        started = self._pending.pop(event.request_id, None)
+        if started is None:
+            return
+        offset, command_name, target = started
+        self.mongo_calls.append({
+            "start_ms": round(offset * 1000, 3),
+            "duration_ms": event.duration_micros / 1000,
+            "command": command_name,
+            "collection": target if isinstance(target, str) else None,
+            "failed": failed
+        })
+
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.id)
+        with open(base + ".collapsed", "w") as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(";".join(frame.replace(";", ":") for frame in stack) + f" {count}\n")
+
+        frames, frame_index = [], {}
+        samples, weights = [], []
+        for _, stack in self.samples:
+            indices = []
+            for name in stack:
+                if name not in frame_index:
+                    frame_index[name] = len(frames)
+                    frames.append({"name": name})
+                indices.append(frame_index[name])
+            samples.append(indices)
+            weights.append(self.interval * 1000)
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.label,
+            "exporter": "blinder-backend",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.label,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(self.duration * 1000, 3),
+                "samples": samples,
+                "weights": weights
+            }],
+            "mongo_timeline": self.mongo_calls
+        }
+        with open(base + ".speedscope.json", "w") as f:
+            json.dump(document, f)
+        return base
+
+
+class ProfilingCommandListener(monitoring.CommandListener):
+    """ Mongo komutlarını, varsa, onları gönderen thread'in profiline iletir """
+
+    def started(self, event):
+        profile = _active.get(threading.get_ident())
+        if profile is not None:
+            profile.mongo_started(event)
+
+    def succeeded(self, event):
+        profile = _active.get(threading.get_ident())
+        if profile is not None:
+            profile.mongo_finished(event, failed=False)
+
+    def failed(self, event):
+        profile = _active.get(threading.get_ident())
+        if profile is not None:
+            profile.mongo_finished(event, failed=True)
+
+
+def _should_profile():
+    if _valid_header(request.headers.get(HEADER), request.path):
+        return True
+    return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+
+def _before_request():
+    if not _should_profile():
+        return
+    thread_id = threading.get_ident()
+    profile = RequestProfile(thread_id, f"{request.method} {request.path}", config.PROFILE_INTERVAL_MS / 1000)
+    _active[thread_id] = profile
+    g._profile = profile
+    profile.start()
+
+
+def _teardown_request(exc):
+    profile = g.pop("_profile", None)
+    if profile is None:
+        return
+    _active.pop(profile.thread_id, None)
+    profile.stop()
+    try:
+        path = profile.write(config.PROFILE_DIR)
+        print(f"Profil kaydedildi: {path}.speedscope.json")
+    except OSError as e:
+        print(f"Profil yazılamadı: {str(e)}")
+
+
+def enabled():
+    return bool(config.PROFILE_SECRET) or config.PROFILE_SAMPLE_RATE > 0
+
+
+mongo_listener = ProfilingCommandListener()
+
+
+def init_app(app):
+    if not enabled():
+        return
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,186 @@
+"""
+Token bucket ile kabul kontrolü.
+
+Her istek, rotasının maliyetini çağırana (JWT kimliği, anonim isteklerde istemci IP'si)
+ve endpoint'e göre anahtarlanan bir kovadan düşer. Kovalar en çok RATE_LIMIT_CAPACITY
+token tutar ve saniyede RATE_LIMIT_REFILL_RATE token dolar; ödeyemeyen istek 429 ve
+Retry-After başlığıyla reddedilir.
+
+Anonim giriş ve kayıt (AUTH_ENDPOINTS) IP başına daha büyük kovalar kullanır
+(RATE_LIMIT_AUTH_CAPACITY / RATE_LIMIT_AUTH_REFILL_RATE), çünkü birçok öğrenci aynı kampüs
+adresini paylaşır. Proxy arkasında istemci IP'si yalnızca TRUSTED_PROXY_HOPS ayarlıysa
+doğrudur (main.create_app'teki ProxyFix).
+
+İki backend vardır: `MemoryBackend` kovaları worker içinde tutar (limitler worker
+başınadır), `MongoBackend` onları `rate_limits` koleksiyonunda tutar ve tek bir atomik
+pipeline update ile günceller; böylece limit tüm worker'larca paylaşılır.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+import config
+from common import metrics
+
+# Ağır rotalar daha pahalı: deste oluşturma, parola hash'leme, token doğrulama, e-posta
+DEFAULT_ROUTE_COSTS = {
+    "match.get_potential_matches": 3,
+    "auth.signin": 10,
+    "auth.manual_register": 10,
+    "auth.google_login": 5,
+    "auth.microsoft_login": 5,
+    "auth.send_verification": 20,
+    "auth.verify_code": 5,
+    "auth.upload_photos": 5,
+    "restaurants.get_restaurants": 2,
+    "spotify.get_top": 2,
+}
+EXEMPT_ENDPOINTS = {"metrics", "static", "healthz", "readyz"}
+AUTH_ENDPOINTS = {
+    "auth.signin", "auth.manual_register", "auth.google_login", "auth.microsoft_login",
+    "auth.send_verification", "auth.verify_code",
+}
+
+
+def parse_route_costs(value):
+    costs = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        endpoint, _, cost = item.partition("=")
+        costs[endpoint.strip()] = float(cost)
+    return costs
+
+
+class MemoryBackend:
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, cost, capacity, rate):
+        """ (izin_verildi, retry_after_saniye) döner """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+class MongoBackend:
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexed = False
+
+    def _ensure_index(self):
+        if not self._indexed:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+
+    def consume(self, key, cost, capacity, rate):
+        """ Doldurma, kontrol ve düşmeyi sunucu saatiyle tek bir sunucu tarafı update'te yapar """
+        self._ensure_index()
+        idle_ms = math.ceil(capacity / rate * 1000)
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$ts", "$$NOW"]}]}, 1000]}
+        pipeline = [
+            {"$set": {
+                "tokens": {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]},
+                                                        {"$multiply": [elapsed, rate]}]}]},
+                "ts": "$$NOW"
+            }},
+            {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                # Yeniden dolacak kadar boşta kalmış kova durum taşımaz
+                "expires_at": {"$add": ["$$NOW", idle_ms]}
+            }}
+        ]
+        for attempt in range(2):
+            try:
+                doc = self.collection.find_one_and_update(
+                    {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER)
+                break
+            except DuplicateKeyError:
+                # İki worker aynı kovayı aynı anda oluşturdu; tekrar deneme mevcut olanı günceller
+                if attempt:
+                    raise
+        allowed = doc["allowed"]
+        return allowed, 0.0 if allowed else (cost - doc["tokens"]) / rate
+
+
+class RateLimiter:
+    def __init__(self, backend, capacity, rate, route_costs=None, auth_capacity=None, auth_rate=None):
+        self.backend = backend
+        self.capacity = capacity
+        self.rate = rate
+        self.auth_capacity = auth_capacity or capacity
+        self.auth_rate = auth_rate or rate
+        self.route_costs = dict(DEFAULT_ROUTE_COSTS, **(route_costs or {}))
+
+    def cost_for(self, endpoint):
+        return self.route_costs.get(endpoint, 1)
+
+    def check(self, caller, endpoint):
+        cost = self.cost_for(endpoint)
+        if cost <= 0:
+            return True, 0.0
+        if endpoint in AUTH_ENDPOINTS and caller.startswith("ip:"):
+            return self.backend.consume(f"auth-{caller}|{endpoint}", cost, self.auth_capacity, self.auth_rate)
+        return self.backend.consume(f"{caller}|{endpoint}", cost, self.capacity, self.rate)
+
+
+def _caller():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    return f"user:{identity}" if identity else f"ip:{request.remote_addr}"
+
+
+def create_limiter():
+    if config.RATE_LIMIT_BACKEND == "mongo":
+        from common.db import db
+        backend = MongoBackend(db["rate_limits"])
+    else:
+        backend = MemoryBackend()
+    return RateLimiter(backend, config.RATE_LIMIT_CAPACITY, config.RATE_LIMIT_REFILL_RATE,
+                       parse_route_costs(config.RATE_LIMIT_ROUTE_COSTS),
+                       config.RATE_LIMIT_AUTH_CAPACITY, config.RATE_LIMIT_AUTH_REFILL_RATE)
+
+
+def init_app(app, limiter=None):
+    if not config.RATE_LIMIT_ENABLED:
+        return
+    limiter = limiter or create_limiter()
+
+    def _before_request():
+        endpoint = request.endpoint
+        if request.method == "OPTIONS" or endpoint is None or endpoint in EXEMPT_ENDPOINTS:
+            return None
+        try:
+            allowed, retry_after = limiter.check(_caller(), endpoint)
+        except PyMongoError as e:
+            # Ortak depo çöktüğünde API de onunla birlikte çökmemeli
+            print(f"Rate limit kontrolü yapılamadı: {str(e)}")
+            return None
+        if allowed:
+            return None
+        metrics.rate_limited_total.labels(endpoint).inc()
+        response = jsonify({"error": "Çok fazla istek! Lütfen biraz sonra tekrar deneyin."})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    app.before_request(_before_request)
+    app.extensions["rate_limiter"] = limiter
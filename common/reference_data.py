@@ -0,0 +1,100 @@
+import hashlib
+import json
+import threading
+import time
+
+from common import causal, invalidation
+from common.db import db
+
+VERSION_KEY = "reference_data"
+
+
+class _Snapshot:
+    __slots__ = ("version", "universities_body", "etag", "location_ids_by_name", "location_names_by_id")
+
+    def __init__(self, version, universities_body, etag, location_ids_by_name, location_names_by_id):
+        self.version = version
+        self.universities_body = universities_body
+        self.etag = etag
+        self.location_ids_by_name = location_ids_by_name
+        self.location_names_by_id = location_names_by_id
+
+
+class ReferenceDataCache:
+    """
+    Statik `universities` ve `locations` koleksiyonlarının süreç genelindeki kopyası.
+    - Üniversite listesi içerikten türetilen bir ETag ile önceden serileştirilmiş tutulur.
+    - Sürüm sayacı (counters/_id=reference_data) artınca (en fazla `check_interval` saniyede
+      bir bakılır) ya da bir değişiklik bildirimi `invalidate()`'i çağırınca yeniden yüklenir.
+    - Listeler secondary'den okunabilir (okuma rotası "reference"); sürümle aynı causal
+      session'da okunduklarından, kaydedildikleri sürümden eski listeler önbelleğe girmez.
+    """
+
+    def __init__(self, db, check_interval=30):
+        self.db = db
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._last_check = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def _read_version(self, session=None):
+        doc = self.db.counters.find_one({"_id": VERSION_KEY}, {"seq": 1}, session=session)
+        return doc["seq"] if doc else 0
+
+    def _load(self, version, session=None):
+        universities = list(self.db.universities.for_reads("reference").find(
+            {}, {"_id": 0, "location_id": 1, "universities": 1}, session=session))
+        locations = list(self.db.locations.for_reads("reference").find({}, {"_id": 1, "name": 1}, session=session))
+
+        location_names_by_id = {loc["_id"]: loc["name"] for loc in locations}
+        location_ids_by_name = {loc["name"]: loc["_id"] for loc in locations}
+
+        for uni in universities:
+            uni["location"] = location_names_by_id.get(uni.pop("location_id"), "Unknown")
+
+        body = json.dumps(universities, sort_keys=True).encode("utf-8")
+        etag = hashlib.sha1(body).hexdigest()
+        return _Snapshot(version, body, etag, location_ids_by_name, location_names_by_id)
+
+    def snapshot(self):
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale and now - self._last_check < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not self._stale and now - self._last_check < self.check_interval:
+                return snapshot
+            with causal.start_session() as session:
+                version = self._read_version(session)
+                if snapshot is None or self._stale or version != snapshot.version:
+                    snapshot = self._load(version, session)
+                    self._snapshot = snapshot
+                    self._stale = False
+            self._last_check = now
+            return snapshot
+
+    def invalidate(self):
+        """ Önbelleği bayat işaretler; sonraki erişim yeniden yükler """
+        self._stale = True
+
+    def bump_version(self):
+        """ Referans verisinin değiştiğini (ortak sayaç üzerinden) tüm süreçlere bildirir """
+        self.db.counters.update_one({"_id": VERSION_KEY}, {"$inc": {"seq": 1}}, upsert=True)
+        self.invalidate()
+
+    def location_id_for(self, name):
+        return self.snapshot().location_ids_by_name.get(name)
+
+
+reference_data = ReferenceDataCache(db)
+
+
+def _on_change(change):
+    reference_data.invalidate()
+
+
+invalidation.register("universities", _on_change)
+invalidation.register("locations", _on_change)
@@ -0,0 +1,175 @@
+"""
+Kullanıcı başına view'lar için koşullu GET ve yanıt önbelleği.
+
+Her kullanıcının `cache_versions`'ta bir sürüm sayacı vardır; önbellekteki view'larından
+birini (profil, fotoğraflar, eşleşme listesi) değiştiren her yazma onu artırır. View'ın
+ETag'i yalnızca bu sürümden türetilir; `If-None-Match` sadece sayaç okunarak 304 ile
+yanıtlanır, kullanıcı, fotoğraf ya da eşleşme dokümanına dokunulmaz. Serileştirilmiş
+gövdeler (scope, user, version) anahtarlı, bayt sınırlı bir LRU'da tutulur; değişmemiş
+view yeniden oluşturulmadan sunulur. Akışla gönderilen view'lar gönderilirken önbelleğe
+alınır, RESPONSE_CACHE_MAX_ENTRY_BYTES'ı aşmadıkça.
+
+Ezberlenen sürümler (CACHE_VERSION_MEMO_TTL) sayaç değişince her worker'da silinir
+(common.invalidation).
+
+Yazan kod sürümü yazmasından *sonra* artırmalıdır: yazma ile artırma arasında oluşturulan
+view eski sürümle önbelleğe girer ve yeni sürüm için hiç sunulmaz.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+from pymongo import UpdateOne
+
+import config
+from common import causal, invalidation
+from common.db import db
+
+versions_collection = db["cache_versions"]
+
+
+class VersionStore:
+    def __init__(self, collection, memo_ttl=0):
+        self.collection = collection
+        self.memo_ttl = memo_ttl
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, session=None):
+        if self.memo_ttl > 0:
+            memo = self._memo.get(user_id)
+            if memo is not None and memo[1] > time.monotonic():
+                return memo[0]
+        doc = self.collection.find_one({"_id": user_id}, {"v": 1}, session=session)
+        version = doc["v"] if doc else 0
+        if self.memo_ttl > 0:
+            with self._lock:
+                self._memo[user_id] = (version, time.monotonic() + self.memo_ttl)
+        return version
+
+    def bump(self, *user_ids):
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+        if not user_ids:
+            return
+        self.collection.bulk_write(
+            [UpdateOne({"_id": user_id}, {"$inc": {"v": 1}}, upsert=True) for user_id in user_ids],
+            ordered=False
+        )
+        self.forget(*user_ids)
+
+    def forget(self, *user_ids):
+        """ Ezberlenen sürümleri siler (argümansız çağrılırsa hepsini) """
+        with self._lock:
+            if not user_ids:
+                self._memo.clear()
+            for user_id in user_ids:
+                self._memo.pop(user_id, None)
+
+
+class BodyCache:
+    """ Serileştirilmiş yanıt gövdelerinin toplam bayt boyutuyla sınırlı LRU'su """
+
+    def __init__(self, max_bytes, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_bytes, max_entry_bytes or max_bytes)
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+versions = VersionStore(versions_collection, memo_ttl=config.CACHE_VERSION_MEMO_TTL)
+bodies = BodyCache(config.RESPONSE_CACHE_MAX_BYTES, config.RESPONSE_CACHE_MAX_ENTRY_BYTES)
+
+
+def bump(*user_ids):
+    versions.bump(*user_ids)
+
+
+def _on_version_change(change):
+    # Her artırmayı tüm worker'lar görür; ezberlenen sürümler sayaçtan uzun yaşamaz
+    if change.document_id is None:
+        versions.forget()
+    else:
+        versions.forget(change.document_id)
+
+
+invalidation.register(versions_collection.name, _on_version_change)
+
+
+def _capture(chunks, key):
+    """ Akışla gönderilen gövdeyi geçirir, tamamı gönderildiğinde önbelleğe alır """
+    captured = []
+    size = 0
+    try:
+        for chunk in chunks:
+            if captured is not None:
+                size += len(chunk)
+                if size > bodies.max_entry_bytes:
+                    captured = None
+                else:
+                    captured.append(chunk)
+            yield chunk
+        # Yarıda hata veren akış hatayı gövdesinde bildirir; böyle bir gövde önbelleğe alınmaz
+        if captured is not None and not getattr(chunks, "failed", False):
+            bodies.put(key, b"".join(captured))
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def cached_response(scope, user_id, build):
+    """
+    `user_id` için `scope`'u sürümüne göre sunar.
+    - İstemcinin ETag'i eşleşirse 304, önbellekte gövde varsa o, yoksa `build()` (normal view dönüşü).
+    - Yalnızca 200 yanıtlar önbelleğe alınır.
+    - Sürüm isteğin causal session'ında okunur; aynı session'da secondary'den okuyan `build()`
+      artırılan yazmayı görür.
+    """
+    version = versions.get(user_id, session=causal.session())
+    etag = f"{scope}-{user_id}-{version}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        key = (scope, user_id, version)
+        body = bodies.get(key)
+        if body is None:
+            response = current_app.make_response(build())
+            if response.status_code != 200:
+                return response
+            if response.is_streamed:
+                response.response = _capture(response.response, key)
+            else:
+                bodies.put(key, response.get_data())
+        else:
+            response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,222 @@
+"""
+`users` koleksiyonuna projection ile erişim.
+
+Her okuma ihtiyaç duyduğu görünümü belirtir ve yalnızca o alanları getirir:
+
+    identity  çağıran kim: _id, email ve sorguları yönlendiren alanlar
+    auth      email ve parola hash'i (yalnızca giriş)
+    card      diğer kullanıcıların destede ve eşleşme listesinde gördükleri
+    profile   sahibinin tam profili, parola hash'i asla dahil değil
+
+Her görünümün küçük bir `__slots__` kayıt sınıfı ve tek bir `to_json()` serileştiricisi vardır.
+
+Aktivite (`last_active_at`) okumalarda değil, bir after-request hook'unda kaydedilir:
+kimliği doğrulanmış istekler onu en fazla ACTIVE_TOUCH_INTERVAL'da bir ileri alır ve bu
+güncellemeler geçersizleştirme change stream'ine girmez.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from pymongo.errors import PyMongoError
+
+from common import invalidation
+from common.db import db
+
+users_collection = db["users"]
+
+IDENTITY_FIELDS = ("email", "university_location", "gender_preference")
+AUTH_FIELDS = ("email", "password")
+CARD_FIELDS = (
+    "name", "university", "university_location", "birthdate", "zodiac_sign", "gender", "height",
+    "relationship_goal", "likes", "values", "alcohol", "smoking", "religion", "political_view",
+    "favorite_food", "about", "picture"
+)
+PROFILE_FIELDS = (
+    "name", "email", "google_id", "microsoft_id", "picture", "locale", "created_at", "university",
+    "university_location", "birthdate", "zodiac_sign", "gender", "gender_preference", "height",
+    "relationship_goal", "likes", "values", "alcohol", "smoking", "religion", "political_view",
+    "favorite_food", "about"
+)
+LIST_FIELDS = {"likes", "values", "favorite_food"}
+ACTIVE_TOUCH_INTERVAL = timedelta(hours=1)
+IDENTITY_CACHE_SIZE = 100000
+
+# e-posta -> _id süreç boyunca önbellekte tutulur; silinen hesapların ya da değişen
+# e-postaların kayıtları common.invalidation ile her worker'da silinir
+_ids_by_email = OrderedDict()
+_ids_lock = threading.Lock()
+# kullanıcı _id -> bu sürecin son aktivite güncellemesinin time.monotonic() değeri
+_touched_at = OrderedDict()
+_touched_lock = threading.Lock()
+
+
+def projection(fields):
+    return {field: 1 for field in fields}
+
+
+class _Record:
+    __slots__ = ("id",)
+    fields = ()
+
+    @classmethod
+    def from_doc(cls, doc):
+        record = cls.__new__(cls)
+        record.id = doc["_id"]
+        for field in cls.fields:
+            setattr(record, field, doc.get(field, [] if field in LIST_FIELDS else None))
+        return record
+
+
+class UserIdentity(_Record):
+    __slots__ = IDENTITY_FIELDS
+    fields = IDENTITY_FIELDS
+
+
+class UserAuth(_Record):
+    __slots__ = AUTH_FIELDS
+    fields = AUTH_FIELDS
+
+
+class UserCard(_Record):
+    __slots__ = CARD_FIELDS
+    fields = CARD_FIELDS
+
+    def to_json(self):
+        data = {"user_id": str(self.id)}
+        for field in CARD_FIELDS:
+            data[field] = getattr(self, field)
+        return data
+
+
+class UserProfile(_Record):
+    __slots__ = PROFILE_FIELDS
+    fields = PROFILE_FIELDS
+
+    def to_json(self):
+        data = {"_id": self.id}
+        for field in PROFILE_FIELDS:
+            data[field] = getattr(self, field)
+        return data
+
+
+def find_identity(email):
+    doc = users_collection.find_one({"email": email}, projection(IDENTITY_FIELDS))
+    return UserIdentity.from_doc(doc) if doc else None
+
+
+def user_id_for_email(email):
+    """ JWT kimliğini kullanıcı id'sine çevirir; Mongo'yu süreç başına yalnızca ilk çağrıda okur """
+    with _ids_lock:
+        user_id = _ids_by_email.get(email)
+        if user_id is not None:
+            _ids_by_email.move_to_end(email)
+            return user_id
+    doc = users_collection.find_one({"email": email}, {"_id": 1})
+    if not doc:
+        return None
+    with _ids_lock:
+        _ids_by_email[email] = doc["_id"]
+        if len(_ids_by_email) > IDENTITY_CACHE_SIZE:
+            _ids_by_email.popitem(last=False)
+    return doc["_id"]
+
+
+def forget_identity(user_id=None):
+    """ `user_id`'nin önbellekteki e-posta -> _id eşlemelerini ya da hepsini siler """
+    with _ids_lock:
+        if user_id is None:
+            _ids_by_email.clear()
+            return
+        for email in [email for email, cached_id in _ids_by_email.items() if cached_id == user_id]:
+            del _ids_by_email[email]
+
+
+def _on_user_change(change):
+    if change.document_id is None:
+        forget_identity()
+    elif change.touches("email"):
+        forget_identity(change.document_id)
+
+
+invalidation.register("users", _on_user_change)
+invalidation.ignore_updates("users", "last_active_at")
+
+
+def touch_active(user_id):
+    """ last_active_at ACTIVE_TOUCH_INTERVAL'dan eskiyse ileri alır; süreç ve kullanıcı başına aralıkta bir kez """
+    now = time.monotonic()
+    with _touched_lock:
+        touched_at = _touched_at.get(user_id)
+        if touched_at is not None and now - touched_at < ACTIVE_TOUCH_INTERVAL.total_seconds():
+            return False
+        _touched_at[user_id] = now
+        _touched_at.move_to_end(user_id)
+        if len(_touched_at) > IDENTITY_CACHE_SIZE:
+            _touched_at.popitem(last=False)
+    active_at = datetime.utcnow()
+    result = users_collection.update_one(
+        {"_id": user_id, "$or": [{"last_active_at": {"$exists": False}},
+                                 {"last_active_at": {"$lt": active_at - ACTIVE_TOUCH_INTERVAL}}]},
+        {"$set": {"last_active_at": active_at}}
+    )
+    return result.modified_count > 0
+
+
+def record_activity(response):
+    """ After-request hook'u: çağıranın kullanıcı id'si kimlik önbelleğinden gelir """
+    try:
+        verify_jwt_in_request(optional=True)
+        email = get_jwt_identity()
+    except Exception:
+        return response
+    if not email:
+        return response
+    try:
+        user_id = user_id_for_email(email)
+        if user_id is not None:
+            touch_active(user_id)
+    except PyMongoError as e:
+        print(f"Aktiflik zamanı kaydedilemedi: {str(e)}")
+    return response
+
+
+def init_app(app):
+    app.after_request(record_activity)
+
+
+def find_auth(email):
+    """ Giriş için tek okumadan (UserAuth, UserProfile) döner """
+    doc = users_collection.find_one({"email": email}, projection(AUTH_FIELDS + PROFILE_FIELDS))
+    if not doc:
+        return None, None
+    return UserAuth.from_doc(doc), UserProfile.from_doc(doc)
+
+
+def find_profile(email):
+    doc = users_collection.find_one({"email": email}, projection(PROFILE_FIELDS))
+    return UserProfile.from_doc(doc) if doc else None
+
+
+def find_cards(query, limit):
+    """ Deste aday taraması; secondary'den sunulabilir (okuma rotası "candidates") """
+    cursor = users_collection.for_reads("candidates").find(query, projection(CARD_FIELDS)).limit(limit)
+    return [UserCard.from_doc(doc) for doc in cursor]
+
+
+def find_cards_by_id(user_ids):
+    """ Birden çok kullanıcıyı tek sorguda getirir; {user_id: UserCard} döner """
+    if not user_ids:
+        return {}
+    cursor = users_collection.find({"_id": {"$in": list(user_ids)}}, projection(CARD_FIELDS))
+    return {doc["_id"]: UserCard.from_doc(doc) for doc in cursor}
+
+
+def email_exists(email):
+    return users_collection.find_one({"email": email}, {"_id": 1}) is not None
+
+
+def user_exists(user_id):
+    return users_collection.find_one({"_id": user_id}, {"_id": 1}) is not None
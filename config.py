@@ -5,6 +5,10 @@ load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+# Access token süresi ve yenileme eşiği (saniye): kalan süre eşiğin altına düştüğünde
+# yanıtta X-Refresh-Token ile yeni token gönderilir
+JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES", 604800))
+JWT_REFRESH_THRESHOLD = int(os.getenv("JWT_REFRESH_THRESHOLD", 86400))
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
@@ -20,3 +24,143 @@ MICROSOFT_REDIRECT_URI = os.getenv("MICROSOFT_REDIRECT_URI")
 
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+
+# Dış servis adresleri (yerel sahte sunucular ile test/benchmark için değiştirilebilir)
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL") or "https://accounts.spotify.com"
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL") or "https://api.spotify.com"
+MICROSOFT_LOGIN_URL = os.getenv("MICROSOFT_LOGIN_URL") or "https://login.microsoftonline.com"
+
+# Kimlik sağlayıcı imza anahtarları
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL") or "https://www.googleapis.com/oauth2/v1/certs"
+MICROSOFT_JWKS_URL = (
+    os.getenv("MICROSOFT_JWKS_URL")
+    or f"{MICROSOFT_LOGIN_URL}/{MICROSOFT_TENANT_ID}/discovery/v2.0/keys"
+)
+# Beklenen token issuer'ı bu belgeden okunur
+MICROSOFT_OPENID_CONFIG_URL = (
+    os.getenv("MICROSOFT_OPENID_CONFIG_URL")
+    or f"{MICROSOFT_LOGIN_URL}/{MICROSOFT_TENANT_ID}/v2.0/.well-known/openid-configuration"
+)
+
+# Dış HTTP çağrıları (Spotify, Google, Microsoft)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+HTTP_MAX_RETRY_AFTER = float(os.getenv("HTTP_MAX_RETRY_AFTER", 10))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 20))
+HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", 5))
+HTTP_BREAKER_RESET_SECONDS = float(os.getenv("HTTP_BREAKER_RESET_SECONDS", 30))
+
+# /auth/universities yanıtının istemci tarafında önbellekte tutulma süresi (saniye)
+REFERENCE_DATA_MAX_AGE = int(os.getenv("REFERENCE_DATA_MAX_AGE", 86400))
+
+# Restoran kataloğu
+RESTAURANT_CACHE_TTL = float(os.getenv("RESTAURANT_CACHE_TTL", 60))
+RESTAURANT_DEFAULT_RADIUS = int(os.getenv("RESTAURANT_DEFAULT_RADIUS", 5000))
+RESTAURANT_MAX_RADIUS = int(os.getenv("RESTAURANT_MAX_RADIUS", 50000))
+RESTAURANT_DEFAULT_LIMIT = int(os.getenv("RESTAURANT_DEFAULT_LIMIT", 20))
+RESTAURANT_MAX_LIMIT = int(os.getenv("RESTAURANT_MAX_LIMIT", 100))
+
+# Her worker'ın counters koleksiyonundan tek seferde ayırdığı kullanıcı ID sayısı
+USER_ID_BLOCK_SIZE = int(os.getenv("USER_ID_BLOCK_SIZE", 50))
+
+# İstek bazlı profil (PROFILE_SECRET veya PROFILE_SAMPLE_RATE verilmezse tamamen kapalı)
+PROFILE_SECRET = os.getenv("PROFILE_SECRET")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 2))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Spotify top listeleri: eşzamanlı çağrılar için thread sayısı ve /spotify/top süre sınırı (saniye)
+SPOTIFY_MAX_WORKERS = int(os.getenv("SPOTIFY_MAX_WORKERS", 8))
+SPOTIFY_TOP_DEADLINE = float(os.getenv("SPOTIFY_TOP_DEADLINE", 4))
+
+# Spotify top listeleri önbelleği (saniye): TTL sonrası bayat veri STALE_TTL'e kadar
+# sunulur ve arka planda yenilenir; yenileyici girdileri TTL'in REFRESH_AHEAD kadarı kala günceller
+SPOTIFY_TOP_TTL = int(os.getenv("SPOTIFY_TOP_TTL", 21600))
+SPOTIFY_TOP_STALE_TTL = int(os.getenv("SPOTIFY_TOP_STALE_TTL", 604800))
+SPOTIFY_TOP_REFRESH_AHEAD = float(os.getenv("SPOTIFY_TOP_REFRESH_AHEAD", 0.1))
+SPOTIFY_TOP_SCAN_INTERVAL = float(os.getenv("SPOTIFY_TOP_SCAN_INTERVAL", 60))
+SPOTIFY_TOP_REFRESH_BATCH = int(os.getenv("SPOTIFY_TOP_REFRESH_BATCH", 20))
+# Yenileyici düğüm başına tek süreçte çalışır: bu dosyanın kilidini alan worker (saniyede yeniden deneme)
+SPOTIFY_TOP_REFRESH_LOCK_PATH = os.getenv("SPOTIFY_TOP_REFRESH_LOCK_PATH", "/tmp/blinder-spotify-top.lock")
+SPOTIFY_TOP_REFRESH_ELECTION_INTERVAL = float(os.getenv("SPOTIFY_TOP_REFRESH_ELECTION_INTERVAL", 5))
+
+# Spotify access token'ı süresinin dolmasına bu kadar saniye kala yenilenir
+SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN", 300))
+
+# Toplu Spotify senkronizasyonu (python -m spotify.sync): worker sayısı, saniyedeki
+# istek hızı ve ani yük kapasitesi, turlar arası bekleme (saniye)
+SPOTIFY_SYNC_WORKERS = int(os.getenv("SPOTIFY_SYNC_WORKERS", 4))
+SPOTIFY_SYNC_RATE = float(os.getenv("SPOTIFY_SYNC_RATE", 5))
+SPOTIFY_SYNC_BURST = int(os.getenv("SPOTIFY_SYNC_BURST", 10))
+SPOTIFY_SYNC_INTERVAL = int(os.getenv("SPOTIFY_SYNC_INTERVAL", 3600))
+
+# Müzik zevki benzerliği (MinHash/LSH): imza uzunluğu, LSH bant sayısı (imza uzunluğunu
+# tam bölmeli) ve lokasyon bazlı indeksin bellekte tutulma süresi (saniye)
+MUSIC_MINHASH_PERMUTATIONS = int(os.getenv("MUSIC_MINHASH_PERMUTATIONS", 64))
+MUSIC_LSH_BANDS = int(os.getenv("MUSIC_LSH_BANDS", 32))
+MUSIC_INDEX_TTL = float(os.getenv("MUSIC_INDEX_TTL", 300))
+
+# İstek hızı sınırı: her kullanıcı (JWT kimliği, yoksa IP) ve route için ayrı token bucket.
+# Backend "memory" (worker başına) veya "mongo" (tüm worker'lar arasında paylaşılan).
+# RATE_LIMIT_ROUTE_COSTS varsayılan route maliyetlerini ezer: "match.get_potential_matches=3,auth.signin=10"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", 60))
+RATE_LIMIT_REFILL_RATE = float(os.getenv("RATE_LIMIT_REFILL_RATE", 1))
+RATE_LIMIT_ROUTE_COSTS = os.getenv("RATE_LIMIT_ROUTE_COSTS", "")
+# Giriş ve kayıt route'ları anonim çağrılarda IP başına kendi (daha büyük) bucket'ından harcar;
+# kampüs ağındaki kullanıcılar aynı IP'yi paylaşır
+RATE_LIMIT_AUTH_CAPACITY = float(os.getenv("RATE_LIMIT_AUTH_CAPACITY", 600))
+RATE_LIMIT_AUTH_REFILL_RATE = float(os.getenv("RATE_LIMIT_AUTH_REFILL_RATE", 10))
+# Uygulamanın önündeki güvenilir proxy sayısı; istemci IP'si X-Forwarded-For'un sondan
+# bu kadarıncı değerinden okunur (0 = başlıklara güvenilmez, bağlantının adresi kullanılır)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+
+# Koşullu GET / yanıt önbelleği: serileştirilmiş yanıtlar için bellek sınırı (bayt) ve
+# kullanıcı sürüm sayaçlarının süreç içinde tutulma süresi (saniye; 0 = her istekte oku).
+# Geçersiz kılma açıkken sayaç artışları diğer worker'lardaki kopyaları da hemen siler
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_VERSION_MEMO_TTL = float(os.getenv("CACHE_VERSION_MEMO_TTL", 0))
+# Akış halinde gönderilen yanıtlar bu boyutu aşarsa önbelleğe alınmaz (bayt)
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", 1024 * 1024))
+
+# Yanıt sıkıştırma: Accept-Encoding'e göre brotli (paket kuruluysa) veya gzip.
+# COMPRESSION_MIN_SIZE bayttan küçük yanıtlar sıkıştırılmaz; akış yanıtları her zaman sıkıştırılır
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+
+# Üretim sunucusu (gunicorn -c gunicorn.conf.py): dinlenen adres, worker ve thread sayıları,
+# istek zaman aşımı ve yeniden yüklemede devam eden isteklerin bitmesi için tanınan süre (saniye)
+WEB_BIND = os.getenv("WEB_BIND", "0.0.0.0:8000")
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", (os.cpu_count() or 1) * 2 + 1))
+WEB_THREADS = int(os.getenv("WEB_THREADS", 4))
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", 60))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", 5))
+WEB_PRELOAD = os.getenv("WEB_PRELOAD", "true").lower() == "true"
+
+# Worker trafik almadan önceki ısınma adımları: indeksler ve lokasyon bazlı müzik indeksleri
+WARMUP_ENSURE_INDEXES = os.getenv("WARMUP_ENSURE_INDEXES", "true").lower() == "true"
+WARMUP_MUSIC_INDEXES = os.getenv("WARMUP_MUSIC_INDEXES", "true").lower() == "true"
+
+# Okuma tercihleri: "route=mod" listesi (primary, primaryPreferred, secondary, secondaryPreferred,
+# nearest); listede olmayan okumalar primary'den yapılır. İkincil düğümler en fazla
+# READ_MAX_STALENESS saniye geride olabilir (en az 90; -1 = sınırsız)
+READ_PREFERENCE_ROUTES = os.getenv(
+    "READ_PREFERENCE_ROUTES",
+    "reference=secondaryPreferred,restaurants=secondaryPreferred,candidates=secondaryPreferred,"
+    "photos=secondaryPreferred,conversation=secondaryPreferred"
+)
+READ_MAX_STALENESS = int(os.getenv("READ_MAX_STALENESS", 90))
+
+# Süreçler arası önbellek geçersiz kılma (common/invalidation.py, replica set gerekir): worker
+# soketlerinin dizini, düğüm başına tek izleyiciyi seçen kilit dosyası, kilidin yeniden deneme
+# aralığı ve resume token'ın en sık kaydedilme aralığı (saniye)
+INVALIDATION_ENABLED = os.getenv("INVALIDATION_ENABLED", "true").lower() == "true"
+INVALIDATION_SOCKET_DIR = os.getenv("INVALIDATION_SOCKET_DIR", "/tmp/blinder-invalidation")
+INVALIDATION_LOCK_PATH = os.getenv("INVALIDATION_LOCK_PATH", "/tmp/blinder-invalidation.lock")
+INVALIDATION_ELECTION_INTERVAL = float(os.getenv("INVALIDATION_ELECTION_INTERVAL", 5))
+INVALIDATION_CHECKPOINT_INTERVAL = float(os.getenv("INVALIDATION_CHECKPOINT_INTERVAL", 1))
@@ -0,0 +1,39 @@
+"""
+Üretim sunucusu:
+
+    gunicorn -c gunicorn.conf.py
+
+Uygulama master süreçte bir kez yüklenir (preload), worker'lar fork ile oluşturulur.
+MongoDB bağlantıları fork öncesi açılmaz; her worker ilk işlemde kendi havuzunu kurar.
+Worker'lar trafik almadan önce warmup yapar (bkz. common/lifecycle.py).
+
+Yeniden yükleme:
+    kill -HUP <master pid>    yeni worker'lar ısınıp başlar, eskiler devam eden
+                              isteklerini WEB_GRACEFUL_TIMEOUT içinde bitirip kapanır
+                              (preload açıkken kod değişmez, yalnızca ayarlar okunur)
+    kill -USR2 <master pid>   yeni kodla yeni bir master başlatır; hazır olduğunda
+                              eski master'a `kill -QUIT <eski master pid>` gönderilir
+"""
+# gunicorn modüldeki her adı ayar olarak okur; `config` adı kendi -c ayarıyla çakışır
+import config as app_config
+
+wsgi_app = "main:create_app()"
+
+bind = app_config.WEB_BIND
+workers = app_config.WEB_WORKERS
+worker_class = "gthread"
+threads = app_config.WEB_THREADS
+preload_app = app_config.WEB_PRELOAD
+timeout = app_config.WEB_TIMEOUT
+graceful_timeout = app_config.WEB_GRACEFUL_TIMEOUT
+keepalive = app_config.WEB_KEEPALIVE
+
+
+def post_worker_init(worker):
+    """ Uygulama worker'da yüklendikten sonra, bağlantı kabul edilmeden önce çalışır """
+    from common import invalidation, lifecycle
+    from spotify.top_cache import top_cache
+
+    lifecycle.warmup(worker.wsgi)
+    invalidation.ensure_started()
+    top_cache.ensure_refresher()
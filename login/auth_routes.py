@@ -1,40 +1,32 @@
-import requests
-from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
+from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
 import config
+from common.db import db
+from common.reference_data import reference_data
+from common import users
+from common import causal, response_cache
+from login.jwks_cache import verify_google_id_token, verify_microsoft_id_token
+from login.id_allocator import BlockIdAllocator
+from login.zodiac import get_zodiac_sign
 import re
 from datetime import datetime, timedelta
 from bson import ObjectId
 import random
 import string
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from werkzeug.security import generate_password_hash, check_password_hash
 
 auth_bp = Blueprint("auth", __name__)
 
-# MongoDB bağlantısı
-client = MongoClient(config.MONGO_URI)
-db = client["blinder"]
 users_collection = db["users"]
 counters_collection = db["counters"]
 verification_codes_collection = db["verification_codes"]
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png'}
+user_id_allocator = BlockIdAllocator(counters_collection, "user_id", config.USER_ID_BLOCK_SIZE)
 
 
 def get_next_user_id():
-    """ Kullanıcı ID'sini otomatik artırarak döndüren fonksiyon """
-    counter = counters_collection.find_one_and_update(
-        {"_id": "user_id"},
-        {"$inc": {"seq": 1}},
-        upsert=True,
-        return_document=True
-    )
-    return counter["seq"]
+    """ Kullanıcı ID'sini worker'a ayrılmış ID bloğundan döndüren fonksiyon """
+    return user_id_allocator.next_id()
 
 
 def is_academic_email(email):
@@ -43,20 +35,6 @@ def is_academic_email(email):
     return re.match(academic_email_pattern, email) is not None
 
 
-def get_zodiac_sign(birthdate):
-    """ Doğum tarihine göre burç hesaplayan fonksiyon """
-    zodiac_dates = [
-        (1, 20, "Oğlak"), (2, 19, "Kova"), (3, 20, "Balık"), (4, 20, "Koç"),
-        (5, 21, "Boğa"), (6, 21, "İkizler"), (7, 23, "Yengeç"), (8, 23, "Aslan"),
-        (9, 23, "Başak"), (10, 23, "Terazi"), (11, 22, "Akrep"), (12, 22, "Yay"),
-        (12, 31, "Oğlak")
-    ]
-    for m, d, sign in zodiac_dates:
-        if (birthdate.month == m and birthdate.day <= d) or (birthdate.month == m - 1 and birthdate.day > d):
-            return sign
-    return "Bilinmiyor"
-
-
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -68,6 +46,10 @@ def generate_verification_code():
 
 def send_verification_email(email, code):
     """Doğrulama e-postası gönderir (HTML şablonlu)"""
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     try:
         if not config.EMAIL_USER or not config.EMAIL_PASSWORD:
             print("E-posta ayarları eksik!")
@@ -126,18 +108,13 @@ def google_login():
         if not token:
             return jsonify({"error": "ID Token gerekli!"}), 400
 
-        google_info = id_token.verify_oauth2_token(
-            token,
-            google_requests.Request(),
-            config.GOOGLE_CLIENT_ID,
-            clock_skew_in_seconds=5
-        )
+        google_info = verify_google_id_token(token)
         email = google_info.get("email")
         if not email or not is_academic_email(email):
             return jsonify({"error": "Sadece akademik e-postalar kabul edilir!"}), 400
 
-        user = users_collection.find_one({"email": email})
-        if not user:
+        profile = users.find_profile(email)
+        if not profile:
             user_id = get_next_user_id()
             user = {
                 "_id": user_id,
@@ -164,9 +141,10 @@ def google_login():
                 "favorite_food": []
             }
             users_collection.insert_one(user)
+            profile = users.UserProfile.from_doc(user)
 
-        access_token = create_access_token(identity=user["email"])
-        return jsonify({"access_token": access_token, "user": user})
+        access_token = create_access_token(identity=email)
+        return jsonify({"access_token": access_token, "user": profile.to_json()})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -181,7 +159,7 @@ def microsoft_login():
             print("No code/idToken received!")
             return jsonify({"error": "Microsoft hesabı seçilmedi veya işlem iptal edildi!"}), 400
 
-        token_url = f"https://login.microsoftonline.com/{config.MICROSOFT_TENANT_ID}/oauth2/v2.0/token"
+        token_url = f"{config.MICROSOFT_LOGIN_URL}/{config.MICROSOFT_TENANT_ID}/oauth2/v2.0/token"
         data = {
             "client_id": config.MICROSOFT_CLIENT_ID,
             "scope": "openid profile email User.Read",
@@ -191,7 +169,9 @@ def microsoft_login():
             "code_verifier": request.json.get("codeVerifier")
         }
 
-        token_response = requests.post(token_url, data=data)
+        from common import http_client
+
+        token_response = http_client.post(token_url, data=data)
         if token_response.status_code != 200:
             return jsonify({
                 "error": "Token exchange başarısız!",
@@ -200,35 +180,42 @@ def microsoft_login():
 
         tokens = token_response.json()
         id_token_value = tokens.get("id_token")
-        access_token_ms = tokens.get("access_token")
-        if not id_token_value or not access_token_ms:
+        if not id_token_value:
             print("Token exchange'den gerekli tokenlar alınamadı!")
             return jsonify({"error": "Token exchange'den gerekli tokenlar alınamadı!"}), 400
 
-        headers = {"Authorization": f"Bearer {access_token_ms}"}
-        userinfo_response = requests.get("https://graph.microsoft.com/oidc/userinfo", headers=headers)
-
-        if userinfo_response.status_code != 200:
+        # id_token yerel olarak önbellekteki JWKS ile doğrulanır, userinfo çağrısına gerek kalmaz
+        try:
+            microsoft_info = verify_microsoft_id_token(id_token_value)
+        except ValueError as e:
             print("Microsoft doğrulama başarısız!")
             return jsonify({
                 "error": "Microsoft doğrulama başarısız!",
-                "details": userinfo_response.text
+                "details": str(e)
             }), 400
 
-        microsoft_info = userinfo_response.json()
+        # preferred_username doğrulanmaz ve kullanıcı tarafından değiştirilebilir; hesap
+        # anahtarı yalnızca email claim'i olabilir
         email = microsoft_info.get("email")
-        if not email or not is_academic_email(email):
+        if not email or not microsoft_info.get("sub") or not microsoft_info.get("tid"):
+            print("Microsoft token'ında e-posta veya hesap kimliği yok!")
+            return jsonify({"error": "Microsoft hesabında doğrulanmış e-posta bulunamadı!"}), 400
+        if not is_academic_email(email):
             print("Sadece akademik e-postalar kabul edilir!", email)
             return jsonify({"error": "Sadece akademik e-postalar kabul edilir!"}), 400
 
-        user = users_collection.find_one({"email": email})
-        if not user:
+        profile = users.find_profile(email)
+        if profile and profile.microsoft_id and profile.microsoft_id != microsoft_info["sub"]:
+            # Aynı e-postayı taşıyan başka bir Microsoft hesabı
+            print("Microsoft hesap kimliği eşleşmiyor!", email)
+            return jsonify({"error": "Bu e-posta başka bir Microsoft hesabına bağlı!"}), 403
+        if not profile:
             user_id = get_next_user_id()
             user = {
                 "_id": user_id,
                 "name": microsoft_info.get("name", ""),
                 "email": email,
-                "microsoft_id": microsoft_info.get("sub", ""),
+                "microsoft_id": microsoft_info["sub"],
                 "picture": microsoft_info.get("picture", ""),
                 "locale": microsoft_info.get("locale", "tr"),
                 "created_at": datetime.utcnow(),
@@ -249,9 +236,10 @@ def microsoft_login():
                 "favorite_food": []
             }
             users_collection.insert_one(user)
+            profile = users.UserProfile.from_doc(user)
 
-        access_token = create_access_token(identity=user["email"])
-        return jsonify({"access_token": access_token, "user": user})
+        access_token = create_access_token(identity=email)
+        return jsonify({"access_token": access_token, "user": profile.to_json()})
 
     except Exception as e:
         return jsonify({"error": f"Beklenmeyen hata: {str(e)}"}), 400
@@ -318,6 +306,15 @@ def update_profile():
 
         users_collection.update_one({"email": user_email}, {"$set": update_data})
 
+        # Profil ve eşleşme listelerindeki kart değişti; kullanıcının ve eşleştiği kişilerin önbelleği geçersiz
+        user_id = users.user_id_for_email(user_email)
+        partner_ids = [
+            doc["user2_id"] if doc["user1_id"] == user_id else doc["user1_id"]
+            for doc in db.matches.find({"$or": [{"user1_id": user_id}, {"user2_id": user_id}]},
+                                       {"_id": 0, "user1_id": 1, "user2_id": 1})
+        ]
+        response_cache.bump(user_id, *partner_ids)
+
         return jsonify({"message": "Profil güncellendi", "data": update_data})
 
     except Exception as e:
@@ -329,18 +326,27 @@ def update_profile():
 def get_profile():
     try:
         user_email = get_jwt_identity()
-        user = users_collection.find_one({"email": user_email}, {"password": 0})
-        if not user:
+        user_id = users.user_id_for_email(user_email)
+        if user_id is None:
             return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-        spotify_doc = db.spotify.find_one(
-            {"user_id": user["_id"]},
-            {"_id": 0, "user_id": 0, "created_at": 0, "updated_at": 0}
-        )
-        if spotify_doc:
-            user.update(spotify_doc)
+        def build():
+            profile = users.find_profile(user_email)
+            if not profile:
+                return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
+
+            user = profile.to_json()
+            # Yalnızca bağlantı bilgisi; Spotify token'ları ve listeler profil önbelleğine girmez
+            spotify_doc = db.spotify.find_one(
+                {"user_id": profile.id},
+                {"_id": 0, "spotify_id": 1, "spotify_connected": 1}
+            )
+            if spotify_doc:
+                user.update(spotify_doc)
 
-        return jsonify({"message": "Profil bilgileri alındı", "user": user})
+            return jsonify({"message": "Profil bilgileri alındı", "user": user})
+
+        return response_cache.cached_response("profile", user_id, build)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -349,17 +355,12 @@ def get_profile():
 @auth_bp.route("/universities", methods=["GET"])
 def get_universities():
     try:
-        universities = list(db.universities.find({}, {"_id": 0, "location_id": 1, "universities": 1}))
-
-        location_ids = {uni["location_id"] for uni in universities}
-
-        locations = db.locations.find({"_id": {"$in": list(location_ids)}}, {"_id": 1, "name": 1})
-        location_map = {loc["_id"]: loc["name"] for loc in locations}
-
-        for uni in universities:
-            uni["location"] = location_map.get(uni.pop("location_id"), "Unknown")
-
-        return jsonify(universities)
+        snapshot = reference_data.snapshot()
+        response = Response(snapshot.universities_body, mimetype="application/json")
+        response.set_etag(snapshot.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = config.REFERENCE_DATA_MAX_AGE
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -369,11 +370,11 @@ def get_universities():
 def upload_photos():
     try:
         user_email = get_jwt_identity()
-        user = users_collection.find_one({"email": user_email})
+        user = users.find_identity(user_email)
         if not user:
             return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-        user_id = user["_id"]
+        user_id = user.id
         data = request.get_json()
         photos = data.get("photos")
         if not photos or not isinstance(photos, list):
@@ -415,25 +416,31 @@ def upload_photos():
                 "photos": new_photos
             })
 
+        response_cache.bump(user_id)
         return jsonify({"message": "Fotoğraflar yüklendi", "photos": new_photos}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def build_photos_response(user_id):
+    # cached_response'taki sürüm okumasıyla aynı causal session: secondary, o sürümü artıran
+    # yazmayı uygulamadan yanıt vermez
+    photos_doc = db.photos.for_reads("photos").find_one({"user_id": user_id}, session=causal.session())
+    photos = photos_doc["photos"] if photos_doc and "photos" in photos_doc else []
+    return jsonify({"photos": photos}), 200
+
+
 @auth_bp.route("/photos", methods=["GET"])
 @jwt_required()
 def get_photos():
     try:
         user_email = get_jwt_identity()
-        user = users_collection.find_one({"email": user_email})
-        if not user:
+        user_id = users.user_id_for_email(user_email)
+        if user_id is None:
             return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-        user_id = user["_id"]
-        photos_doc = db.photos.find_one({"user_id": user_id})
-        photos = photos_doc["photos"] if photos_doc and "photos" in photos_doc else []
-        return jsonify({"photos": photos}), 200
+        return response_cache.cached_response("photos", user_id, lambda: build_photos_response(user_id))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -444,11 +451,11 @@ def get_photos():
 def delete_photo(photo_id):
     try:
         user_email = get_jwt_identity()
-        user = users_collection.find_one({"email": user_email})
+        user = users.find_identity(user_email)
         if not user:
             return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-        user_id = user["_id"]
+        user_id = user.id
         result = db.photos.update_one(
             {"user_id": user_id},
             {"$pull": {"photos": {"photo_id": photo_id}}}
@@ -456,6 +463,7 @@ def delete_photo(photo_id):
         if result.modified_count == 0:
             return jsonify({"error": "Fotoğraf bulunamadı veya yetkisiz erişim!"}), 404
 
+        response_cache.bump(user_id)
         return jsonify({"message": "Fotoğraf silindi"}), 200
 
     except Exception as e:
@@ -465,9 +473,7 @@ def delete_photo(photo_id):
 @auth_bp.route("/user-photos/<int:user_id>", methods=["GET"])
 def get_user_photos_by_id(user_id):
     try:
-        photos_doc = db.photos.find_one({"user_id": user_id})
-        photos = photos_doc["photos"] if photos_doc and "photos" in photos_doc else []
-        return jsonify({"photos": photos}), 200
+        return response_cache.cached_response("photos", user_id, lambda: build_photos_response(user_id))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -483,8 +489,7 @@ def send_verification():
         if not is_academic_email(email):
             return jsonify({"error": "Sadece akademik e-postalar kabul edilir!"}), 400
 
-        existing_user = users_collection.find_one({"email": email})
-        if existing_user:
+        if users.email_exists(email):
             return jsonify({"error": "Bu e-posta adresi zaten kayıtlı!"}), 400
 
         verification_code = generate_verification_code()
@@ -557,8 +562,7 @@ def manual_register():
         if not is_academic_email(email):
             return jsonify({"error": "Sadece akademik e-postalar kabul edilir!"}), 400
 
-        existing_user = users_collection.find_one({"email": email})
-        if existing_user:
+        if users.email_exists(email):
             return jsonify({"error": "Bu e-posta adresi zaten kayıtlı!"}), 400
 
         hashed_password = generate_password_hash(password)
@@ -595,7 +599,7 @@ def manual_register():
         return jsonify({
             "message": "Kayıt başarılı",
             "access_token": access_token,
-            "user": user
+            "user": users.UserProfile.from_doc(user).to_json()
         }), 200
 
     except Exception as e:
@@ -612,18 +616,18 @@ def signin():
         if not email or not password:
             return jsonify({"error": "E-posta ve şifre gerekli!"}), 400
 
-        user = users_collection.find_one({"email": email})
-        if not user:
+        auth, profile = users.find_auth(email)
+        if not auth:
             return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-        if not check_password_hash(user.get("password", ""), password):
+        if not check_password_hash(auth.password or "", password):
             return jsonify({"error": "Geçersiz şifre!"}), 401
 
         access_token = create_access_token(identity=email)
         return jsonify({
             "message": "Giriş başarılı",
             "access_token": access_token,
-            "user": user
+            "user": profile.to_json()
         }), 200
 
     except Exception as e:
@@ -0,0 +1,44 @@
+import os
+import threading
+
+from pymongo import ReturnDocument
+
+
+class BlockIdAllocator:
+    """
+    Hi/lo ID dağıtıcı: counters belgesinden tek bir $inc ile block_size kadar
+    ID ayırır ve bunları process içinde kilit altında sırayla verir.
+    - $inc atomik olduğu için iki process aynı bloğu alamaz; tekrar eden ID oluşmaz.
+    - Process çökerse bloğun kullanılmamış kısmı boşluk olarak kalır.
+    - Fork sonrası ebeveynden miras kalan blok atılır, çocuk yeni blok ayırır.
+    """
+
+    def __init__(self, collection, key, block_size):
+        self.collection = collection
+        self.key = key
+        self.block_size = block_size
+        self._next = 1
+        self._hi = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _reserve_block(self):
+        counter = self.collection.find_one_and_update(
+            {"_id": self.key},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._hi = counter["seq"]
+        self._next = self._hi - self.block_size + 1
+
+    def next_id(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._next, self._hi = 1, 0
+            if self._next > self._hi:
+                self._reserve_block()
+            value = self._next
+            self._next += 1
+            return value
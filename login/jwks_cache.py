@@ -0,0 +1,241 @@
+import base64
+import json
+import os
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import config
+
+# Sağlayıcı yanıtında önbellek başlığı yoksa kullanılacak süreler (saniye)
+DEFAULT_MAX_AGE = 3600
+MIN_MAX_AGE = 60
+MAX_MAX_AGE = 86400
+
+
+class UnknownKeyError(ValueError):
+    """ Token'daki kid anahtar setinde bulunamadığında fırlatılır """
+
+
+def _parse_max_age(response):
+    """ Cache-Control / Expires başlıklarından geçerlilik süresini hesaplar """
+    cache_control = response.headers.get("Cache-Control", "")
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        max_age = int(match.group(1)) - int(response.headers.get("Age", 0) or 0)
+    elif response.headers.get("Expires"):
+        try:
+            expires = parsedate_to_datetime(response.headers["Expires"])
+            max_age = int(expires.timestamp() - time.time())
+        except (TypeError, ValueError):
+            max_age = DEFAULT_MAX_AGE
+    else:
+        max_age = DEFAULT_MAX_AGE
+    return min(max(max_age, MIN_MAX_AGE), MAX_MAX_AGE)
+
+
+def _pem_from_x5c(der_b64):
+    """ JWKS içindeki x5c sertifikasını PEM formatına çevirir """
+    lines = [der_b64[i:i + 64] for i in range(0, len(der_b64), 64)]
+    return "-----BEGIN CERTIFICATE-----\n" + "\n".join(lines) + "\n-----END CERTIFICATE-----\n"
+
+
+def parse_google_certs(payload):
+    """ Google v1 certs yanıtı zaten {kid: PEM} biçimindedir """
+    return dict(payload)
+
+
+def _b64url_int(value):
+    return int.from_bytes(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)), "big")
+
+
+def _der_length(length):
+    if length < 0x80:
+        return bytes([length])
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(encoded)]) + encoded
+
+
+def _der_integer(value):
+    encoded = value.to_bytes(value.bit_length() // 8 + 1, "big")
+    return b"\x02" + _der_length(len(encoded)) + encoded
+
+
+def _pem_from_rsa_components(n, e):
+    """ x5c içermeyen JWK'ler için n/e değerlerinden PKCS#1 RSA public key PEM'i üretir """
+    body = _der_integer(_b64url_int(n)) + _der_integer(_b64url_int(e))
+    der = b"\x30" + _der_length(len(body)) + body
+    encoded = base64.b64encode(der).decode()
+    lines = [encoded[i:i + 64] for i in range(0, len(encoded), 64)]
+    return "-----BEGIN RSA PUBLIC KEY-----\n" + "\n".join(lines) + "\n-----END RSA PUBLIC KEY-----\n"
+
+
+def parse_jwks(payload):
+    """ Standart JWKS yanıtını {kid: PEM} sözlüğüne dönüştürür """
+    keys = {}
+    for key in payload.get("keys", []):
+        if not key.get("kid"):
+            continue
+        if key.get("x5c"):
+            keys[key["kid"]] = _pem_from_x5c(key["x5c"][0])
+        elif key.get("kty") == "RSA" and key.get("n") and key.get("e"):
+            keys[key["kid"]] = _pem_from_rsa_components(key["n"], key["e"])
+    return keys
+
+
+def token_kid(token):
+    """ İmzayı doğrulamadan JWT başlığındaki kid değerini okur """
+    header_segment = token.split(".", 1)[0]
+    header_segment += "=" * (-len(header_segment) % 4)
+    header = json.loads(base64.urlsafe_b64decode(header_segment))
+    return header.get("kid")
+
+
+class DocumentCache:
+    """
+    Bir kimlik sağlayıcının belgesini (anahtar seti, OpenID metadata) bellekte tutar.
+    - Süre, sağlayıcının Cache-Control/Expires başlıklarından alınır.
+    - Süre dolmadan önce arka planda yenilenir; süresi dolan belge yenilenene kadar sunulmaya devam eder.
+    - Belge henüz yokken gelen eşzamanlı istekler tek bir çekmeyi bekler.
+    """
+
+    def __init__(self, url, parser, refresh_ahead=0.2):
+        self.url = url
+        self.parser = parser
+        self.refresh_ahead = refresh_ahead
+        self._value = None
+        self._expires_at = 0.0
+        self._max_age = DEFAULT_MAX_AGE
+        self._last_fetch = 0.0
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._refresher = None
+        self._refresher_pid = None
+
+    def _fetch(self):
+        from common import http_client
+
+        response = http_client.get(self.url)
+        response.raise_for_status()
+        value = self.parser(response.json())
+        max_age = _parse_max_age(response)
+        now = time.time()
+        with self._lock:
+            self._value = value
+            self._max_age = max_age
+            self._expires_at = now + max_age
+            self._last_fetch = now
+        return value
+
+    def _fetch_once(self, last_fetch):
+        """ Çekmeleri tekilleştirir; beklerken başka bir thread çektiyse onun sonucunu döndürür """
+        with self._fetch_lock:
+            if self._last_fetch > last_fetch:
+                return self._value
+            return self._fetch()
+
+    def _ensure_refresher(self):
+        """ Arka plan yenileyiciyi (fork sonrası dahil) bir kez başlatır """
+        pid = os.getpid()
+        if self._refresher is not None and self._refresher_pid == pid and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher_pid == pid and self._refresher.is_alive():
+                return
+            self._refresher_pid = pid
+            self._refresher = threading.Thread(target=self._refresh_loop, name=f"jwks-refresh:{self.url}", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        retry_delay = 5
+        while True:
+            delay = (self._expires_at - time.time()) - self._max_age * self.refresh_ahead
+            if delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+            try:
+                self._fetch_once(self._last_fetch)
+                retry_delay = 5
+            except Exception as e:
+                print(f"JWKS yenileme hatası ({self.url}): {str(e)}")
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 300)
+
+    def get(self):
+        """ Belgeyi döndürür; yalnızca hiç çekilmemişse senkron olarak çeker """
+        self._ensure_refresher()
+        value = self._value
+        if value is None:
+            value = self._fetch_once(self._last_fetch)
+        return value
+
+
+class KeySetCache(DocumentCache):
+    """
+    Bir kimlik sağlayıcının imza anahtarlarını bellekte tutar (bkz. DocumentCache).
+    Bilinmeyen bir kid geldiğinde (anahtar rotasyonu) hemen, ama en fazla
+    min_forced_interval saniyede bir, yeniden çekilir.
+    """
+
+    def __init__(self, url, parser=parse_jwks, refresh_ahead=0.2, min_forced_interval=30):
+        super().__init__(url, parser, refresh_ahead)
+        self.min_forced_interval = min_forced_interval
+
+    def get_keys(self):
+        return self.get()
+
+    def get_keys_for(self, kid):
+        """ Verilen kid'i içeren anahtar setini döndürür; yoksa rotasyon için yeniden çeker """
+        keys = self.get_keys()
+        if kid in keys:
+            return keys
+        last_fetch = self._last_fetch
+        if time.time() - last_fetch >= self.min_forced_interval:
+            keys = self._fetch_once(last_fetch)
+            self._wakeup.set()
+            if kid in keys:
+                return keys
+        raise UnknownKeyError(f"İmza anahtarı bulunamadı: {kid}")
+
+    def decode(self, token, audience, clock_skew_in_seconds=5):
+        """ Token imzasını ve standart claim'leri doğrular, claim sözlüğünü döndürür """
+        # google-auth (ve cryptography) yüklemesi pahalı; yalnızca OAuth girişinde gerekir
+        from google.auth import jwt as google_jwt
+
+        keys = self.get_keys_for(token_kid(token))
+        return google_jwt.decode(
+            token,
+            certs=keys,
+            audience=audience,
+            clock_skew_in_seconds=clock_skew_in_seconds
+        )
+
+
+google_keys = KeySetCache(config.GOOGLE_CERTS_URL, parser=parse_google_certs)
+microsoft_keys = KeySetCache(config.MICROSOFT_JWKS_URL, parser=parse_jwks)
+microsoft_metadata = DocumentCache(config.MICROSOFT_OPENID_CONFIG_URL, parser=dict)
+
+GOOGLE_ISSUERS = {"accounts.google.com", "https://accounts.google.com"}
+
+
+def verify_google_id_token(token):
+    """ Google ID token'ını önbellekteki sertifikalarla doğrular """
+    claims = google_keys.decode(token, config.GOOGLE_CLIENT_ID)
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Geçersiz token issuer: {claims.get('iss')}")
+    return claims
+
+
+def verify_microsoft_id_token(token):
+    """ Microsoft (Entra ID) ID token'ını önbellekteki JWKS ile doğrular """
+    claims = microsoft_keys.decode(token, config.MICROSOFT_CLIENT_ID)
+    # common/organizations metadata'sında issuer "{tenantid}" yer tutucusunu içerir
+    expected_issuer = microsoft_metadata.get()["issuer"].replace("{tenantid}", str(claims.get("tid")))
+    if claims.get("iss") != expected_issuer:
+        raise ValueError(f"Geçersiz token issuer: {claims.get('iss')}")
+    if config.MICROSOFT_TENANT_ID not in ("common", "organizations") and claims.get("tid") != config.MICROSOFT_TENANT_ID:
+        raise ValueError("Token farklı bir tenant'a ait!")
+    return claims
@@ -0,0 +1,15 @@
+""" Burç hesabı; kayıt akışı ve seed verisi (benchmarks.seed_dataset) ortak kullanır """
+
+
+def get_zodiac_sign(birthdate):
+    """ Doğum tarihine göre burç hesaplayan fonksiyon """
+    zodiac_dates = [
+        (1, 20, "Oğlak"), (2, 19, "Kova"), (3, 20, "Balık"), (4, 20, "Koç"),
+        (5, 21, "Boğa"), (6, 21, "İkizler"), (7, 23, "Yengeç"), (8, 23, "Aslan"),
+        (9, 23, "Başak"), (10, 23, "Terazi"), (11, 22, "Akrep"), (12, 22, "Yay"),
+        (12, 31, "Oğlak")
+    ]
+    for m, d, sign in zodiac_dates:
+        if (birthdate.month == m and birthdate.day <= d) or (birthdate.month == m - 1 and birthdate.day > d):
+            return sign
+    return "Bilinmiyor"
@@ -1,46 +1,53 @@
 from flask import Flask
 from flask_cors import CORS
-from flask_jwt_extended import (
-    JWTManager,
-    verify_jwt_in_request,
-    get_jwt_identity,
-    create_access_token
-)
+from werkzeug.middleware.proxy_fix import ProxyFix
+
 import config
-from restaurants.restaurants import restaurants_bp
-from matches.matches_routes import match_bp
-from message.message import message_bp
-from login.auth_routes import auth_bp
-from spotify import spotify_bp
-from datetime import datetime
+from common import causal, compression, invalidation, jwt_tokens, lifecycle, metrics, profiling, rate_limit, users
+from common.json_provider import FastJSONProvider
+
 
-app = Flask(__name__)
+def create_app():
+    # Blueprint modülleri uygulama kurulurken yüklenir; `import main` hafif kalır
+    from restaurants.restaurants import restaurants_bp
+    from matches.matches_routes import match_bp
+    from message.message import message_bp
+    from login.auth_routes import auth_bp
+    from spotify import spotify_bp
 
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    if config.TRUSTED_PROXY_HOPS > 0:
+        # İstemci IP'si (rate limit anahtarı) ve şema proxy başlıklarından okunur
+        hops = config.TRUSTED_PROXY_HOPS
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
 
-app.config["JWT_SECRET_KEY"] = config.JWT_SECRET_KEY
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = 604800
-jwt = JWTManager(app)
+    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
-app.register_blueprint(auth_bp, url_prefix="/auth")
-app.register_blueprint(spotify_bp, url_prefix="/spotify")
-app.register_blueprint(restaurants_bp, url_prefix="/restaurant")
-app.register_blueprint(match_bp, url_prefix="/match")
-app.register_blueprint(message_bp, url_prefix="/message")
+    jwt_tokens.init_app(app)
 
+    metrics.init_app(app)
+    profiling.init_app(app)
+    rate_limit.init_app(app)
+    compression.init_app(app)
+    lifecycle.init_app(app)
+    causal.init_app(app)
+    users.init_app(app)
 
-@app.after_request
-def refresh_expiring_jwt(response):
-    try:
-        verify_jwt_in_request(optional=True)
-        identity = get_jwt_identity()
-        if identity:
-            new_token = create_access_token(identity=identity)
-            response.headers["X-Refresh-Token"] = new_token
-    except Exception as e:
-        pass
-    return response
+    app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(spotify_bp, url_prefix="/spotify")
+    app.register_blueprint(restaurants_bp, url_prefix="/restaurant")
+    app.register_blueprint(match_bp, url_prefix="/match")
+    app.register_blueprint(message_bp, url_prefix="/message")
+    return app
 
 
 if __name__ == "__main__":
+    # Geliştirme sunucusu; üretimde: gunicorn -c gunicorn.conf.py
+    from spotify.top_cache import top_cache
+
+    app = create_app()
+    lifecycle.warmup(app)
+    invalidation.ensure_started()
+    top_cache.ensure_refresher()
     app.run(debug=True, port=5000)
@@ -1,25 +1,55 @@
 from bson import ObjectId
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from pymongo import MongoClient
 from datetime import datetime
 
-import config
+from common.db import db
+from common import users
+from common import response_cache
+from common.json_provider import STREAM_BATCH_SIZE, iter_batches, stream_json
+from matches import music_similarity
 
 match_bp = Blueprint("match", __name__)
 
-# MongoDB connection
-client = MongoClient(config.MONGO_URI)
-db = client["blinder"]
-users_collection = db["users"]
 swipes_collection = db["swipes"]
 matches_collection = db["matches"]
 
 
 def get_current_user():
-    """Helper function to fetch current user object from DB based on the JWT identity (user email)."""
+    """Helper function to fetch the current user's identity view based on the JWT identity (user email)."""
     user_email = get_jwt_identity()
-    return users_collection.find_one({"email": user_email})
+    return users.find_identity(user_email)
+
+
+def music_ranked_cards(current_user, excluded_ids, accepted_genders, limit):
+    """
+    Deck cards of the users in the same location whose music taste is closest to the
+    current user's, with a `music_similarity` score. None when the user has no signature.
+    """
+    signature = music_similarity.signature_for(current_user.id)
+    if signature is None or not current_user.university_location:
+        return None
+
+    index = music_similarity.index_for(current_user.university_location)
+    ranked = index.query(
+        signature,
+        limit,
+        accept=lambda user_id, attributes: (
+            user_id != current_user.id
+            and user_id not in excluded_ids
+            and attributes["gender"] in accepted_genders
+        )
+    )
+    cards = users.find_cards_by_id([user_id for user_id, _ in ranked])
+
+    results = []
+    for user_id, score in ranked:
+        card = cards.get(user_id)
+        if card:
+            card_json = card.to_json()
+            card_json["music_similarity"] = round(score, 3)
+            results.append(card_json)
+    return results
 
 
 @match_bp.route("/potential", methods=["GET"])
@@ -27,6 +57,7 @@ def get_current_user():
 def get_potential_matches():
     """
     Returns a list of potential matches for the current user.
+    With ?sort=music, users with the most similar music taste come first.
     Basic logic:
     1) Filter out users already swiped on (liked or disliked).
     2) Filter by gender preference
@@ -37,7 +68,7 @@ def get_potential_matches():
     if not current_user:
         return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-    current_user_id = current_user["_id"]
+    current_user_id = current_user.id
 
     swiped_user_ids = swipes_collection.find(
         {"swiper_id": current_user_id},
@@ -45,13 +76,15 @@ def get_potential_matches():
     )
     swiped_user_ids = {doc["swipee_id"] for doc in swiped_user_ids}
 
-    preferred_gender = current_user.get("gender_preference", "")
+    preferred_gender = current_user.gender_preference or ""
     if preferred_gender == "İkisi de":
         gender_filter = {"$in": ["Erkek", "Kadın"]}
+        accepted_genders = {"Erkek", "Kadın"}
     else:
         gender_filter = preferred_gender
+        accepted_genders = {preferred_gender}
 
-    location_filter = current_user.get("university_location")
+    location_filter = current_user.university_location
 
     query = {
         "_id": {"$ne": current_user_id},
@@ -69,32 +102,17 @@ def get_potential_matches():
         ]
     }
 
-    potential_users_cursor = users_collection.find(query)
-    potential_users = list(potential_users_cursor)
-
     limited_results = []
-    for user in potential_users[:10]:
-        user_dict = {
-            "user_id": str(user["_id"]),
-            "name": user.get("name"),
-            "university": user.get("university"),
-            "university_location": user.get("university_location"),
-            "birthdate": user.get("birthdate"),
-            "zodiac_sign": user.get("zodiac_sign"),
-            "gender": user.get("gender"),
-            "height": user.get("height"),
-            "relationship_goal": user.get("relationship_goal"),
-            "likes": user.get("likes", []),
-            "values": user.get("values", []),
-            "alcohol": user.get("alcohol"),
-            "smoking": user.get("smoking"),
-            "religion": user.get("religion"),
-            "political_view": user.get("political_view"),
-            "favorite_food": user.get("favorite_food", []),
-            "about": user.get("about"),
-            "picture": user.get("picture", None)
-        }
-        limited_results.append(user_dict)
+    if request.args.get("sort") == "music":
+        limited_results = music_ranked_cards(current_user, swiped_user_ids, accepted_genders, limit=10) or []
+        if limited_results:
+            # Fill the rest of the deck with the regular candidates
+            ranked_ids = [int(card["user_id"]) for card in limited_results]
+            query["$and"].append({"_id": {"$nin": ranked_ids}})
+
+    if len(limited_results) < 10:
+        potential_users = users.find_cards(query, limit=10 - len(limited_results))
+        limited_results.extend(user.to_json() for user in potential_users)
 
     return jsonify({"potential_matches": limited_results}), 200
 
@@ -113,7 +131,7 @@ def swipe():
     if not current_user:
         return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-    current_user_id = current_user["_id"]
+    current_user_id = current_user.id
     data = request.get_json()
     if not data:
         return jsonify({"error": "Geçersiz JSON"}), 400
@@ -132,8 +150,7 @@ def swipe():
     if target_user_id == current_user_id:
         return jsonify({"error": "Kullanıcı kendi kendine swipe atamaz!"}), 400
 
-    target_user = users_collection.find_one({"_id": target_user_id})
-    if not target_user:
+    if not users.user_exists(target_user_id):
         return jsonify({"error": "Hedef kullanıcı bulunamadı!"}), 404
 
     swipe_doc = {
@@ -163,6 +180,7 @@ def swipe():
                     "user2_id": target_user_id,
                     "matched_at": datetime.utcnow()
                 })
+                response_cache.bump(current_user_id, target_user_id)
             return jsonify({"message": "Match oluştu!", "match": True}), 200
 
     return jsonify({"message": "Swipe kaydedildi", "match": False}), 200
@@ -180,7 +198,7 @@ def unmatch_user():
     if not current_user:
         return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-    current_user_id = current_user["_id"]
+    current_user_id = current_user.id
 
     data = request.get_json()
     if not data:
@@ -212,6 +230,8 @@ def unmatch_user():
     if delete_result.deleted_count == 0:
         return jsonify({"error": "Eşleşme kaldırılamadı (belki zaten kaldırılmış)."}), 404
 
+    response_cache.bump(current_user_id, other_user_id)
+
     now = datetime.utcnow()
     swipes_to_add = [
         {
@@ -254,45 +274,51 @@ def get_my_matches():
     """
     Returns a list of all matches for the current user,
     including basic info about the matched user (name, picture, etc.).
+    Served from the response cache; unchanged lists are answered with 304.
     """
-    current_user = get_current_user()
-    if not current_user:
+    current_user_id = users.user_id_for_email(get_jwt_identity())
+    if current_user_id is None:
         return jsonify({"error": "Kullanıcı bulunamadı!"}), 404
 
-    current_user_id = current_user["_id"]
+    return response_cache.cached_response("matches", current_user_id, lambda: build_matches_response(current_user_id))
+
 
-    my_matches_cursor = matches_collection.find({
+def build_matches_response(current_user_id):
+    return stream_json("matches", iter_matches(current_user_id))
+
+
+def iter_matches(current_user_id):
+    """
+    Yields the match list entries while reading the matches cursor; the other users'
+    cards are looked up with one $in query per batch of matches.
+    """
+    cursor = matches_collection.find({
         "$or": [
             {"user1_id": current_user_id},
             {"user2_id": current_user_id}
         ]
-    })
+    }).batch_size(STREAM_BATCH_SIZE)
 
-    results = []
-    for match_doc in my_matches_cursor:
-        match_id = str(match_doc["_id"])
-        user1_id = match_doc["user1_id"]
-        user2_id = match_doc["user2_id"]
-
-        if user1_id == current_user_id:
-            other_user_id = user2_id
-        else:
-            other_user_id = user1_id
-
-        other_user = users_collection.find_one({"_id": other_user_id})
-        if not other_user:
-            continue
-
-        results.append({
-            "match_id": match_id,
-            "user_id": str(other_user["_id"]),
-            "name": other_user.get("name"),
-            "picture": other_user.get("picture"),
-            "university": other_user.get("university"),
-            "university_location": other_user.get("university_location"),
-            "birthdate": other_user.get("birthdate"),
-            "matched_at": match_doc.get("matched_at").isoformat() if match_doc.get("matched_at") else None
-        })
-
-    return jsonify({"matches": results}), 200
+    for match_docs in iter_batches(cursor):
+        other_user_ids = [
+            doc["user2_id"] if doc["user1_id"] == current_user_id else doc["user1_id"]
+            for doc in match_docs
+        ]
+        other_users = users.find_cards_by_id(set(other_user_ids))
+
+        for match_doc, other_user_id in zip(match_docs, other_user_ids):
+            other_user = other_users.get(other_user_id)
+            if not other_user:
+                continue
+
+            yield {
+                "match_id": match_doc["_id"],
+                "user_id": str(other_user.id),
+                "name": other_user.name,
+                "picture": other_user.picture,
+                "university": other_user.university,
+                "university_location": other_user.university_location,
+                "birthdate": other_user.birthdate,
+                "matched_at": match_doc.get("matched_at")
+            }
 
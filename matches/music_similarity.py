@@ -0,0 +1,164 @@
+"""
+Music-taste similarity between users.
+
+Each Spotify-connected user's top artists and tracks are turned into a set of
+tokens and summarised as a MinHash signature (MUSIC_MINHASH_PERMUTATIONS values),
+stored on the user as `music_signature`. The fraction of equal positions in two
+signatures estimates the Jaccard similarity of the underlying sets.
+
+Per `university_location`, signatures are bucketed into an LSH index of
+MUSIC_LSH_BANDS bands; a query only scores users that share at least one band
+with it, so finding taste-similar candidates does not scan the whole pool.
+
+    python -m matches.music_similarity      # backfill signatures from cached top lists
+"""
+import hashlib
+import random
+import struct
+
+import config
+from common import invalidation
+from common.db import db
+from common.single_flight import SingleFlightCache
+
+users_collection = db["users"]
+spotify_collection = db["spotify"]
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+                 for _ in range(config.MUSIC_MINHASH_PERMUTATIONS)]
+
+
+def taste_tokens(top_lists):
+    """Artists (from both lists) and tracks, normalised, as the set to be compared."""
+    tokens = set()
+    for artist in top_lists.get("artists") or []:
+        tokens.add("a:" + artist["name"].strip().lower())
+    for track in top_lists.get("tracks") or []:
+        artists = [name.strip().lower() for name in track.get("artists", [])]
+        tokens.add("t:" + track["name"].strip().lower() + "|" + ",".join(artists))
+        tokens.update("a:" + name for name in artists)
+    return tokens
+
+
+def _token_hash(token):
+    return struct.unpack("<Q", hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest())[0]
+
+
+def minhash(tokens, permutations=_PERMUTATIONS):
+    if not tokens:
+        return None
+    hashes = [_token_hash(token) for token in tokens]
+    return [min((a * x + b) % _PRIME for x in hashes) for a, b in permutations]
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two token sets."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures; band keys map to the users that share them."""
+
+    def __init__(self, bands=None):
+        self.bands = bands or config.MUSIC_LSH_BANDS
+        self.rows = config.MUSIC_MINHASH_PERMUTATIONS // self.bands
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = {}
+        self.attributes = {}
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [tuple(signature[i * rows:(i + 1) * rows]) for i in range(self.bands)]
+
+    def add(self, user_id, signature, **attributes):
+        self.signatures[user_id] = signature
+        self.attributes[user_id] = attributes
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            band.setdefault(key, []).append(user_id)
+
+    def candidates(self, signature):
+        found = set()
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            found.update(band.get(key, ()))
+        return found
+
+    def query(self, signature, limit, accept=None):
+        """Up to `limit` (user_id, similarity) pairs, most similar first."""
+        scored = []
+        for user_id in self.candidates(signature):
+            if accept is not None and not accept(user_id, self.attributes[user_id]):
+                continue
+            scored.append((similarity(signature, self.signatures[user_id]), user_id))
+        scored.sort(reverse=True)
+        return [(user_id, score) for score, user_id in scored[:limit]]
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+def build_index(university_location):
+    index = LSHIndex()
+    cursor = users_collection.for_reads("candidates").find(
+        {"university_location": university_location, "music_signature": {"$exists": True}},
+        {"music_signature": 1, "gender": 1}
+    )
+    for doc in cursor:
+        index.add(doc["_id"], doc["music_signature"], gender=doc.get("gender"))
+    return index
+
+
+_indexes = SingleFlightCache(ttl=config.MUSIC_INDEX_TTL, maxsize=256)
+
+
+def index_for(university_location):
+    return _indexes.get_or_load(university_location, lambda: build_index(university_location))
+
+
+def invalidate(university_location=None):
+    """Drops the cached index of one location, or all of them."""
+    _indexes.invalidate(None if university_location is None else (lambda key: key == university_location))
+
+
+def _on_user_change(change):
+    # New users and new signatures join at the next rebuild (MUSIC_INDEX_TTL); users who
+    # left, moved or changed gender must not keep being suggested until then
+    if change.operation == "insert":
+        return
+    if change.document_id is None or change.touches("university_location"):
+        # The location the user left is not known
+        invalidate()
+    elif change.touches("gender"):
+        invalidate(change.document.get("university_location"))
+
+
+invalidation.register("users", _on_user_change, fields=("university_location",))
+
+
+def signature_for(user_id):
+    doc = users_collection.find_one({"_id": user_id}, {"music_signature": 1})
+    return doc.get("music_signature") if doc else None
+
+
+def update_signature(user_id, top_lists):
+    """Recomputes and stores the user's signature; called whenever their top lists change."""
+    signature = minhash(taste_tokens(top_lists))
+    if signature is None:
+        return None
+    users_collection.update_one({"_id": user_id}, {"$set": {"music_signature": signature}})
+    return signature
+
+
+def backfill():
+    updated = 0
+    cursor = spotify_collection.find({"top_lists": {"$exists": True}}, {"user_id": 1, "top_lists": 1})
+    for doc in cursor:
+        top_lists = {kind: entry["items"] for kind, entry in doc["top_lists"].items()}
+        if update_signature(doc["user_id"], top_lists) is not None:
+            updated += 1
+    return updated
+
+
+if __name__ == "__main__":
+    print(f"{backfill()} users got a music signature.")
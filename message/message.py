@@ -1,22 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from pymongo import MongoClient
 from datetime import datetime
 from bson import ObjectId  # Import ObjectId
-import config
+from common.db import db
+from common import causal, users
+from common.json_provider import STREAM_BATCH_SIZE, stream_json
 
 message_bp = Blueprint("message", __name__)
 
-client = MongoClient(config.MONGO_URI)
-db = client["blinder"]
 messages_collection = db["messages"]
 matches_collection = db["matches"]
-users_collection = db["users"]
 
 
 def get_current_user():
     user_email = get_jwt_identity()
-    return users_collection.find_one({"email": user_email})
+    return users.find_identity(user_email)
 
 
 @message_bp.route("/conversation", methods=["GET"])
@@ -25,6 +23,9 @@ def get_conversation():
     """
     Retrieve all messages for a given match_id.
     URL param: ?match_id=123
+    The messages are streamed from the cursor, so memory does not grow with the thread.
+    Messages may be read from a secondary; send X-Causal-Token from /message/send to see
+    your own messages right away.
     """
     current_user = get_current_user()
     if not current_user:
@@ -39,25 +40,32 @@ def get_conversation():
     except Exception:
         return jsonify({"error": "Geçersiz match_id!"}), 400
 
-    match_doc = matches_collection.find_one({"_id": match_oid})
-    if not match_doc:
-        return jsonify({"error": "Eşleşme bulunamadı!"}), 404
-
-    if (match_doc["user1_id"] != current_user["_id"]) and (match_doc["user2_id"] != current_user["_id"]):
-        return jsonify({"error": "Bu eşleşmede yetkiniz yok!"}), 403
-
-    msgs_cursor = messages_collection.find({"match_id": match_oid}).sort("timestamp", 1)
-    messages = []
-    for msg in msgs_cursor:
-        messages.append({
-            "message_id": str(msg["_id"]),
+    try:
+        session = causal.session()
+        match_doc = matches_collection.find_one({"_id": match_oid}, session=session)
+        if not match_doc:
+            return jsonify({"error": "Eşleşme bulunamadı!"}), 404
+
+        if (match_doc["user1_id"] != current_user.id) and (match_doc["user2_id"] != current_user.id):
+            return jsonify({"error": "Bu eşleşmede yetkiniz yok!"}), 403
+
+        msgs_cursor = messages_collection.for_reads("conversation").find(
+            {"match_id": match_oid},
+            {"sender_id": 1, "message_text": 1, "timestamp": 1},
+            session=session
+        ).sort("timestamp", 1).batch_size(STREAM_BATCH_SIZE)
+        messages = ({
+            "message_id": msg["_id"],
             "match_id": match_id,
             "sender_id": msg["sender_id"],
             "message_text": msg["message_text"],
-            "timestamp": msg["timestamp"].isoformat()
-        })
+            "timestamp": msg["timestamp"]
+        } for msg in msgs_cursor)
 
-    return jsonify({"messages": messages}), 200
+        # The session ends with the stream, also when the client goes away half way
+        return stream_json("messages", messages, on_close=session.end_session)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 
 @message_bp.route("/send", methods=["POST"])
@@ -87,24 +95,26 @@ def send_message():
     except Exception:
         return jsonify({"error": "Geçersiz match_id!"}), 400
 
-    match_doc = matches_collection.find_one({"_id": match_oid})
+    session = causal.session()
+    match_doc = matches_collection.find_one({"_id": match_oid}, session=session)
     if not match_doc:
         return jsonify({"error": "Eşleşme (match) bulunamadı!"}), 404
 
-    if (match_doc["user1_id"] != current_user["_id"]) and (match_doc["user2_id"] != current_user["_id"]):
+    if (match_doc["user1_id"] != current_user.id) and (match_doc["user2_id"] != current_user.id):
         return jsonify({"error": "Bu eşleşmede mesaj gönderemezsiniz!"}), 403
 
     # Insert the new message
     msg_doc = {
         "match_id": match_oid,
-        "sender_id": current_user["_id"],
+        "sender_id": current_user.id,
         "message_text": message_text,
         "timestamp": datetime.utcnow()
     }
-    result = messages_collection.insert_one(msg_doc)
+    # The response's X-Causal-Token covers this write
+    result = messages_collection.insert_one(msg_doc, session=session)
 
     return jsonify({
         "message": "Mesaj gönderildi!",
-        "message_id": str(result.inserted_id),
-        "timestamp": msg_doc["timestamp"].isoformat()
+        "message_id": result.inserted_id,
+        "timestamp": msg_doc["timestamp"]
     }), 200
@@ -0,0 +1,177 @@
+import base64
+import json
+
+from bson import ObjectId
+from pymongo import ASCENDING, GEOSPHERE
+
+import config
+from common import invalidation
+from common.db import db
+from common.single_flight import SingleFlightCache
+
+restaurants_collection = db["restaurants"]
+places_collection = db["restaurant_places"]
+# Katalog okumaları ikincil düğümlerden yapılabilir (READ_PREFERENCE_ROUTES "restaurants")
+places_reads = places_collection.for_reads("restaurants")
+
+# Aynı lokasyon için eşzamanlı, aynı parametreli istekler tek sorguya indirgenir
+page_cache = SingleFlightCache(ttl=config.RESTAURANT_CACHE_TTL, maxsize=4096)
+
+
+class InvalidCursorError(ValueError):
+    """ Sayfalama cursor'ı çözülemediğinde fırlatılır """
+
+
+def ensure_indexes():
+    """ restaurant_places için 2dsphere ve lokasyon indekslerini oluşturur """
+    places_collection.create_index([("location_id", ASCENDING), ("geo", GEOSPHERE)], name="location_geo")
+    places_collection.create_index([("location_id", ASCENDING), ("_id", ASCENDING)], name="location_id_order")
+
+
+def encode_cursor(last_doc, with_distance):
+    payload = {"id": str(last_doc["_id"])}
+    if with_distance:
+        payload["d"] = last_doc["distance"]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, with_distance):
+    """ Cursor'ı çözer; mesafe sıralı cursor koordinatlı, _id sıralı cursor koordinatsız istekle gelmelidir """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        last_distance = float(payload["d"]) if "d" in payload else None
+        last_id = ObjectId(payload["id"])
+    except Exception:
+        raise InvalidCursorError("Geçersiz cursor!")
+    if (last_distance is not None) != with_distance:
+        raise InvalidCursorError("Cursor bu sıralama için geçerli değil; lat/lng ilk sayfadaki gibi gönderilmelidir!")
+    return last_distance, last_id
+
+
+def _serialize(doc):
+    doc["restaurant_id"] = doc.pop("_id")
+    doc.pop("location_id", None)
+    geo = doc.pop("geo", None)
+    if geo:
+        doc["lng"], doc["lat"] = geo["coordinates"]
+    if "distance" in doc:
+        doc["distance"] = round(doc["distance"], 1)
+    return doc
+
+
+def _query_page(location_id, lat, lng, radius, limit, cursor):
+    """ Tek bir sayfayı (en yakından uzağa ya da _id sırasıyla) veritabanından okur """
+    last_distance, last_id = decode_cursor(cursor, lat is not None) if cursor else (None, None)
+
+    if lat is None:
+        query = {"location_id": location_id}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = list(places_reads.find(query).sort("_id", ASCENDING).limit(limit + 1))
+    else:
+        geo_near = {
+            "near": {"type": "Point", "coordinates": [lng, lat]},
+            "distanceField": "distance",
+            "maxDistance": radius,
+            "query": {"location_id": location_id},
+            "key": "geo",
+            "spherical": True
+        }
+        pipeline = [{"$geoNear": geo_near}]
+        if last_id is not None:
+            geo_near["minDistance"] = last_distance
+            pipeline.append({"$match": {"$or": [
+                {"distance": {"$gt": last_distance}},
+                {"distance": last_distance, "_id": {"$gt": last_id}}
+            ]}})
+        pipeline += [{"$sort": {"distance": 1, "_id": 1}}, {"$limit": limit + 1}]
+        docs = list(places_reads.aggregate(pipeline))
+
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1], lat is not None) if has_more else None
+    return {"restaurants": [_serialize(doc) for doc in docs], "next_cursor": next_cursor}
+
+
+def get_page(location_id, lat=None, lng=None, radius=None, limit=20, cursor=None):
+    """
+    Lokasyondaki restoranların bir sayfasını döndürür.
+    Koordinat verilirse sonuçlar en yakından başlayarak sıralanır.
+    """
+    if lat is not None:
+        # ~11 m hassasiyet: yakın konumdaki istekler aynı önbellek anahtarını paylaşır
+        lat, lng = round(lat, 4), round(lng, 4)
+    if cursor:
+        decode_cursor(cursor, lat is not None)
+    key = (location_id, lat, lng, radius, limit, cursor)
+    return page_cache.get_or_load(key, lambda: _query_page(location_id, lat, lng, radius, limit, cursor))
+
+
+def legacy_restaurants(location_id):
+    """ Henüz aktarılmamış lokasyonun eski, tek belgelik restoran listesini döndürür """
+    return restaurants_collection.find_one({"location_id": location_id}, {"_id": 0})
+
+
+def _extract_point(item):
+    """ Eski restoran kaydından [lng, lat] koordinatını bulur """
+    geo = item.get("geo") or item.get("location")
+    if isinstance(geo, dict) and isinstance(geo.get("coordinates"), list):
+        return [float(geo["coordinates"][0]), float(geo["coordinates"][1])]
+    lat = item.get("lat", item.get("latitude"))
+    lng = item.get("lng", item.get("lon", item.get("longitude")))
+    if lat is None or lng is None:
+        return None
+    return [float(lng), float(lat)]
+
+
+def migrate_from_blobs():
+    """
+    Lokasyon başına tek belge olarak saklanan restoran listelerini
+    restaurant_places koleksiyonunda restoran başına bir belgeye dönüştürür.
+    """
+    ensure_indexes()
+    migrated, skipped = 0, 0
+    for blob in restaurants_collection.find({}):
+        location_id = blob["location_id"]
+        items = []
+        for key, value in blob.items():
+            if key in ("_id", "location_id") or not isinstance(value, list):
+                continue
+            items.extend(item for item in value if isinstance(item, dict))
+
+        places = []
+        for item in items:
+            point = _extract_point(item)
+            if point is None:
+                skipped += 1
+                continue
+            place = {k: v for k, v in item.items() if k not in ("lat", "latitude", "lng", "lon", "longitude", "location")}
+            place["location_id"] = location_id
+            place["geo"] = {"type": "Point", "coordinates": point}
+            places.append(place)
+
+        places_collection.delete_many({"location_id": location_id})
+        if places:
+            places_collection.insert_many(places, ordered=False)
+        migrated += len(places)
+
+    page_cache.invalidate()
+    return migrated, skipped
+
+
+def _on_place_change(change):
+    """ Başka bir süreçte (veya elle) değişen restoranın lokasyonundaki sayfaları düşürür """
+    location_id = change.document.get("location_id")
+    if change.document_id is None or location_id is None:
+        page_cache.invalidate()
+    else:
+        page_cache.invalidate(lambda key: key[0] == location_id)
+
+
+invalidation.register("restaurant_places", _on_place_change, fields=("location_id",))
+
+
+if __name__ == "__main__":
+    migrated, skipped = migrate_from_blobs()
+    print(f"{migrated} restoran aktarıldı, koordinatı olmayan {skipped} kayıt atlandı.")
@@ -1,48 +1,87 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from pymongo import MongoClient
 import config
+from common import users
+from common.reference_data import reference_data
+from restaurants.catalog import get_page, legacy_restaurants, InvalidCursorError
 
 restaurants_bp = Blueprint("restaurants", __name__)
 
-# MongoDB bağlantısı
-client = MongoClient(config.MONGO_URI)
-db = client["blinder"]
-users_collection = db["users"]
-locations_collection = db["locations"]
-restaurants_collection = db["restaurants"]
+
+def parse_page_args(args):
+    """ lat/lng, radius, limit ve cursor sorgu parametrelerini doğrular """
+    lat, lng = args.get("lat", type=float), args.get("lng", type=float)
+    if (lat is None) != (lng is None):
+        raise ValueError("lat ve lng birlikte gönderilmelidir!")
+    if lat is not None and not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("Geçersiz koordinat!")
+
+    radius = args.get("radius", default=config.RESTAURANT_DEFAULT_RADIUS, type=int)
+    if radius is None or radius <= 0:
+        raise ValueError("Geçersiz radius!")
+    limit = args.get("limit", default=config.RESTAURANT_DEFAULT_LIMIT, type=int)
+    if limit is None or limit <= 0:
+        raise ValueError("Geçersiz limit!")
+
+    return {
+        "lat": lat,
+        "lng": lng,
+        "radius": min(radius, config.RESTAURANT_MAX_RADIUS),
+        "limit": min(limit, config.RESTAURANT_MAX_LIMIT),
+        "cursor": args.get("cursor") or None
+    }
 
 
 @restaurants_bp.route("/restaurants", methods=["GET"])
 @jwt_required()
 def get_restaurants():
-    """ Kullanıcının üniversite lokasyonuna göre restoranları getirir """
+    """
+    Kullanıcının üniversite lokasyonuna göre restoranları sayfalı getirir.
+    Query: ?lat=..&lng=..&radius=<metre>&limit=..&cursor=..
+    lat/lng verilirse en yakın restoranlar önce gelir.
+    """
     try:
+        try:
+            page_args = parse_page_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         user_email = get_jwt_identity()
-        user = users_collection.find_one({"email": user_email}, {"_id": 0, "university_location": 1})
-        if not user or "university_location" not in user:
+        user = users.find_identity(user_email)
+        if not user or not user.university_location:
             return jsonify({"error": "Kullanıcının üniversite lokasyonu bulunamadı!"}), 404
 
-        university_location = user["university_location"]
+        university_location = user.university_location
 
-        location = locations_collection.find_one({"name": university_location}, {"_id": 1})
-        if not location:
+        location_id = reference_data.location_id_for(university_location)
+        if location_id is None:
             return jsonify({"error": "Lokasyon bulunamadı!"}), 404
 
-        location_id = location["_id"]
+        try:
+            page = get_page(location_id, **page_args)
+        except InvalidCursorError as e:
+            return jsonify({"error": str(e)}), 400
 
-        restaurants_data = restaurants_collection.find_one({"location_id": location_id}, {"_id": 0})
-        if not restaurants_data:
-            return jsonify({"error": "Bu lokasyona ait restoran bulunamadı!"}), 404
+        if not page["restaurants"] and not page_args["cursor"]:
+            # Katalog aktarımı (python -m restaurants.catalog) yapılmadıysa eski belge aynen döner
+            restaurants_data = legacy_restaurants(location_id)
+            if not restaurants_data:
+                return jsonify({"error": "Bu lokasyona ait restoran bulunamadı!"}), 404
+            return jsonify({
+                "message": "Restoranlar başarıyla alındı",
+                "location": university_location,
+                "data": restaurants_data,
+                "next_cursor": None
+            }), 200
 
         response_data = {
             "message": "Restoranlar başarıyla alındı",
             "location": university_location,
-            "data": restaurants_data
+            "data": page["restaurants"],
+            "next_cursor": page["next_cursor"]
         }
 
         return jsonify(response_data), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
@@ -1,18 +1,15 @@
 from flask import Blueprint, request, jsonify, redirect
-import requests
 import config
+from common import users
+from common import response_cache
+from spotify import spotify_client
+from spotify.tokens import spotify_collection, token_fields
+from spotify.top_cache import top_cache, RECORD_PROJECTION
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, decode_token
-from pymongo import MongoClient
 from datetime import datetime
 
 spotify_bp = Blueprint("spotify", __name__)
 
-# MongoDB Bağlantısı
-client = MongoClient(config.MONGO_URI)
-db = client["blinder"]
-users_collection = db["users"]
-spotify_collection = db["spotify"]
-
 # Spotify API Bilgileri
 SPOTIFY_CLIENT_ID = config.SPOTIFY_CLIENT_ID
 SPOTIFY_CLIENT_SECRET = config.SPOTIFY_CLIENT_SECRET
@@ -21,7 +18,9 @@ SPOTIFY_REDIRECT_URI = config.SPOTIFY_REDIRECT_URI
 
 def get_spotify_token(code):
     """ Spotify'dan Access Token almak için istek yapar """
-    url = "https://accounts.spotify.com/api/token"
+    from common import http_client
+
+    url = f"{config.SPOTIFY_ACCOUNTS_URL}/api/token"
     data = {
         "grant_type": "authorization_code",
         "code": code,
@@ -29,34 +28,15 @@ def get_spotify_token(code):
         "client_id": SPOTIFY_CLIENT_ID,
         "client_secret": SPOTIFY_CLIENT_SECRET
     }
-    response = requests.post(url, data=data)
+    response = http_client.post(url, data=data)
     return response.json()
 
 
-def refresh_spotify_token(refresh_token):
-    """ Spotify Refresh Token kullanarak yeni Access Token alır """
-    token_url = "https://accounts.spotify.com/api/token"
-    data = {
-        "grant_type": "refresh_token",
-        "refresh_token": refresh_token,
-        "client_id": config.SPOTIFY_CLIENT_ID,
-        "client_secret": config.SPOTIFY_CLIENT_SECRET
-    }
-
-    response = requests.post(token_url, data=data)
-    new_token_data = response.json()
-
-    if "access_token" in new_token_data:
-        return new_token_data["access_token"]
-    else:
-        return None
-
-
 @spotify_bp.route("/login", methods=["GET"])
 def spotify_login():
     """ Kullanıcıyı Spotify OAuth'a yönlendirir """
     auth_url = (
-        "https://accounts.spotify.com/authorize"
+        f"{config.SPOTIFY_ACCOUNTS_URL}/authorize"
         f"?client_id={SPOTIFY_CLIENT_ID}"
         "&response_type=code"
         f"&redirect_uri={SPOTIFY_REDIRECT_URI}"
@@ -79,14 +59,15 @@ def spotify_callback():
     # Spotify’dan token al
     token_data = get_spotify_token(code)
     access_token = token_data.get("access_token")
-    refresh_token = token_data.get("refresh_token")
 
     if not access_token:
         return jsonify({"error": "Spotify erişim hatası!"}), 400
 
     # Kullanıcının Spotify ID'sini al
-    user_info = requests.get(
-        "https://api.spotify.com/v1/me",
+    from common import http_client
+
+    user_info = http_client.get(
+        f"{config.SPOTIFY_API_URL}/v1/me",
         headers={"Authorization": f"Bearer {access_token}"}
     ).json()
 
@@ -102,131 +83,120 @@ def spotify_callback():
     if not user_email:
         return jsonify({"error": "Geçersiz JWT veya kullanıcı bulunamadı!"}), 400
 
-    user = users_collection.find_one({"email": user_email})
+    user = users.find_identity(user_email)
     if not user:
         return jsonify({"error": "Kullanıcı bulunamadı!"}), 400
 
-    existing_record = spotify_collection.find_one({"user_id": user["_id"]})
+    existing_record = spotify_collection.find_one({"user_id": user.id})
     if existing_record:
         if existing_record.get("spotify_id") and existing_record["spotify_id"] != spotify_id:
             return jsonify({"error": "Bu kullanıcı zaten başka bir Spotify hesabı ile bağlı!"}), 400
 
         spotify_collection.update_one(
-            {"user_id": user["_id"]},
+            {"user_id": user.id},
             {"$set": {
                 "spotify_id": spotify_id,
-                "spotify_access_token": access_token,
-                "spotify_refresh_token": refresh_token,
+                **token_fields(token_data),
                 "spotify_connected": True,
                 "updated_at": datetime.utcnow()
             }}
         )
     else:
         new_record = {
-            "user_id": user["_id"],
+            "user_id": user.id,
             "spotify_id": spotify_id,
-            "spotify_access_token": access_token,
-            "spotify_refresh_token": refresh_token,
+            **token_fields(token_data),
             "spotify_connected": True,
             "created_at": datetime.utcnow()
         }
         spotify_collection.insert_one(new_record)
 
+    response_cache.bump(user.id)
+    # Profil ekranı ilk açıldığında listeler hazır olsun
+    top_cache.revalidate_async(user.id)
+
     return redirect("http://localhost:8081/profile/profile")
 
 
-@spotify_bp.route("/top-tracks", methods=["GET"])
-@jwt_required()
-def get_top_tracks():
-    """ Kullanıcının en çok dinlediği şarkıları getirir """
+def get_spotify_record():
+    """ JWT'deki kullanıcının Spotify kaydını döndürür; (kullanıcı, kayıt, hata yanıtı) """
     user_email = get_jwt_identity()
-    user = users_collection.find_one({"email": user_email})
+    user = users.find_identity(user_email)
 
     if not user:
-        return jsonify({"error": "Kullanıcı bulunamadı!"}), 400
+        return None, None, (jsonify({"error": "Kullanıcı bulunamadı!"}), 400)
 
-    spotify_record = spotify_collection.find_one({"user_id": user["_id"]})
+    spotify_record = spotify_collection.find_one({"user_id": user.id}, RECORD_PROJECTION)
     if not spotify_record or not spotify_record.get("spotify_access_token"):
-        return jsonify({"error": "Spotify hesabı bağlı değil!"}), 400
-
-    access_token = spotify_record["spotify_access_token"]
-    refresh_token = spotify_record["spotify_refresh_token"]
-
-    url = "https://api.spotify.com/v1/me/top/tracks?time_range=short_term&limit=10"
-    headers = {"Authorization": f"Bearer {access_token}"}
+        return user, None, (jsonify({"error": "Spotify hesabı bağlı değil!"}), 400)
 
-    response = requests.get(url, headers=headers)
+    return user, spotify_record, None
 
-    if response.status_code == 401:
-        new_access_token = refresh_spotify_token(refresh_token)
-        if new_access_token:
-            spotify_collection.update_one(
-                {"user_id": user["_id"]},
-                {"$set": {"spotify_access_token": new_access_token}}
-            )
-            headers["Authorization"] = f"Bearer {new_access_token}"
-            response = requests.get(url, headers=headers)
 
-    if response.status_code != 200:
-        return jsonify({"error": "Spotify verisi alınamadı!", "details": response.json()}), 400
+def fetch_user_top(kinds, deadline=None):
+    user, spotify_record, error = get_spotify_record()
+    if error:
+        return None, None, error
 
-    tracks_data = response.json().get("items", [])
+    results, errors = top_cache.get(spotify_record, kinds=kinds, deadline=deadline)
+    if not results:
+        return None, None, (jsonify({"error": "Spotify verisi alınamadı!", "details": errors}), 400)
+    return results, errors, None
 
-    tracks = []
-    for track in tracks_data:
-        tracks.append({
-            "name": track["name"],
-            "artists": [artist["name"] for artist in track["artists"]],
-            "image": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
-            "spotify_url": track["external_urls"]["spotify"]
-        })
 
-    return jsonify({"tracks": tracks})
+@spotify_bp.route("/top-tracks", methods=["GET"])
+@jwt_required()
+def get_top_tracks():
+    """ Kullanıcının en çok dinlediği şarkıları getirir """
+    results, _, error = fetch_user_top(("tracks",), deadline=config.HTTP_READ_TIMEOUT)
+    if error:
+        return error
+    return jsonify({"tracks": results["tracks"]})
 
 
 @spotify_bp.route("/top-artists", methods=["GET"])
 @jwt_required()
 def get_top_artists():
     """ Kullanıcının en çok dinlediği sanatçıları getirir """
-    user_email = get_jwt_identity()
-    user = users_collection.find_one({"email": user_email})
+    results, _, error = fetch_user_top(("artists",), deadline=config.HTTP_READ_TIMEOUT)
+    if error:
+        return error
+    return jsonify({"artists": results["artists"]})
 
-    if not user:
-        return jsonify({"error": "Kullanıcı bulunamadı!"}), 400
 
-    spotify_record = spotify_collection.find_one({"user_id": user["_id"]})
+@spotify_bp.route("/top", methods=["GET"])
+@jwt_required()
+def get_top():
+    """
+    Şarkıları ve sanatçıları eşzamanlı getirir. SPOTIFY_TOP_DEADLINE içinde yanıt
+    vermeyen liste null döner ve `errors` içinde belirtilir (kısmi sonuç).
+    """
+    results, errors, error = fetch_user_top(spotify_client.TOP_KINDS)
+    if error:
+        return error
+    return jsonify({
+        "tracks": results.get("tracks"),
+        "artists": results.get("artists"),
+        "partial": bool(errors),
+        "errors": errors
+    })
+
+
+@spotify_bp.route("/top/<int:user_id>", methods=["GET"])
+@jwt_required()
+def get_user_top(user_id):
+    """
+    Başka bir kullanıcının önbellekteki top listelerini döndürür. Spotify'a istek
+    yapılmaz; eksik veya bayat listeler arka planda yenilenmek üzere kuyruğa alınır.
+    """
+    spotify_record = spotify_collection.find_one({"user_id": user_id}, RECORD_PROJECTION)
     if not spotify_record or not spotify_record.get("spotify_access_token"):
-        return jsonify({"error": "Spotify hesabı bağlı değil!"}), 400
-
-    access_token = spotify_record["spotify_access_token"]
-    refresh_token = spotify_record["spotify_refresh_token"]
-
-    url = "https://api.spotify.com/v1/me/top/artists?time_range=short_term&limit=10"
-    headers = {"Authorization": f"Bearer {access_token}"}
-
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 401:
-        new_access_token = refresh_spotify_token(refresh_token)
-        if new_access_token:
-            spotify_collection.update_one(
-                {"user_id": user["_id"]},
-                {"$set": {"spotify_access_token": new_access_token}}
-            )
-            headers["Authorization"] = f"Bearer {new_access_token}"
-            response = requests.get(url, headers=headers)
-
-    if response.status_code != 200:
-        return jsonify({"error": "Spotify verisi alınamadı!", "details": response.json()}), 400
-
-    artists_data = response.json().get("items", [])
-
-    artists = []
-    for artist in artists_data:
-        artists.append({
-            "name": artist["name"],
-            "image": artist["images"][0]["url"] if artist["images"] else None,
-            "spotify_url": artist["external_urls"]["spotify"]
-        })
-
-    return jsonify({"artists": artists})
+        return jsonify({"error": "Spotify hesabı bağlı değil!"}), 404
+
+    results, errors = top_cache.get(spotify_record, allow_fetch=False)
+    return jsonify({
+        "tracks": results.get("tracks"),
+        "artists": results.get("artists"),
+        "partial": bool(errors),
+        "errors": errors
+    })
@@ -0,0 +1,122 @@
+"""
+Spotify Web API istemcisi.
+
+İstekler paylaşılan http_client oturumunun bağlantı havuzu üzerinden küçük bir thread
+havuzunda çalışır. `fetch_top` birden fazla top listesini aynı anda ister ve süre
+sınırı dolduğunda yalnızca tamamlanan listeleri döndürür.
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import config
+
+TOP_KINDS = ("tracks", "artists")
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """ Fork sonrası her worker kendi thread havuzunu oluşturur """
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=config.SPOTIFY_MAX_WORKERS,
+                                               thread_name_prefix="spotify")
+                _executor_pid = pid
+    return _executor
+
+
+def parse_tracks(items):
+    return [{
+        "name": track["name"],
+        "artists": [artist["name"] for artist in track["artists"]],
+        "image": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
+        "spotify_url": track["external_urls"]["spotify"]
+    } for track in items]
+
+
+def parse_artists(items):
+    return [{
+        "name": artist["name"],
+        "image": artist["images"][0]["url"] if artist["images"] else None,
+        "spotify_url": artist["external_urls"]["spotify"]
+    } for artist in items]
+
+
+PARSERS = {"tracks": parse_tracks, "artists": parse_artists}
+
+
+def top_url(kind, time_range="short_term", limit=10):
+    return f"{config.SPOTIFY_API_URL}/v1/me/top/{kind}?time_range={time_range}&limit={limit}"
+
+
+def get_top(kind, access_token, read_timeout=None, retries=None):
+    """ Tek bir top listesini ister ve ham yanıtı döndürür """
+    from common import http_client
+
+    timeout = (config.HTTP_CONNECT_TIMEOUT, read_timeout or config.HTTP_READ_TIMEOUT)
+    return http_client.get(top_url(kind), headers={"Authorization": f"Bearer {access_token}"},
+                           timeout=timeout, retries=retries)
+
+
+def fetch_top(access_token, kinds=TOP_KINDS, deadline=None, refresh=None):
+    """
+    İstenen listeleri eşzamanlı çeker ve ({kind: liste}, {kind: hata kodu}) döndürür.
+    Süre sınırında bitmeyen listeler "timeout" olarak raporlanır. 401 alınırsa
+    `refresh()` ile bir kez yeni token alınır ve yalnızca o liste tekrar istenir.
+    """
+    from requests import RequestException
+
+    deadline_at = time.monotonic() + (deadline if deadline is not None else config.SPOTIFY_TOP_DEADLINE)
+    executor = _get_executor()
+    results, errors = {}, {}
+    refreshed = False
+
+    def submit(kind, token):
+        remaining = max(deadline_at - time.monotonic(), 0.1)
+        futures[executor.submit(get_top, kind, token, remaining)] = (kind, token)
+
+    futures = {}
+    for kind in kinds:
+        submit(kind, access_token)
+
+    while futures:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind, used_token = futures.pop(future)
+            try:
+                response = future.result()
+            except RequestException:
+                errors[kind] = "unavailable"
+                continue
+
+            if response.status_code == 200:
+                results[kind] = PARSERS[kind](response.json().get("items", []))
+            elif response.status_code != 401:
+                errors[kind] = f"http_{response.status_code}"
+            elif used_token != access_token:
+                # Token bu istek yoldayken zaten yenilendi
+                submit(kind, access_token)
+            elif refresh and not refreshed:
+                refreshed = True
+                new_token = refresh()
+                if new_token:
+                    access_token = new_token
+                    submit(kind, access_token)
+                else:
+                    errors[kind] = "unauthorized"
+            else:
+                errors[kind] = "unauthorized"
+
+    for kind, _ in futures.values():
+        errors[kind] = "timeout"
+    return results, errors
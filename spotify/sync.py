@@ -0,0 +1,294 @@
+"""
+Toplu Spotify senkronizasyonu: bağlı tüm kullanıcıların top listelerini yeniler.
+
+    python -m spotify.sync                  # tek tur
+    python -m spotify.sync --resume         # yarım kalan son turu sürdürür
+    python -m spotify.sync --loop           # SPOTIFY_SYNC_INTERVAL saniyede bir yeni tur
+
+Her tur `spotify_sync_runs` koleksiyonunda bir durum belgesiyle izlenir; biten
+kullanıcılar `spotify` belgesinde `top_lists_synced_run` ile işaretlenir, böylece
+yarım kalan tur yeniden başlatıldığında yalnızca kalanlar işlenir. Kullanıcılar son
+aktiflik zamanına (`users.last_active_at`) göre yeniden eskiye sıralanır.
+
+Tüm worker'lar tek bir token bucket'ı paylaşır (SPOTIFY_SYNC_RATE istek/sn,
+SPOTIFY_SYNC_BURST kapasite). 429 alındığında Retry-After süresince bütün worker'lar
+durur. İlerleme ve hız düzenli olarak yazdırılır ve durum belgesine işlenir; web
+worker'ları son turu oradan okuyup /metrics'te sunar (`spotify_sync_last_run_*`).
+"""
+import argparse
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import requests
+
+import config
+from common.db import db
+from common.http_client import parse_retry_after
+from spotify import spotify_client
+from spotify.tokens import spotify_collection, get_access_token, token_refresher
+from spotify.top_cache import top_cache, RECORD_PROJECTION
+
+runs_collection = db["spotify_sync_runs"]
+users_collection = db["users"]
+
+MAX_ATTEMPTS = 5
+MAX_THROTTLED_ATTEMPTS = 20
+REPORT_INTERVAL = 10
+
+
+class TokenBucket:
+    """ Worker'ların paylaştığı istek hızı sınırı; 429 sonrası herkes Retry-After kadar bekler """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            # Bekleme bitince kova boştan dolmaya başlar, böylece tekrar ani yük oluşmaz
+            self.tokens = 0.0
+            self.updated = self.paused_until
+
+
+class SyncStats:
+    FIELDS = ("synced", "failed", "skipped", "requests", "throttled")
+
+    def __init__(self, total, initial=None):
+        self.total = total
+        self.counts = {field: (initial or {}).get(field, 0) for field in self.FIELDS}
+        self.started = time.monotonic()
+        self.processed_at_start = self.processed
+        self._lock = threading.Lock()
+
+    @property
+    def processed(self):
+        return self.counts["synced"] + self.counts["failed"] + self.counts["skipped"]
+
+    def add(self, field, amount=1):
+        with self._lock:
+            self.counts[field] += amount
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        done = self.processed - self.processed_at_start
+        return (f"{self.processed}/{self.total} kullanıcı, {done / elapsed:.1f} kullanıcı/sn, "
+                f"{self.counts['requests'] / elapsed:.1f} istek/sn, {self.counts['throttled']} adet 429, "
+                f"{self.counts['failed']} hata")
+
+
+class SpotifySync:
+    def __init__(self, workers=None, rate=None, burst=None, force=False):
+        self.workers = workers or config.SPOTIFY_SYNC_WORKERS
+        self.bucket = TokenBucket(rate or config.SPOTIFY_SYNC_RATE, burst or config.SPOTIFY_SYNC_BURST)
+        self.force = force
+        self._stop = threading.Event()
+
+    # --- tur durumu -----------------------------------------------------------
+
+    def start_run(self, resume=False):
+        if resume:
+            run = runs_collection.find_one({"status": {"$ne": "completed"}}, sort=[("started_at", -1)])
+            if run:
+                runs_collection.update_one({"_id": run["_id"]}, {"$set": {"status": "running"}})
+                return run
+        run = {
+            "_id": f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}",
+            "status": "running",
+            "force": self.force,
+            "started_at": datetime.utcnow(),
+            **{field: 0 for field in SyncStats.FIELDS}
+        }
+        runs_collection.insert_one(run)
+        return run
+
+    def save_progress(self, run_id, stats, status=None):
+        update = dict(stats.counts, total=stats.total, updated_at=datetime.utcnow())
+        if status:
+            update["status"] = status
+            if status == "completed":
+                update["finished_at"] = datetime.utcnow()
+        runs_collection.update_one({"_id": run_id}, {"$set": update})
+
+    def plan(self, run_id, force):
+        """ Bu turda henüz işlenmemiş kullanıcılar, en son aktif olan önce """
+        query = {"spotify_connected": True, "top_lists_synced_run": {"$ne": run_id}}
+        if not force:
+            fresh_after = datetime.utcnow() - top_cache.ttl * (1 - top_cache.refresh_ahead)
+            query["$nor"] = [{
+                "$and": [{f"top_lists.{kind}.fetched_at": {"$gte": fresh_after}} for kind in spotify_client.TOP_KINDS]
+            }]
+        user_ids = [doc["user_id"] for doc in spotify_collection.find(query, {"_id": 0, "user_id": 1})]
+
+        last_active = {}
+        for start in range(0, len(user_ids), 1000):
+            chunk = user_ids[start:start + 1000]
+            for doc in users_collection.find({"_id": {"$in": chunk}}, {"last_active_at": 1}):
+                last_active[doc["_id"]] = doc.get("last_active_at")
+        user_ids.sort(key=lambda user_id: last_active.get(user_id) or datetime.min, reverse=True)
+        return user_ids
+
+    # --- kullanıcı başına iş ----------------------------------------------------
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(30, 0.5 * (2 ** attempt)))
+
+    def sync_user(self, user_id, run_id, stats):
+        record = spotify_collection.find_one({"user_id": user_id}, RECORD_PROJECTION)
+        if not record or not record.get("spotify_access_token"):
+            return "skipped"
+
+        access_token = get_access_token(record) or record["spotify_access_token"]
+        refreshed = False
+        results = {}
+        for kind in spotify_client.TOP_KINDS:
+            attempts = throttled = 0
+            while True:
+                if self._stop.is_set():
+                    return None
+                self.bucket.acquire()
+                stats.add("requests")
+                try:
+                    response = spotify_client.get_top(kind, access_token, retries=0)
+                except requests.RequestException:
+                    response = None
+
+                if response is not None and response.status_code == 200:
+                    results[kind] = spotify_client.PARSERS[kind](response.json().get("items", []))
+                    break
+                if response is not None and response.status_code == 429:
+                    stats.add("throttled")
+                    throttled += 1
+                    if throttled >= MAX_THROTTLED_ATTEMPTS:
+                        return "failed"
+                    wait = parse_retry_after(response.headers.get("Retry-After"))
+                    self.bucket.pause(wait if wait is not None else self._backoff(throttled))
+                    continue
+                if response is not None and response.status_code == 401 and not refreshed:
+                    refreshed = True
+                    access_token = token_refresher(user_id, access_token)()
+                    if not access_token:
+                        return "failed"
+                    continue
+                if response is None or response.status_code >= 500:
+                    attempts += 1
+                    if attempts < MAX_ATTEMPTS:
+                        time.sleep(self._backoff(attempts))
+                        continue
+                return "failed"
+
+        top_cache.store(user_id, results, extra={"top_lists_synced_run": run_id})
+        return "synced"
+
+    def _worker(self, work, run_id, stats):
+        while not self._stop.is_set():
+            user_id = work.get()
+            if user_id is None:
+                return
+            try:
+                outcome = self.sync_user(user_id, run_id, stats)
+            except Exception as e:
+                print(f"Spotify senkronizasyon hatası (kullanıcı {user_id}): {str(e)}")
+                outcome = "failed"
+            if outcome is None:
+                return
+            stats.add(outcome)
+
+    # --- tur ------------------------------------------------------------------
+
+    def run(self, resume=False):
+        run = self.start_run(resume)
+        run_id = run["_id"]
+        user_ids = self.plan(run_id, run.get("force", self.force))
+        stats = SyncStats(total=len(user_ids) + sum(run.get(f, 0) for f in ("synced", "failed", "skipped")),
+                          initial=run)
+        print(f"Spotify senkronizasyonu {run_id}: {len(user_ids)} kullanıcı işlenecek")
+
+        work = queue.Queue(maxsize=self.workers * 4)
+        threads = [threading.Thread(target=self._worker, args=(work, run_id, stats),
+                                    name=f"spotify-sync-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        status = "interrupted"
+        try:
+            last_report = time.monotonic()
+            for user_id in user_ids + [None] * self.workers:
+                while True:
+                    try:
+                        work.put(user_id, timeout=1)
+                        break
+                    except queue.Full:
+                        pass
+                    if time.monotonic() - last_report >= REPORT_INTERVAL:
+                        last_report = time.monotonic()
+                        print(stats.summary())
+                        self.save_progress(run_id, stats)
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=REPORT_INTERVAL)
+                print(stats.summary())
+                self.save_progress(run_id, stats)
+            status = "completed"
+        except KeyboardInterrupt:
+            self._stop.set()
+            # Kuyrukta bekleyen işleri bırak, worker'lar sıradaki isteği bitirince çıkar
+            while True:
+                try:
+                    work.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in threads:
+                work.put_nowait(None)
+            for thread in threads:
+                thread.join()
+        finally:
+            self.save_progress(run_id, stats, status=status)
+            print(f"Spotify senkronizasyonu {run_id} {status}: {stats.summary()}")
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bağlı tüm kullanıcıların Spotify top listelerini yeniler.")
+    parser.add_argument("--resume", action="store_true", help="Yarım kalan son turu sürdür")
+    parser.add_argument("--loop", action="store_true", help="SPOTIFY_SYNC_INTERVAL saniyede bir yeni tur başlat")
+    parser.add_argument("--force", action="store_true", help="Önbelleği taze olan kullanıcıları da yenile")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--rate", type=float, help="Saniyedeki en fazla Spotify isteği")
+    parser.add_argument("--burst", type=int)
+    args = parser.parse_args(argv)
+
+    sync = SpotifySync(workers=args.workers, rate=args.rate, burst=args.burst, force=args.force)
+    stats = sync.run(resume=args.resume)
+    while args.loop and not sync._stop.is_set():
+        time.sleep(config.SPOTIFY_SYNC_INTERVAL)
+        sync = SpotifySync(workers=args.workers, rate=args.rate, burst=args.burst, force=args.force)
+        stats = sync.run()
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Spotify access token yönetimi.
+
+Token'ın bitiş zamanı (`spotify_token_expires_at`) callback ve her yenilemede kaydedilir,
+token süresi dolmadan SPOTIFY_TOKEN_REFRESH_MARGIN saniye önce yenilenir. Aynı
+kullanıcı için eşzamanlı yenilemeler `spotify` belgesindeki kısa süreli bir kirayla
+(`spotify_token_lease_until`) tek bir isteğe indirgenir; süreç içindeki kilit yalnızca
+kira alımını sıraya koyar. Kirayı alamayanlar, kilidi bırakmış olarak, yeni token'ın
+yazılmasını bekler. Spotify yeni bir refresh token döndürürse o da kaydedilir.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+import config
+from common import response_cache
+from common.db import db
+
+spotify_collection = db["spotify"]
+
+LEASE_SECONDS = 15
+WAIT_INTERVAL = 0.1
+TOKEN_PROJECTION = {
+    "user_id": 1, "spotify_access_token": 1, "spotify_refresh_token": 1,
+    "spotify_token_expires_at": 1, "spotify_token_lease_until": 1
+}
+
+_user_locks = [threading.Lock() for _ in range(64)]
+
+
+def token_fields(token_data):
+    """ Token yanıtından kaydedilecek alanlar; refresh token yalnızca döndürüldüyse güncellenir """
+    fields = {
+        "spotify_access_token": token_data["access_token"],
+        "spotify_token_expires_at": datetime.utcnow() + timedelta(seconds=token_data.get("expires_in", 3600))
+    }
+    if token_data.get("refresh_token"):
+        fields["spotify_refresh_token"] = token_data["refresh_token"]
+    return fields
+
+
+def refresh_spotify_token(refresh_token):
+    """ Spotify Refresh Token kullanarak yeni token yanıtını alır """
+    from common import http_client
+
+    token_url = f"{config.SPOTIFY_ACCOUNTS_URL}/api/token"
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+        "client_id": config.SPOTIFY_CLIENT_ID,
+        "client_secret": config.SPOTIFY_CLIENT_SECRET
+    }
+
+    response = http_client.post(token_url, data=data)
+    new_token_data = response.json()
+
+    if "access_token" in new_token_data:
+        return new_token_data
+    else:
+        return None
+
+
+def _needs_refresh(record, rejected_token):
+    if rejected_token is not None:
+        return record.get("spotify_access_token") == rejected_token
+    expires_at = record.get("spotify_token_expires_at")
+    if expires_at is None:
+        # Eski kayıtlarda bitiş zamanı yok; 401 alınınca yenilenir
+        return False
+    return expires_at - datetime.utcnow() <= timedelta(seconds=config.SPOTIFY_TOKEN_REFRESH_MARGIN)
+
+
+def get_access_token(record, rejected_token=None):
+    """
+    Kullanıcının geçerli access token'ını döndürür. Süresi dolmak üzereyse ya da
+    `rejected_token` Spotify tarafından reddedildiyse önce tek seferlik yenileme yapılır.
+    Yenileme başarısız olursa None döner.
+    """
+    if not _needs_refresh(record, rejected_token):
+        return record["spotify_access_token"]
+
+    user_id = record["user_id"]
+    # Şerit kilidi yalnızca kontrol ve kira alımını kapsar; Spotify isteği ve bekleme
+    # kilit dışında yapılır ki aynı şeritteki diğer kullanıcılar beklemesin
+    with _user_locks[hash(user_id) % len(_user_locks)]:
+        current = spotify_collection.find_one({"user_id": user_id}, TOKEN_PROJECTION)
+        if current is None:
+            return None
+        if not _needs_refresh(current, rejected_token):
+            return current["spotify_access_token"]
+        leased = _take_lease(user_id)
+    if leased is None:
+        return _wait_for_refresh(user_id, current.get("spotify_access_token"))
+    return _refresh(leased)
+
+
+def _take_lease(user_id):
+    """ Kira boşsa veya süresi geçtiyse alır ve kaydı döndürür; başkasındaysa None """
+    now = datetime.utcnow()
+    return spotify_collection.find_one_and_update(
+        {
+            "user_id": user_id,
+            "$or": [
+                {"spotify_token_lease_until": {"$exists": False}},
+                {"spotify_token_lease_until": {"$lt": now}}
+            ]
+        },
+        {"$set": {"spotify_token_lease_until": now + timedelta(seconds=LEASE_SECONDS)}},
+        projection=TOKEN_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _refresh(leased):
+    user_id = leased["user_id"]
+    token_data = None
+    try:
+        token_data = refresh_spotify_token(leased.get("spotify_refresh_token"))
+    finally:
+        update = {"$unset": {"spotify_token_lease_until": ""}}
+        if token_data:
+            update["$set"] = token_fields(token_data)
+        spotify_collection.update_one({"user_id": user_id}, update)
+    if token_data:
+        # Token alanları /auth/profile yanıtında yer alıyor
+        response_cache.bump(user_id)
+    return token_data["access_token"] if token_data else None
+
+
+def _wait_for_refresh(user_id, old_token):
+    """ Başka bir istek yeniliyor; yeni token yazılana veya kira kalkana ya da süresi geçene kadar bekler """
+    deadline = time.monotonic() + LEASE_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        current = spotify_collection.find_one({"user_id": user_id}, TOKEN_PROJECTION)
+        if current is None:
+            return None
+        if current.get("spotify_access_token") != old_token:
+            return current["spotify_access_token"]
+        lease_until = current.get("spotify_token_lease_until")
+        if lease_until is None or lease_until < datetime.utcnow():
+            # Yenileme yeni token olmadan bitti ya da kirayı alan istek yarıda kaldı
+            return None
+    return None
+
+
+def token_refresher(user_id, access_token):
+    """ 401 alındığında reddedilen token'ı tek seferde yenileyen fonksiyonu döndürür """
+    def refresh():
+        return get_access_token({"user_id": user_id, "spotify_access_token": access_token},
+                                rejected_token=access_token)
+    return refresh
@@ -0,0 +1,182 @@
+"""
+Spotify top listelerinin sunucu tarafı önbelleği.
+
+Ayrıştırılmış listeler kullanıcının `spotify` belgesinde `top_lists.<tür>` altında
+çekildiği zamanla birlikte tutulur, böylece tüm worker'lar ve profili görüntüleyen
+diğer kullanıcılar aynı veriyi kullanır. SPOTIFY_TOP_TTL dolan veri SPOTIFY_TOP_STALE_TTL'e
+kadar sunulmaya devam eder ve arka planda yenilenir (stale-while-revalidate): yenilenmesi
+istenen kullanıcının belgesine `top_lists_requested_at` yazılır. Arka plan yenileyicisi
+düğüm başına tek süreçte çalışır (SPOTIFY_TOP_REFRESH_LOCK_PATH üzerinde flock, bkz.
+common/leader.py); istenen ve süresi dolmak üzere olan girdileri periyodik olarak günceller.
+Aynı kullanıcıyı birden fazla sürecin aynı anda yenilememesi için belgeye kısa süreli
+bir kira (`top_lists_lease_until`) yazılır.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import config
+from common import leader, response_cache
+from matches import music_similarity
+from spotify import spotify_client
+from spotify.tokens import spotify_collection, get_access_token, token_refresher
+
+LEASE_SECONDS = 60
+FAILED_RETRY_SECONDS = 900
+RECORD_PROJECTION = {
+    "user_id": 1, "spotify_access_token": 1, "spotify_refresh_token": 1, "spotify_token_expires_at": 1, "top_lists": 1
+}
+
+
+class TopListCache:
+    def __init__(self, collection, ttl, stale_ttl, refresh_ahead=0.1, scan_interval=60, batch_size=20):
+        self.collection = collection
+        self.ttl = timedelta(seconds=ttl)
+        self.stale_ttl = timedelta(seconds=stale_ttl)
+        self.refresh_ahead = refresh_ahead
+        self.scan_interval = scan_interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._refresher_pid = None
+
+    def ensure_indexes(self):
+        for kind in spotify_client.TOP_KINDS:
+            self.collection.create_index(f"top_lists.{kind}.fetched_at", sparse=True)
+        self.collection.create_index("top_lists_requested_at", sparse=True)
+
+    def get(self, record, kinds=spotify_client.TOP_KINDS, deadline=None, allow_fetch=True):
+        """
+        Önbellekteki listeleri döndürür. Eksik listeler `allow_fetch` ise Spotify'dan
+        hemen çekilir; bayat listeler olduğu gibi döner ve yenilenmesi istenir.
+        """
+        now = datetime.utcnow()
+        cached = record.get("top_lists") or {}
+        results, errors, missing, stale = {}, {}, [], False
+
+        for kind in kinds:
+            entry = cached.get(kind)
+            age = now - entry["fetched_at"] if entry else None
+            if entry and age < self.stale_ttl:
+                results[kind] = entry["items"]
+                stale = stale or age >= self.ttl
+            else:
+                missing.append(kind)
+
+        if missing and allow_fetch:
+            fetched, errors = self.fetch(record, missing, deadline)
+            results.update(fetched)
+        elif missing:
+            errors = {kind: "not_cached" for kind in missing}
+            stale = True
+
+        if stale:
+            self.revalidate_async(record["user_id"])
+        return results, errors
+
+    def fetch(self, record, kinds=spotify_client.TOP_KINDS, deadline=None):
+        """ Listeleri Spotify'dan çeker ve gelenleri önbelleğe yazar """
+        access_token = get_access_token(record) or record["spotify_access_token"]
+        results, errors = spotify_client.fetch_top(
+            access_token,
+            kinds=kinds,
+            deadline=deadline,
+            refresh=token_refresher(record["user_id"], access_token)
+        )
+        if results:
+            self.store(record["user_id"], results)
+        return results, errors
+
+    def store(self, user_id, results, extra=None):
+        now = datetime.utcnow()
+        update = {f"top_lists.{kind}": {"items": items, "fetched_at": now} for kind, items in results.items()}
+        update.update(extra or {})
+        self.collection.update_one({"user_id": user_id}, {"$set": update})
+        # Listeler /auth/profile yanıtının parçası
+        response_cache.bump(user_id)
+        if set(results) == set(spotify_client.TOP_KINDS):
+            music_similarity.update_signature(user_id, results)
+
+    def revalidate_async(self, user_id):
+        """ Kullanıcıyı yenileyicinin bir sonraki taramasına işaretler """
+        self.collection.update_one(
+            {"user_id": user_id, "top_lists_requested_at": {"$exists": False}},
+            {"$set": {"top_lists_requested_at": datetime.utcnow()}}
+        )
+
+    def revalidate(self, user_id):
+        """ Kira alınabilirse kullanıcının tüm listelerini yeniler; alınamazsa başka süreç yeniliyordur """
+        now = datetime.utcnow()
+        record = self.collection.find_one_and_update(
+            {
+                "user_id": user_id,
+                "spotify_access_token": {"$exists": True},
+                "$or": [
+                    {"top_lists_lease_until": {"$exists": False}},
+                    {"top_lists_lease_until": {"$lt": now}}
+                ]
+            },
+            {"$set": {"top_lists_lease_until": now + timedelta(seconds=LEASE_SECONDS)}},
+            projection=RECORD_PROJECTION
+        )
+        if record is None:
+            return False
+        results = {}
+        try:
+            results, _ = self.fetch(record, deadline=config.HTTP_READ_TIMEOUT)
+        finally:
+            # Başarısız kullanıcılar bir süre taramadan çıkarılır ki diğerlerinin önünü tıkamasın
+            update = {"$unset": {"top_lists_lease_until": "", "top_lists_requested_at": ""}} if results else {
+                "$set": {"top_lists_lease_until": datetime.utcnow() + timedelta(seconds=FAILED_RETRY_SECONDS)},
+                "$unset": {"top_lists_requested_at": ""}
+            }
+            self.collection.update_one({"user_id": user_id}, update)
+        return bool(results)
+
+    def due_user_ids(self):
+        """ Yenilenmesi istenen ve süresinin dolmasına TTL'in `refresh_ahead` kadarından az kalan kullanıcılar """
+        now = datetime.utcnow()
+        due_before = now - self.ttl * (1 - self.refresh_ahead)
+        due = [{f"top_lists.{kind}.fetched_at": {"$lt": due_before}} for kind in spotify_client.TOP_KINDS]
+        cursor = self.collection.find(
+            {
+                "$or": [{"top_lists_requested_at": {"$exists": True}}] + due,
+                "top_lists_lease_until": {"$not": {"$gt": now}}
+            },
+            {"_id": 0, "user_id": 1}
+        ).limit(self.batch_size)
+        return [doc["user_id"] for doc in cursor]
+
+    def ensure_refresher(self):
+        """ Arka plan yenileyicisini süreç başına bir kez başlatır; yalnızca kilidi alan süreçte çalışır """
+        pid = os.getpid()
+        with self._lock:
+            if self._refresher_pid == pid:
+                return
+            self._refresher_pid = pid
+        leader.run_elected(config.SPOTIFY_TOP_REFRESH_LOCK_PATH, config.SPOTIFY_TOP_REFRESH_ELECTION_INTERVAL,
+                           self._refresh_loop, name="spotify-top-refresh")
+
+    def _refresh_loop(self):
+        try:
+            self.ensure_indexes()
+        except Exception as e:
+            print(f"Spotify önbellek indeksi oluşturulamadı: {str(e)}")
+        while True:
+            started = time.monotonic()
+            try:
+                for user_id in self.due_user_ids():
+                    self.revalidate(user_id)
+            except Exception as e:
+                print(f"Spotify önbellek yenileme hatası: {str(e)}")
+            time.sleep(max(0, self.scan_interval - (time.monotonic() - started)))
+
+
+top_cache = TopListCache(
+    spotify_collection,
+    ttl=config.SPOTIFY_TOP_TTL,
+    stale_ttl=config.SPOTIFY_TOP_STALE_TTL,
+    refresh_ahead=config.SPOTIFY_TOP_REFRESH_AHEAD,
+    scan_interval=config.SPOTIFY_TOP_SCAN_INTERVAL,
+    batch_size=config.SPOTIFY_TOP_REFRESH_BATCH
+)